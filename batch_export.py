@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导出流水线：多进程渲染用例脚本，按接口分片写出 JSONL / Markdown / JMX 文件，
+并通过清单文件(manifest)记录已完成的接口，支持中断后续跑。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from xml.sax.saxutils import escape as xml_escape
+
+import doubao
+import profiling
+import tracing
+
+MANIFEST_FILE = "manifest.jsonl"
+FORMATS = ("jsonl", "md", "jmx")
+DEFAULT_FORMATS = FORMATS
+
+
+def check_formats(formats) -> tuple:
+    """校验导出格式，返回元组；为空或含不支持的格式时抛出 ValueError（而不是跳过，否则续跑永远判断为未完成）。"""
+    formats = tuple(formats)
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"不支持的导出格式: {', '.join(unknown)}（可选 {', '.join(FORMATS)}）")
+    if not formats:
+        raise ValueError("至少需要一种导出格式")
+    return formats
+
+
+def parse_formats(text: str) -> tuple:
+    """解析命令行的逗号分隔格式列表，校验规则同 check_formats。"""
+    return check_formats(fmt.strip() for fmt in text.split(",") if fmt.strip())
+
+
+def job_input_hash(job: dict, formats=DEFAULT_FORMATS) -> str:
+    """计算单个导出任务输入的哈希，用于判断续跑时是否可以跳过。"""
+    payload = {
+        "api_path": job.get("api_path"),
+        "api_doc": job.get("api_doc"),
+        "test_cases": job.get("test_cases"),
+        "formats": list(formats),
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def shard_path_for(output_dir: str, api_path: str) -> tuple:
+    """返回 (分片目录, 文件名前缀)。分片按接口路径哈希的前两位划分，避免单目录文件过多。"""
+    digest = hashlib.sha1(api_path.encode("utf-8")).hexdigest()
+    safe_name = api_path.strip("/").replace("/", "_") or "root"
+    return os.path.join(output_dir, digest[:2]), f"{safe_name}-{digest[:8]}"
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """先写入同目录临时文件并 fsync，再原子替换到目标路径。"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@profiling.profiled("export")
+def render_markdown(api_path: str, script_blocks: list) -> str:
+    """将一个接口的全部脚本文本块拼成 Markdown 文档。"""
+    lines = [f"# {api_path}", "", f"用例数量: {len(script_blocks)}", ""]
+    lines.extend(script_blocks)
+    return "\n".join(lines) + "\n"
+
+
+@profiling.profiled("export")
+def render_jsonl(test_cases: list, parsed_cases: list) -> str:
+    """每行一个用例：原始参数 + 解析出的前置脚本与请求体。"""
+    lines = []
+    for case, parsed in zip(test_cases, parsed_cases):
+        record = {
+            "case_name": parsed.get("case_name") or case.get("case_name", ""),
+            "parameters": case.get("parameters", {}),
+            "pre1": parsed.get("pre1", ""),
+            "pre2": parsed.get("pre2", ""),
+            "body": parsed.get("body", ""),
+        }
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def _jsr223_preprocessor(testname: str, script: str) -> str:
+    return f"""          <JSR223PreProcessor guiclass="TestBeanGUI" testclass="JSR223PreProcessor" testname="{xml_escape(testname)}" enabled="true">
+            <stringProp name="scriptLanguage">beanshell</stringProp>
+            <stringProp name="parameters"></stringProp>
+            <stringProp name="filename"></stringProp>
+            <stringProp name="cacheKey">true</stringProp>
+            <stringProp name="script">{xml_escape(script)}</stringProp>
+          </JSR223PreProcessor>
+          <hashTree/>"""
+
+
+@profiling.profiled("export")
+def render_jmx(api_path: str, parsed_cases: list) -> str:
+    """生成可直接导入 JMeter 的测试计划：每个用例一个 HTTP 取样器，挂载两个前置脚本。"""
+    samplers = []
+    for parsed in parsed_cases:
+        children = []
+        if parsed.get("pre1"):
+            children.append(_jsr223_preprocessor("前置脚本1 - 定义数据", parsed["pre1"]))
+        children.append(_jsr223_preprocessor("前置脚本2 - 计算签名", parsed.get("pre2", "")))
+        samplers.append(f"""        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="{xml_escape(parsed.get("case_name", ""))}" enabled="true">
+          <boolProp name="HTTPSampler.postBodyRaw">true</boolProp>
+          <elementProp name="HTTPsampler.Arguments" elementType="Arguments">
+            <collectionProp name="Arguments.arguments">
+              <elementProp name="" elementType="HTTPArgument">
+                <boolProp name="HTTPArgument.always_encode">false</boolProp>
+                <stringProp name="Argument.value">{xml_escape(parsed.get("body", ""))}</stringProp>
+                <stringProp name="Argument.metadata">=</stringProp>
+              </elementProp>
+            </collectionProp>
+          </elementProp>
+          <stringProp name="HTTPSampler.domain">${{host}}</stringProp>
+          <stringProp name="HTTPSampler.protocol">${{protocol}}</stringProp>
+          <stringProp name="HTTPSampler.path">{xml_escape(api_path)}</stringProp>
+          <stringProp name="HTTPSampler.method">POST</stringProp>
+          <stringProp name="HTTPSampler.contentEncoding">UTF-8</stringProp>
+        </HTTPSamplerProxy>
+        <hashTree>
+{chr(10).join(children)}
+        </hashTree>""")
+
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="{xml_escape(api_path)}" enabled="true"/>
+    <hashTree>
+      <HeaderManager guiclass="HeaderPanel" testclass="HeaderManager" testname="HTTP信息头管理器" enabled="true">
+        <collectionProp name="HeaderManager.headers">
+          <elementProp name="" elementType="Header">
+            <stringProp name="Header.name">Content-Type</stringProp>
+            <stringProp name="Header.value">application/x-www-form-urlencoded</stringProp>
+          </elementProp>
+        </collectionProp>
+      </HeaderManager>
+      <hashTree/>
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="{xml_escape(api_path)}" enabled="true">
+        <stringProp name="ThreadGroup.num_threads">1</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">1</stringProp>
+        <elementProp name="ThreadGroup.main_controller" elementType="LoopController" guiclass="LoopControlPanel" testclass="LoopController">
+          <stringProp name="LoopController.loops">1</stringProp>
+        </elementProp>
+      </ThreadGroup>
+      <hashTree>
+{chr(10).join(samplers)}
+      </hashTree>
+    </hashTree>
+  </hashTree>
+</jmeterTestPlan>
+"""
+
+
+def render_api(job: dict, output_dir: str, formats=DEFAULT_FORMATS) -> dict:
+    """在工作进程中渲染单个接口的全部用例并写出分片文件，返回清单记录。"""
+    api_path = job["api_path"]
+    api_doc = job.get("api_doc") or {}
+    test_cases = job.get("test_cases") or []
+
+    with tracing.span(None, "render", api_path=api_path, cases=len(test_cases)):
+        script_blocks = [doubao.generate_scripts_for_case(api_doc, case) for case in test_cases]
+        parsed_cases = [doubao.parse_script_block(block) for block in script_blocks]
+
+    shard_dir, prefix = shard_path_for(output_dir, api_path)
+    files = {}
+    with tracing.span(None, "export", api_path=api_path) as span:
+        for fmt in formats:
+            if fmt == "jsonl":
+                text = render_jsonl(test_cases, parsed_cases)
+            elif fmt == "md":
+                text = render_markdown(api_path, script_blocks)
+            elif fmt == "jmx":
+                text = render_jmx(api_path, parsed_cases)
+            else:
+                raise ValueError(f"不支持的导出格式: {fmt}")
+            path = os.path.join(shard_dir, f"{prefix}.{fmt}")
+            atomic_write_text(path, text)
+            span.add("bytes_out", len(text.encode("utf-8")))
+            files[fmt] = os.path.relpath(path, output_dir)
+
+    return {
+        "api_path": api_path,
+        "input_hash": job_input_hash(job, formats),
+        "case_count": len(test_cases),
+        "files": files,
+        "completed_at": time.time(),
+    }
+
+
+def load_manifest(output_dir: str) -> dict:
+    """读取清单，返回 {api_path: record}。忽略崩溃时可能残留的不完整末行。"""
+    manifest = {}
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return manifest
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            manifest[record.get("api_path")] = record
+    return manifest
+
+
+def append_manifest(output_dir: str, record: dict) -> None:
+    """向清单追加一条完成记录并立即落盘。"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def is_completed(record: dict, job: dict, output_dir: str, formats=DEFAULT_FORMATS) -> bool:
+    """清单中的记录与当前输入一致且文件仍在时，认为该接口已完成。"""
+    if not record or record.get("input_hash") != job_input_hash(job, formats):
+        return False
+    files = record.get("files", {})
+    return all(fmt in files and os.path.exists(os.path.join(output_dir, files[fmt])) for fmt in formats)
+
+
+def export_batch(jobs, output_dir: str, workers: int = None, formats=DEFAULT_FORMATS, progress=None) -> dict:
+    """
+    多进程导出一批接口。
+
+    jobs 为可迭代的 {"api_path", "api_doc", "test_cases"}；已在清单中完成的接口会被跳过。
+    progress 为可选回调 progress(record)，在每个接口完成（或跳过）后调用。
+    返回统计信息 {"exported", "skipped", "failed"}。
+    """
+    workers = workers or os.cpu_count() or 1
+    formats = check_formats(formats)
+    manifest = load_manifest(output_dir)
+    stats = {"exported": 0, "skipped": 0, "failed": 0}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        max_in_flight = workers * 2
+
+        def drain():
+            # 等待至少一个任务完成，并把结果写入清单
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                api_path = pending.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    print(f"导出失败 {api_path}: {e}")
+                    stats["failed"] += 1
+                    continue
+                append_manifest(output_dir, record)
+                stats["exported"] += 1
+                if progress:
+                    progress(record)
+
+        for job in jobs:
+            api_path = job.get("api_path")
+            if not api_path:
+                continue
+            if is_completed(manifest.get(api_path), job, output_dir, formats):
+                stats["skipped"] += 1
+                if progress:
+                    progress(manifest[api_path])
+                continue
+            while len(pending) >= max_in_flight:
+                drain()
+            pending[pool.submit(render_api, job, output_dir, formats)] = api_path
+
+        while pending:
+            drain()
+
+    return stats
+
+
+def iter_jobs_from_path(input_path: str):
+    """从 JSONL 文件（每行一个任务）或目录（每个 *.json 一个任务）中读取导出任务。"""
+    if os.path.isdir(input_path):
+        for name in sorted(os.listdir(input_path)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(input_path, name), "r", encoding="utf-8") as f:
+                yield json.load(f)
+    else:
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程批量导出测试用例脚本（JSONL / Markdown / JMX）")
+    parser.add_argument("input", help="任务输入：JSONL 文件或包含 *.json 的目录，每个任务含 api_path、api_doc、test_cases")
+    parser.add_argument("output_dir", help="导出目录（清单文件 manifest.jsonl 也写在这里）")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认等于 CPU 核数")
+    parser.add_argument("--formats", default=",".join(DEFAULT_FORMATS), help=f"导出格式，逗号分隔：{','.join(FORMATS)}")
+    parser.add_argument("--profile", default=None, metavar="MODES",
+                        help="剖析渲染与导出阶段：cpu,stack,mem 或 all，结果写入 --profile-dir（工作进程同样开启）")
+    parser.add_argument("--profile-dir", default=None, help="剖析结果目录，默认 profiles/")
+    args = parser.parse_args()
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.profile:
+        profiling.enable(args.profile, args.profile_dir)
+
+    started = time.time()
+    stats = export_batch(iter_jobs_from_path(args.input), args.output_dir, args.workers, formats,
+                         progress=lambda record: print(f"✅ {record['api_path']} ({record['case_count']} 个用例)"))
+    elapsed = time.time() - started
+    print(f"导出完成: 新导出 {stats['exported']}，跳过 {stats['skipped']}，失败 {stats['failed']}，耗时 {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
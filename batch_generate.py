@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成：为接口列表中的每个接口生成用例并导出（JSONL / Markdown / JMX，与 batch_export 相同的分片目录结构），
+全程写入任务日志（job_journal.py）。进程中途退出后用 --resume 续跑：
+
+- 已导出的接口跳过；
+- 已生成但未导出的接口直接用日志中保存的用例导出，不再调用模型；
+- 失败的接口按 --max-attempts / --retry-delay 重试（指数退避），中断时正在进行的接口重新生成。
+"""
+
+import argparse
+import os
+import time
+import traceback
+
+import batch_export
+import case_dedup
+import doubao
+import job_journal
+import prompt_cache
+from doc_watch import load_endpoints
+from job_runner import JobRunner, STATUS_DONE, STATUS_FAILED
+
+DEFAULT_JOURNAL = "journal.jsonl"
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 10.0
+POLL_INTERVAL = 0.2
+
+
+def export_generated(journal: job_journal.Journal, output_dir: str, api_path: str, api_doc: dict, test_cases: list,
+                     formats) -> dict:
+    """渲染并写出一个接口的导出文件，记录到清单和任务日志，返回清单记录。"""
+    record = batch_export.render_api({"api_path": api_path, "api_doc": api_doc, "test_cases": test_cases},
+                                     output_dir, formats)
+    batch_export.append_manifest(output_dir, record)
+    journal.append(job_journal.EVENT_EXPORTED, api_path=api_path, files=record["files"],
+                   case_count=record["case_count"])
+    return record
+
+
+def run_batch(endpoints: list, output_dir: str, journal_path: str, test_data_file: str, resume: bool = False,
+              workers: int = 3, model: str = None, api_key: str = None, doc_base_url: str = None,
+              llm_base_url: str = None, case_db: str = None, usage_db: str = None,
+              formats=batch_export.DEFAULT_FORMATS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+              retry_delay: float = DEFAULT_RETRY_DELAY, dedup: str = "exact",
+              context_cache: str = None) -> dict:
+    """执行（或续跑）一次批量生成，返回 {"exported", "skipped", "failed", "llm_runs"}。"""
+    formats = batch_export.check_formats(formats)
+    batch, states = job_journal.replay(job_journal.read_records(journal_path))
+    if (batch or states) and not resume:
+        raise ValueError(f"任务日志已存在: {journal_path}，使用 --resume 续跑或换一个输出目录")
+    journal = job_journal.Journal(journal_path)
+    if batch is None:
+        batch_id = time.strftime("batch-%Y%m%d-%H%M%S")
+        journal.append(job_journal.EVENT_BATCH, batch_id=batch_id, endpoints=len(endpoints), model=model)
+    else:
+        batch_id = batch["batch_id"]
+        print(f"续跑批次 {batch_id}")
+
+    stats = {"exported": 0, "skipped": 0, "failed": 0, "llm_runs": 0}
+    attempts = {}
+    to_generate = []
+    for api_path in endpoints:
+        state = states.get(api_path)
+        attempts[api_path] = state.attempts if state else 0
+        if state is None:
+            to_generate.append(api_path)
+        elif state.exported:
+            stats["skipped"] += 1
+        elif state.generated:
+            try:
+                export_generated(journal, output_dir, api_path, state.api_doc, state.test_cases, formats)
+                stats["exported"] += 1
+                print(f"✅ {api_path}（使用日志中的 {len(state.test_cases)} 个用例导出）")
+            except Exception as e:
+                print(f"❌ 导出失败 {api_path}: {e}")
+                stats["failed"] += 1
+        elif state.status == STATUS_FAILED and state.attempts >= max_attempts:
+            print(f"⏭️ {api_path} 已失败 {state.attempts} 次，不再重试: {state.error}")
+            stats["failed"] += 1
+        else:
+            to_generate.append(api_path)
+
+    runner = JobRunner(workers, usage_db=usage_db, journal=journal)
+    active = {}
+    retry_at = {}
+
+    def submit(api_path: str) -> None:
+        attempts[api_path] += 1
+        stats["llm_runs"] += 1
+        job = runner.submit(api_path, test_data_file, api_key=api_key, model=model, llm_base_url=llm_base_url,
+                            doc_base_url=doc_base_url, render_scripts=False, case_db=case_db, batch_id=batch_id,
+                            dedup=dedup, context_cache=context_cache)
+        active[job.id] = job
+
+    try:
+        for api_path in to_generate:
+            submit(api_path)
+        while active or retry_at:
+            for job_id, job in list(active.items()):
+                if not job.finished:
+                    continue
+                del active[job_id]
+                if job.status == STATUS_DONE:
+                    try:
+                        export_generated(journal, output_dir, job.api_path, job.result["api_doc"],
+                                         job.result["test_cases"], formats)
+                        stats["exported"] += 1
+                        print(f"✅ {job.api_path}（{job.message}）")
+                    except Exception:
+                        print(f"❌ 导出失败 {job.api_path}: {traceback.format_exc()}")
+                        stats["failed"] += 1
+                elif attempts[job.api_path] < max_attempts:
+                    delay = retry_delay * 2 ** (attempts[job.api_path] - 1)
+                    print(f"⚠️ {job.api_path} 第 {attempts[job.api_path]} 次失败（{job.error}），{delay:.0f}s 后重试")
+                    retry_at[job.api_path] = time.time() + delay
+                else:
+                    print(f"❌ {job.api_path} 失败 {attempts[job.api_path]} 次: {job.error}")
+                    stats["failed"] += 1
+            now = time.time()
+            for api_path, due in list(retry_at.items()):
+                if due <= now:
+                    del retry_at[api_path]
+                    submit(api_path)
+            runner.remove_finished()
+            time.sleep(POLL_INTERVAL)
+    finally:
+        runner.shutdown(cancel_pending=True)
+        journal.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成并导出用例，写入任务日志，中断后可续跑")
+    parser.add_argument("endpoints", help="接口列表文件（每行一个接口路径）")
+    parser.add_argument("output_dir", help="导出目录（清单 manifest.jsonl 与任务日志也写在这里）")
+    parser.add_argument("--resume", action="store_true", help="按任务日志续跑：跳过已完成的接口，重试失败的接口")
+    parser.add_argument("--journal", default=None, help=f"任务日志路径，默认 <output_dir>/{DEFAULT_JOURNAL}")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="每个接口最多生成几次")
+    parser.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_DELAY, help="首次重试前等待的秒数（之后逐次加倍）")
+    parser.add_argument("--workers", type=int, default=3, help="同时进行的生成任务数")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--model", default=doubao.DEFAULT_MODEL, help="生成用例使用的模型")
+    parser.add_argument("--doc-base-url", default=None, help="文档服务器地址，默认 doubao.BASE_DOC_URL")
+    parser.add_argument("--llm-base-url", default=None, help="模型服务地址，默认 doubao.DOUBAO_BASE_URL")
+    parser.add_argument("--case-db", default="case_store.db", help="生成用例库，空字符串表示不使用")
+    parser.add_argument("--usage-db", default="llm_usage.db", help="模型调用 token 用量库，空字符串表示不记录")
+    parser.add_argument("--formats", default=",".join(batch_export.DEFAULT_FORMATS),
+                        help=f"导出格式，逗号分隔：{','.join(batch_export.FORMATS)}")
+    parser.add_argument("--dedup", choices=case_dedup.MODES, default=case_dedup.DEFAULT_MODE,
+                        help="生成用例后的去重模式：exact 合并请求相同的用例，classes 合并同类字面量，minimize 覆盖保持精简")
+    parser.add_argument("--context-cache", choices=prompt_cache.MODES, default=None,
+                        help="提示词前缀缓存：context 使用豆包上下文缓存，批次内共用的设计说明和变量库只发送一次")
+    args = parser.parse_args()
+
+    try:
+        formats = batch_export.parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    endpoints = load_endpoints(args.endpoints)
+    journal_path = args.journal or os.path.join(args.output_dir, DEFAULT_JOURNAL)
+    started = time.time()
+    try:
+        stats = run_batch(endpoints, args.output_dir, journal_path, args.test_data, args.resume, args.workers,
+                          args.model, doc_base_url=args.doc_base_url, llm_base_url=args.llm_base_url,
+                          case_db=args.case_db or None, usage_db=args.usage_db or None, formats=formats,
+                          max_attempts=args.max_attempts, retry_delay=args.retry_delay, dedup=args.dedup,
+                          context_cache=args.context_cache)
+    except ValueError as e:
+        print(e)
+        return
+    except KeyboardInterrupt:
+        print(f"\n已中断，进度保存在 {journal_path}，使用 --resume 续跑")
+        return
+    print(f"批量生成完成: 导出 {stats['exported']}，跳过 {stats['skipped']}，失败 {stats['failed']}，"
+          f"调用模型生成 {stats['llm_runs']} 次，耗时 {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+虚拟化用例浏览器：按 接口 → 用例 两级展示大量生成结果。
+
+只为可见的行创建画布元素（固定行高，滚动时复用同一组元素），因此无论结果有多少条，
+滚动、选择和重绘的耗时都只与窗口高度有关。搜索框按用例名和参数值增量过滤：
+新关键字是上一次的延长时只在上一次的命中结果中继续筛选。
+"""
+
+import json
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+ROW_HEIGHT = 22
+SEARCH_DELAY_MS = 150
+INDENT = 18
+
+ROW_API = "api"
+ROW_CASE = "case"
+
+
+def case_search_text(test_case: dict) -> str:
+    """用于搜索的文本：用例名 + 参数名与参数值（小写）。"""
+    parts = [str(test_case.get("case_name", ""))]
+    for name, value in (test_case.get("parameters") or {}).items():
+        if not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False)
+        parts.append(f"{name}={value}")
+    return "\n".join(parts).lower()
+
+
+class CaseBrowser(ttk.Frame):
+    """
+    on_select(api_path, index) 在选中用例行时调用（index 为该接口 test_cases 中的下标）。
+    """
+
+    def __init__(self, master, on_select=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_select = on_select
+
+        # api_path -> {"cases": [...], "search": [...] 或 None, "expanded": bool}
+        self._groups = {}
+        self._rows = []
+        # (api_path, index) -> 在 _rows 中的位置，选择与键盘导航无需遍历
+        self._row_of = {}
+        self._top = 0
+        self._selected = None
+        self._hover_row = None
+        self._query = ""
+        # 增量搜索：上一次的关键字及其命中的 {api_path: [index, ...]}
+        self._last_query = ""
+        self._last_matches = None
+        self._search_job = None
+        self._slots = []
+        self._bold_font = tkfont.nametofont("TkDefaultFont").copy()
+        self._bold_font.configure(weight="bold")
+
+        search_row = ttk.Frame(self)
+        search_row.pack(fill=tk.X)
+        ttk.Label(search_row, text="搜索:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        ttk.Entry(search_row, textvariable=self.search_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=4)
+        self.count_var = tk.StringVar(value="0 个用例")
+        ttk.Label(search_row, textvariable=self.count_var).pack(side=tk.RIGHT)
+        self.search_var.trace_add("write", self._on_search_change)
+
+        list_frame = ttk.Frame(self)
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=(4, 0))
+        self.canvas = tk.Canvas(list_frame, background="white", highlightthickness=0, takefocus=1)
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self._render())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Motion>", self._on_motion)
+        self.canvas.bind("<Leave>", lambda e: self._set_hover(None))
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self._scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll_rows(3))
+        self.canvas.bind("<Up>", lambda e: self.move_selection(-1))
+        self.canvas.bind("<Down>", lambda e: self.move_selection(1))
+        self.canvas.bind("<Prior>", lambda e: self._scroll_rows(-self._visible_count()))
+        self.canvas.bind("<Next>", lambda e: self._scroll_rows(self._visible_count()))
+
+    # --- 数据 ---
+
+    def set_cases(self, api_path: str, test_cases: list) -> None:
+        """添加或替换一个接口的用例"""
+        group = self._groups.get(api_path)
+        expanded = group["expanded"] if group else True
+        self._groups[api_path] = {"cases": list(test_cases), "search": None, "expanded": expanded}
+        if self._selected and self._selected[0] == api_path and self._selected[1] >= len(test_cases):
+            self._selected = None
+        self._invalidate_search()
+        self._rebuild_rows()
+
+    def remove(self, api_path: str) -> None:
+        if self._groups.pop(api_path, None) is not None:
+            if self._selected and self._selected[0] == api_path:
+                self._selected = None
+            self._invalidate_search()
+            self._rebuild_rows()
+
+    def clear(self) -> None:
+        self._groups.clear()
+        self._selected = None
+        self._invalidate_search()
+        self._rebuild_rows()
+
+    def api_paths(self) -> list:
+        return list(self._groups)
+
+    # --- 搜索 ---
+
+    def _invalidate_search(self) -> None:
+        self._last_query = ""
+        self._last_matches = None
+
+    def _on_search_change(self, *args):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DELAY_MS, self._apply_search)
+
+    def _apply_search(self):
+        self._search_job = None
+        self._query = self.search_var.get().strip().lower()
+        self._top = 0
+        self._rebuild_rows()
+
+    def _matches(self) -> dict:
+        """返回 {api_path: [命中的用例下标]}；无关键字时返回 None 表示全部。"""
+        query = self._query
+        if not query:
+            return None
+        if self._last_matches is not None and self._last_query and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            candidates = {api_path: range(len(group["cases"])) for api_path, group in self._groups.items()}
+        matches = {}
+        for api_path, indexes in candidates.items():
+            group = self._groups[api_path]
+            if group["search"] is None:
+                group["search"] = [case_search_text(case) for case in group["cases"]]
+            texts = group["search"]
+            api_hit = query in api_path.lower()
+            hits = list(indexes) if api_hit else [i for i in indexes if query in texts[i]]
+            if hits:
+                matches[api_path] = hits
+        self._last_query, self._last_matches = query, matches
+        return matches
+
+    def _rebuild_rows(self) -> None:
+        """根据展开状态和搜索结果重建扁平的行列表（只存下标，不创建控件）"""
+        matches = self._matches()
+        rows = []
+        total = 0
+        for api_path, group in self._groups.items():
+            indexes = range(len(group["cases"])) if matches is None else matches.get(api_path)
+            if not indexes:
+                continue
+            total += len(indexes)
+            rows.append((ROW_API, api_path, len(indexes)))
+            # 搜索时总是展开，便于看到命中的用例
+            if group["expanded"] or matches is not None:
+                rows.extend((ROW_CASE, api_path, index) for index in indexes)
+        self._rows = rows
+        self._row_of = {(row[1], row[2]): i for i, row in enumerate(rows) if row[0] == ROW_CASE}
+        self.count_var.set(f"{total} 个用例" if matches is None else f"命中 {total} 个用例")
+        self._top = max(0, min(self._top, self._max_top()))
+        self._render()
+
+    # --- 渲染 ---
+
+    def _visible_count(self) -> int:
+        return max(1, self.canvas.winfo_height() // ROW_HEIGHT + 1)
+
+    def _max_top(self) -> int:
+        # 可见行数包含底部半行，滚到底时最后一行完整显示
+        return len(self._rows) - self._visible_count() + 1
+
+    def _ensure_slots(self, count: int) -> None:
+        width = 4000
+        while len(self._slots) < count:
+            y = len(self._slots) * ROW_HEIGHT
+            rect = self.canvas.create_rectangle(0, y, width, y + ROW_HEIGHT, outline="", fill="white")
+            text = self.canvas.create_text(4, y + ROW_HEIGHT // 2, anchor=tk.W, text="")
+            self._slots.append((rect, text))
+
+    def _render(self) -> None:
+        """只重绘可见行：复用固定数量的画布元素，更新其文字和颜色"""
+        count = self._visible_count()
+        self._ensure_slots(count)
+        for slot, (rect, text) in enumerate(self._slots):
+            row_index = self._top + slot
+            if slot >= count or row_index >= len(self._rows):
+                self.canvas.itemconfigure(rect, fill="white")
+                self.canvas.itemconfigure(text, text="")
+                continue
+            kind, api_path, value = self._rows[row_index]
+            if kind == ROW_API:
+                group = self._groups[api_path]
+                arrow = "▼" if group["expanded"] or self._query else "▶"
+                label = f"{arrow} {api_path}  ({value})"
+                fill, font, x = "#eef2f7", self._bold_font, 4
+            else:
+                case = self._groups[api_path]["cases"][value]
+                label = f"{value + 1}. {case.get('case_name', '未命名用例')}"
+                fill, font, x = "white", "TkDefaultFont", 4 + INDENT
+                if self._selected == (api_path, value):
+                    fill = "#cce0ff"
+                elif self._hover_row == row_index:
+                    fill = "#f3f7fc"
+            self.canvas.itemconfigure(rect, fill=fill)
+            self.canvas.itemconfigure(text, text=label, font=font)
+            self.canvas.coords(text, x, slot * ROW_HEIGHT + ROW_HEIGHT // 2)
+        self._update_scrollbar(count)
+
+    def _update_scrollbar(self, count: int) -> None:
+        total = len(self._rows)
+        if total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + count) / total))
+
+    # --- 滚动 ---
+
+    def yview(self, *args):
+        """滚动条回调：支持 moveto 与 scroll units/pages"""
+        if not args:
+            return
+        total = len(self._rows)
+        if args[0] == "moveto":
+            self._set_top(int(float(args[1]) * total))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            step = self._visible_count() - 1 if args[2] == "pages" else 1
+            self._scroll_rows(amount * max(1, step))
+
+    def _scroll_rows(self, delta: int) -> None:
+        self._set_top(self._top + delta)
+
+    def _set_top(self, top: int) -> None:
+        top = max(0, min(top, self._max_top()))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _on_mousewheel(self, event):
+        self._scroll_rows(-3 if event.delta > 0 else 3)
+
+    # --- 交互 ---
+
+    def _row_at(self, y: int):
+        row_index = self._top + int(y) // ROW_HEIGHT
+        return row_index if 0 <= row_index < len(self._rows) else None
+
+    def _set_hover(self, row_index) -> None:
+        if row_index != self._hover_row:
+            self._hover_row = row_index
+            self._render()
+
+    def _on_motion(self, event):
+        self._set_hover(self._row_at(event.y))
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        row_index = self._row_at(event.y)
+        if row_index is None:
+            return
+        kind, api_path, value = self._rows[row_index]
+        if kind == ROW_API:
+            if not self._query:
+                group = self._groups[api_path]
+                group["expanded"] = not group["expanded"]
+                self._rebuild_rows()
+            return
+        self.select(api_path, value)
+
+    def select(self, api_path: str, index: int, notify: bool = True) -> None:
+        """选中一个用例并滚动到可见位置"""
+        self._selected = (api_path, index)
+        row_index = self._row_of.get((api_path, index))
+        if row_index is not None:
+            count = self._visible_count() - 1
+            if row_index < self._top:
+                self._top = row_index
+            elif row_index >= self._top + count:
+                self._top = row_index - count + 1
+        self._render()
+        if notify and self.on_select:
+            self.on_select(api_path, index)
+
+    def move_selection(self, delta: int) -> None:
+        """在当前可见的用例行中上下移动选择"""
+        current = self._row_of.get(self._selected) if self._selected else None
+        row_index = -1 if current is None else current
+        step = 1 if delta > 0 or current is None else -1
+        for _ in range(abs(delta) or 1):
+            candidate = row_index + step
+            # 跳过接口标题行
+            while 0 <= candidate < len(self._rows) and self._rows[candidate][0] != ROW_CASE:
+                candidate += step
+            if not 0 <= candidate < len(self._rows):
+                break
+            row_index = candidate
+        if row_index >= 0 and row_index != current:
+            _, api_path, index = self._rows[row_index]
+            self.select(api_path, index)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用例去重与精简：模型输出中常有参数完全相同、只是 case_name 不同的用例，或只在无关字面量上不同的负向用例，
+每个重复用例都要多花渲染、JMeter 执行和评审时间。design_knowledge_driven_cases 之后按以下模式处理：
+
+- exact（默认）：参数规范化（键排序、类 JSON 字面量压缩为紧凑 JSON、标量按渲染结果取字符串）后哈希，
+  请求完全相同的用例只保留第一个；
+- classes：再按 参数 → 取值类别（变量引用 / 数字 / 文本 / 空值 / JSON 结构……）合并，
+  只在同类字面量上不同的用例视为等价；
+- minimize：在 classes 的基础上做覆盖保持的精简（贪心集合覆盖），保留能覆盖全部
+  参数、变量引用和 参数 × 取值类别 的最少用例；
+- off：不处理。
+
+负向取值单独成类：负数 / 零、空串 / 空值、超长文本，以及（传入 API 文档时）文档中有、用例里缺省的参数。
+只在这些负向类别上不同的用例签名不同，不会被合并；精简时每种负向组合（以及全为正向取值）都至少保留一个用例。
+"""
+
+import argparse
+import hashlib
+import json
+import re
+
+import doubao
+import var_refs
+
+MODES = ("off", "exact", "classes", "minimize")
+DEFAULT_MODE = "exact"
+
+_NUMBER = re.compile(r"-?\d+(\.\d+)?([eE][-+]?\d+)?")
+_BOOL = ("true", "false")
+_NULL = ("null", "none", "nil")
+# 超过该长度的文本视为超长取值（负向类别）
+LONG_TEXT_LENGTH = 128
+ABSENT = "absent"
+NEGATIVE_CLASSES = ("number:negative", "number:zero", "empty", "null", "text:long", ABSENT)
+
+
+def _sorted_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def canonical_value(value) -> str:
+    """参数值的规范形式：dict / list 与类 JSON 字符串为键排序的紧凑 JSON，其它标量为渲染到请求体中的字符串。"""
+    if isinstance(value, (dict, list)):
+        return _sorted_json(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text[:1] in ("{", "[") and "${" not in text:
+            compact = doubao._normalize_json_like_to_compact_text(text)
+            try:
+                return _sorted_json(json.loads(compact))
+            except ValueError:
+                return compact
+        return value
+    return str(value)
+
+
+def canonical_params(parameters: dict) -> str:
+    """按参数名排序的规范化参数文本，用于判断两个用例的请求是否相同。"""
+    return _sorted_json({name: canonical_value(value) for name, value in (parameters or {}).items()})
+
+
+def params_hash(parameters: dict) -> str:
+    return hashlib.sha256(canonical_params(parameters).encode("utf-8")).hexdigest()
+
+
+def _json_shape(value) -> str:
+    if isinstance(value, dict):
+        return "{" + ",".join(sorted(value)) + "}"
+    if isinstance(value, list):
+        return "[]"
+    return type(value).__name__
+
+
+def _number_class(number: float) -> str:
+    if number < 0:
+        return "number:negative"
+    if number == 0:
+        return "number:zero"
+    return "number"
+
+
+def value_class(value) -> str:
+    """参数值的类别：var:<变量名>、number、number:negative、number:zero、bool、null、empty、json:<结构>、text、text:long。"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return _number_class(value)
+    if isinstance(value, (dict, list)):
+        return "json:" + _json_shape(value)
+    text = str(value).strip()
+    if not text:
+        return "empty"
+    refs = var_refs.references(text)
+    if refs and text.startswith("${"):
+        return "var:" + ",".join(refs)
+    lowered = text.lower()
+    if lowered in _BOOL:
+        return "bool"
+    if lowered in _NULL:
+        return "null"
+    if _NUMBER.fullmatch(text):
+        return _number_class(float(text))
+    if text[:1] in ("{", "["):
+        try:
+            return "json:" + _json_shape(json.loads(canonical_value(text)))
+        except ValueError:
+            pass
+    return "text:long" if len(text) > LONG_TEXT_LENGTH else "text"
+
+
+def doc_param_names(api_doc: dict) -> list:
+    """API 文档中的顶层参数名。"""
+    return [arg["name"] for arg in (api_doc or {}).get("request", {}).get("args", [])
+            if isinstance(arg, dict) and arg.get("name")]
+
+
+def param_classes(parameters: dict, param_names: list = ()) -> dict:
+    """参数 → 取值类别；param_names（文档中的参数）里用例缺省的参数记为 absent。"""
+    classes = {name: value_class(value) for name, value in (parameters or {}).items()}
+    for name in param_names:
+        classes.setdefault(name, ABSENT)
+    return classes
+
+
+def class_signature(parameters: dict, param_names: list = ()) -> str:
+    """参数 → 取值类别 的签名；只在同类字面量上不同的用例签名相同。"""
+    return _sorted_json(param_classes(parameters, param_names))
+
+
+def coverage_features(parameters: dict, param_names: list = ()) -> set:
+    """用例覆盖的特征：出现的参数、引用的变量、参数 × 取值类别（含缺省），以及整体的负向类别组合。"""
+    classes = param_classes(parameters, param_names)
+    features = {("class", name, cls) for name, cls in classes.items()}
+    features.update(("param", name) for name in (parameters or {}))
+    for value in (parameters or {}).values():
+        if isinstance(value, str):
+            features.update(("var", var) for var in var_refs.references(value))
+    # 负向类别组合（空集即全部为正向取值）各需一个用例覆盖，正向基线用例不会被负向用例精简掉
+    features.add(("negative", frozenset((name, cls) for name, cls in classes.items() if cls in NEGATIVE_CLASSES)))
+    return features
+
+
+def _collapse(test_cases: list, key, kept_indexes: list, duplicates: list) -> list:
+    """按 key(parameters) 合并，保留每组第一个；duplicates 追加 (被合并的下标, 保留的下标)。"""
+    first = {}
+    result = []
+    for index in kept_indexes:
+        signature = key(test_cases[index].get("parameters"))
+        if signature in first:
+            duplicates.append((index, first[signature]))
+            continue
+        first[signature] = index
+        result.append(index)
+    return result
+
+
+def minimize_cover(test_cases: list, indexes: list, param_names: list = ()) -> list:
+    """贪心集合覆盖：每次选覆盖最多未覆盖特征的用例（平局取靠前的），直到覆盖全部特征，按原顺序返回。"""
+    features = {index: coverage_features(test_cases[index].get("parameters"), param_names) for index in indexes}
+    uncovered = set().union(*features.values()) if features else set()
+    chosen = []
+    while uncovered:
+        best = max(indexes, key=lambda i: (len(features[i] & uncovered), -i))
+        gained = features[best] & uncovered
+        if not gained:
+            break
+        chosen.append(best)
+        uncovered -= gained
+    return sorted(chosen)
+
+
+def dedup_cases(test_cases: list, mode: str = DEFAULT_MODE, api_doc: dict = None) -> tuple:
+    """按模式去重 / 精简，返回 (保留的用例, 报告)。
+
+    传入 api_doc 时，文档中有而用例缺省的参数按 absent 类别参与 classes / minimize。
+    报告为 {"mode", "input", "kept", "duplicates": [(下标, 与之等价的保留下标)], "minimized": [被精简掉的下标]}。
+    """
+    if mode not in MODES:
+        raise ValueError(f"未知的去重模式: {mode}")
+    report = {"mode": mode, "input": len(test_cases or []), "kept": len(test_cases or []),
+              "duplicates": [], "minimized": []}
+    if mode == "off" or not test_cases:
+        return list(test_cases or []), report
+
+    indexes = [i for i, case in enumerate(test_cases) if isinstance(case, dict)]
+    indexes = _collapse(test_cases, canonical_params, indexes, report["duplicates"])
+    param_names = doc_param_names(api_doc)
+    if mode in ("classes", "minimize"):
+        indexes = _collapse(test_cases, lambda parameters: class_signature(parameters, param_names), indexes,
+                            report["duplicates"])
+    if mode == "minimize":
+        chosen = minimize_cover(test_cases, indexes, param_names)
+        report["minimized"] = [i for i in indexes if i not in set(chosen)]
+        indexes = chosen
+    report["kept"] = len(indexes)
+    return [test_cases[i] for i in indexes], report
+
+
+def format_report(report: dict) -> str:
+    """单行摘要，例如 "去重 12 → 9（合并 2 个重复，精简 1 个）"；没有变化时返回空串。"""
+    if report["kept"] == report["input"]:
+        return ""
+    text = f"去重 {report['input']} → {report['kept']}（合并 {len(report['duplicates'])} 个重复"
+    if report["minimized"]:
+        text += f"，精简 {len(report['minimized'])} 个"
+    return text + "）"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用例去重与覆盖保持的精简")
+    parser.add_argument("cases", help="用例 JSON 文件（design_knowledge_driven_cases 的输出格式）")
+    parser.add_argument("--mode", choices=MODES, default="minimize", help="去重模式")
+    parser.add_argument("--api-doc", default=None, help="API 文档 JSON 文件，用于识别用例缺省的参数")
+    parser.add_argument("--output", default=None, help="把保留的用例写入 JSON 文件")
+    args = parser.parse_args()
+
+    with open(args.cases, "r", encoding="utf-8") as f:
+        test_cases = json.load(f)
+    api_doc = None
+    if args.api_doc:
+        with open(args.api_doc, "r", encoding="utf-8") as f:
+            api_doc = json.load(f)
+    kept, report = dedup_cases(test_cases, args.mode, api_doc)
+    for index, same_as in report["duplicates"]:
+        print(f"合并 #{index} {test_cases[index].get('case_name', '')} → #{same_as} {test_cases[same_as].get('case_name', '')}")
+    for index in report["minimized"]:
+        print(f"精简 #{index} {test_cases[index].get('case_name', '')}")
+    print(format_report(report) or f"{len(test_cases)} 个用例没有重复")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(kept, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
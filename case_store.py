@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成用例库：把每次生成的用例按 接口路径、API 文档内容哈希、变量库哈希、模型 和时间存入本地 SQLite（WAL 模式）。
+
+文档与变量库都没有变化时直接复用已有用例，不再调用大模型；只有文档变化时按文档差异增量更新（见 doc_diff.py）。
+GUI 启动时也从这里加载各接口最近一次的结果。
+WAL 模式下读写互不阻塞，多个生成任务可各自打开连接并发写入。
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_DB = "case_store.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    api_path TEXT NOT NULL,
+    doc_hash TEXT NOT NULL,
+    library_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    case_count INTEGER NOT NULL,
+    api_doc TEXT NOT NULL,
+    related_models TEXT NOT NULL DEFAULT '{}',
+    test_cases TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_generations_key ON generations(api_path, doc_hash, library_hash, model, created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_latest ON generations(api_path, created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_lineage ON generations(api_path, library_hash, model, created_at);
+"""
+
+
+def connect(db_path: str = DEFAULT_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """为旧版本创建的库补充新增的列"""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(generations)")}
+    if "related_models" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE generations ADD COLUMN related_models TEXT NOT NULL DEFAULT '{}'")
+
+
+def content_hash(value) -> str:
+    """内容哈希：dict/list 先按键排序序列化，字符串直接计算，保证同样的内容得到同样的哈希。"""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "api_path": row["api_path"],
+        "doc_hash": row["doc_hash"],
+        "library_hash": row["library_hash"],
+        "model": row["model"],
+        "created_at": row["created_at"],
+        "api_doc": json.loads(row["api_doc"]),
+        "related_models": json.loads(row["related_models"]),
+        "test_cases": json.loads(row["test_cases"]),
+    }
+
+
+def save_cases(conn: sqlite3.Connection, api_path: str, api_doc: dict, test_data_json: str, model: str,
+               test_cases: list, related_models: dict = None) -> int:
+    """保存一次生成结果，返回记录 ID。related_models 为生成时引用的复杂对象模型，供之后比较文档差异。"""
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO generations (api_path, doc_hash, library_hash, model, created_at, case_count, api_doc,"
+            " related_models, test_cases) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (api_path, content_hash(api_doc), content_hash(test_data_json), model, time.time(), len(test_cases),
+             json.dumps(api_doc, ensure_ascii=False), json.dumps(related_models or {}, ensure_ascii=False),
+             json.dumps(test_cases, ensure_ascii=False)))
+    return cursor.lastrowid
+
+
+def find_cases(conn: sqlite3.Connection, api_path: str, api_doc: dict, test_data_json: str, model: str) -> dict:
+    """查找文档、变量库和模型都相同的最近一次生成结果，没有时返回 None。"""
+    row = conn.execute(
+        "SELECT * FROM generations WHERE api_path = ? AND doc_hash = ? AND library_hash = ? AND model = ?"
+        " ORDER BY created_at DESC LIMIT 1",
+        (api_path, content_hash(api_doc), content_hash(test_data_json), model)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def previous_cases(conn: sqlite3.Connection, api_path: str, test_data_json: str, model: str) -> dict:
+    """查找变量库和模型相同的最近一次生成（文档可能已变化），用于增量更新；没有时返回 None。"""
+    row = conn.execute(
+        "SELECT * FROM generations WHERE api_path = ? AND library_hash = ? AND model = ?"
+        " ORDER BY created_at DESC LIMIT 1",
+        (api_path, content_hash(test_data_json), model)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def latest_cases(conn: sqlite3.Connection, api_path: str = None) -> list:
+    """返回每个接口最近一次的生成结果（按接口路径排序）；指定 api_path 时只返回该接口。"""
+    query = ("SELECT g.* FROM generations g JOIN ("
+             " SELECT api_path, MAX(created_at) AS created_at FROM generations {where} GROUP BY api_path"
+             ") latest ON g.api_path = latest.api_path AND g.created_at = latest.created_at ORDER BY g.api_path")
+    if api_path:
+        rows = conn.execute(query.format(where="WHERE api_path = ?"), (api_path,)).fetchall()
+    else:
+        rows = conn.execute(query.format(where="")).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+def prune(conn: sqlite3.Connection, keep: int = 3) -> int:
+    """每个接口只保留最近 keep 次生成，返回删除的记录数。"""
+    with conn:
+        cursor = conn.execute(
+            "DELETE FROM generations WHERE id IN ("
+            " SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY api_path ORDER BY created_at DESC) AS rn"
+            " FROM generations) WHERE rn > ?)", (keep,))
+    return cursor.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成用例库（SQLite）")
+    parser.add_argument("--db", default=DEFAULT_DB, help="用例库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="列出每个接口最近一次的生成")
+
+    show = sub.add_parser("show", help="输出某个接口最近一次生成的用例（JSON）")
+    show.add_argument("api_path")
+
+    prune_parser = sub.add_parser("prune", help="每个接口只保留最近几次生成")
+    prune_parser.add_argument("--keep", type=int, default=3)
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "list":
+        for row in conn.execute(
+                "SELECT api_path, model, case_count, MAX(created_at) AS created_at, COUNT(*) AS versions"
+                " FROM generations GROUP BY api_path ORDER BY api_path"):
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created_at"]))
+            print(f"{row['api_path']}  {row['case_count']} 个用例  {row['model']}  {created}  （共 {row['versions']} 个版本）")
+    elif args.command == "show":
+        found = latest_cases(conn, args.api_path)
+        if not found:
+            print(f"用例库中没有接口 {args.api_path}")
+            return
+        print(json.dumps(found[0]["test_cases"], ensure_ascii=False, indent=2))
+    elif args.command == "prune":
+        print(f"已删除 {prune(conn, args.keep)} 条旧记录")
+
+
+if __name__ == "__main__":
+    main()
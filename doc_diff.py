@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 文档差异：比较两版文档的 request.args（以及 type.url 引用的复杂对象模型字段），
+把每处变化归类为 新增 / 删除 / 类型变化 / 描述变化，并找出受影响的已有用例。
+
+增量重新生成（doubao.regenerate_incrementally）据此只处理受影响的用例：
+- 删除的参数：直接从用例中去掉，不调用大模型；参数全部被删除的用例随之删除；
+- 类型或描述变化：用针对性的小提示词重新生成引用了该参数的用例；
+- 新增参数：为其补充少量新用例；若为必填参数，同时为已有用例补上取值。
+"""
+
+import argparse
+import json
+
+ADDED = "added"
+REMOVED = "removed"
+TYPE_CHANGED = "type_changed"
+DESCRIPTION_CHANGED = "description_changed"
+
+CHANGE_LABELS = {
+    ADDED: "新增",
+    REMOVED: "删除",
+    TYPE_CHANGED: "类型变化",
+    DESCRIPTION_CHANGED: "描述变化",
+}
+
+# 模型文档中字段列表可能出现的键
+MODEL_FIELD_KEYS = ("fields", "args", "properties", "params")
+
+
+def _type_signature(arg_type) -> str:
+    """参数类型的可比较表示：模型类型以其 url 区分，其它类型序列化为紧凑 JSON。"""
+    if isinstance(arg_type, dict):
+        if arg_type.get("url"):
+            return f"model:{arg_type['url']}"
+        return json.dumps(arg_type, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return "" if arg_type is None else str(arg_type)
+
+
+def _field_list(doc) -> list:
+    if not isinstance(doc, dict):
+        return []
+    request_args = (doc.get("request") or {}).get("args") if isinstance(doc.get("request"), dict) else None
+    if isinstance(request_args, list):
+        return request_args
+    for key in MODEL_FIELD_KEYS:
+        if isinstance(doc.get(key), list):
+            return doc[key]
+    return []
+
+
+def _model_available(models: dict, param: str) -> bool:
+    model_doc = (models or {}).get(param)
+    return isinstance(model_doc, dict) and "_error" not in model_doc
+
+
+def flatten_args(api_doc: dict, related_models: dict = None) -> dict:
+    """
+    把参数展开为 {路径: {"type", "description", "required"}}。
+    顶层参数路径为参数名；复杂对象参数的模型字段路径为 "参数名.字段名"。
+    """
+    flat = {}
+    for arg in _field_list(api_doc):
+        if not isinstance(arg, dict) or not arg.get("name"):
+            continue
+        name = arg["name"]
+        flat[name] = {
+            "type": _type_signature(arg.get("type")),
+            "description": str(arg.get("description") or "").strip(),
+            "required": bool(arg.get("required")),
+        }
+        if _model_available(related_models, name):
+            for field in _field_list(related_models[name]):
+                if isinstance(field, dict) and field.get("name"):
+                    flat[f"{name}.{field['name']}"] = {
+                        "type": _type_signature(field.get("type")),
+                        "description": str(field.get("description") or "").strip(),
+                        "required": bool(field.get("required")),
+                    }
+    return flat
+
+
+def diff_docs(old_doc: dict, new_doc: dict, old_models: dict = None, new_models: dict = None) -> list:
+    """
+    比较两版文档，返回变化列表 [{"kind", "path", "param", "old", "new"}]，按路径排序。
+    param 为顶层参数名（用例 parameters 中的键）；模型获取失败的一侧不参与字段比较。
+    """
+    old_flat = flatten_args(old_doc, old_models)
+    new_flat = flatten_args(new_doc, new_models)
+    changes = []
+    for path in sorted(set(old_flat) | set(new_flat)):
+        param = path.split(".", 1)[0]
+        # 任一侧模型缺失时只比较顶层参数，避免把"获取失败"误判为字段删除/新增
+        if path != param and not (_model_available(old_models, param) and _model_available(new_models, param)):
+            continue
+        old, new = old_flat.get(path), new_flat.get(path)
+        if old is None:
+            changes.append({"kind": ADDED, "path": path, "param": param, "old": None, "new": new})
+        elif new is None:
+            changes.append({"kind": REMOVED, "path": path, "param": param, "old": old, "new": None})
+        elif old["type"] != new["type"]:
+            changes.append({"kind": TYPE_CHANGED, "path": path, "param": param, "old": old, "new": new})
+        elif old["description"] != new["description"]:
+            changes.append({"kind": DESCRIPTION_CHANGED, "path": path, "param": param, "old": old, "new": new})
+    return changes
+
+
+def plan_update(test_cases: list, changes: list) -> dict:
+    """
+    根据变化制定增量更新计划：
+    {"keep": [下标], "patch_removed": {下标: [要删除的参数]}, "drop": [下标], "regenerate": [下标],
+     "added_params": [新增的顶层参数], "fill_required": [新增的必填顶层参数]}
+    """
+    removed_params = {c["param"] for c in changes if c["kind"] == REMOVED and c["path"] == c["param"]}
+    # 模型字段的任何变化、顶层参数的类型或描述变化，都会影响引用该参数的用例
+    changed_params = {c["param"] for c in changes
+                      if c["kind"] in (TYPE_CHANGED, DESCRIPTION_CHANGED) or c["path"] != c["param"]}
+    added = [c for c in changes if c["kind"] == ADDED and c["path"] == c["param"]]
+    fill_required = [c["param"] for c in added if c["new"]["required"]]
+
+    plan = {"keep": [], "patch_removed": {}, "drop": [], "regenerate": [],
+            "added_params": [c["param"] for c in added], "fill_required": fill_required}
+    for index, case in enumerate(test_cases):
+        params = set((case.get("parameters") or {}).keys())
+        if params & changed_params or fill_required:
+            plan["regenerate"].append(index)
+        elif params and params <= removed_params:
+            plan["drop"].append(index)
+        elif params & removed_params:
+            plan["patch_removed"][index] = sorted(params & removed_params)
+        else:
+            plan["keep"].append(index)
+    return plan
+
+
+def remove_params(test_case: dict, params: list) -> dict:
+    """返回去掉指定参数后的用例副本。"""
+    parameters = {k: v for k, v in (test_case.get("parameters") or {}).items() if k not in params}
+    return dict(test_case, parameters=parameters)
+
+
+def format_changes(changes: list) -> str:
+    lines = []
+    for change in changes:
+        label = CHANGE_LABELS[change["kind"]]
+        if change["kind"] == TYPE_CHANGED:
+            detail = f"{change['old']['type']} → {change['new']['type']}"
+        elif change["kind"] == DESCRIPTION_CHANGED:
+            detail = f"{change['old']['description']} → {change['new']['description']}"
+        else:
+            detail = (change["new"] or change["old"])["description"]
+        lines.append(f"[{label}] {change['path']}: {detail}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较两版 API 文档的参数差异")
+    parser.add_argument("old_doc", help="旧版 API 文档 JSON 文件")
+    parser.add_argument("new_doc", help="新版 API 文档 JSON 文件")
+    parser.add_argument("--cases", default=None, help="基于旧版文档生成的用例 JSON 文件，输出受影响的用例")
+    args = parser.parse_args()
+
+    with open(args.old_doc, "r", encoding="utf-8") as f:
+        old_doc = json.load(f)
+    with open(args.new_doc, "r", encoding="utf-8") as f:
+        new_doc = json.load(f)
+
+    changes = diff_docs(old_doc, new_doc)
+    if not changes:
+        print("参数没有变化")
+        return
+    print(format_changes(changes))
+
+    if args.cases:
+        with open(args.cases, "r", encoding="utf-8") as f:
+            test_cases = json.load(f)
+        plan = plan_update(test_cases, changes)
+        print(f"保留 {len(plan['keep'])} 个用例，去掉已删除参数 {len(plan['patch_removed'])} 个，删除 {len(plan['drop'])} 个，"
+              f"需重新生成 {len(plan['regenerate'])} 个，新增参数 {', '.join(plan['added_params']) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档快照：并发预取一组接口的 API 文档及其 type.url 引用的复杂对象模型，打包为一个压缩的 SQLite 归档。
+
+归档中接口文档按接口路径、模型按 URL 作为主键存储（zlib 压缩的 JSON），按键直接查找；
+设置快照后 doubao.get_api_doc / collect_related_models 优先从快照读取，不访问文档服务器，
+也便于离线运行和做可重复的基准测试。
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import doubao
+from doc_watch import load_endpoints, model_urls
+
+DEFAULT_ARCHIVE = "docs_snapshot.db"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30.0
+
+KIND_DOC = "doc"
+KIND_MODEL = "model"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def _unpack(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class DocSnapshot:
+    """只读的文档快照，可在多个线程中共享。"""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"文档快照不存在: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _get(self, kind: str, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def get_doc(self, api_path: str) -> dict:
+        """按接口路径读取文档，快照中没有时返回 None。"""
+        return self._get(KIND_DOC, api_path)
+
+    def get_model(self, url: str) -> dict:
+        """按 URL 读取复杂对象模型，快照中没有时返回 None。"""
+        return self._get(KIND_MODEL, url)
+
+    def api_paths(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT key FROM entries WHERE kind = ? ORDER BY key", (KIND_DOC,))]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def discover_endpoints(doc_base_url: str, session=None, timeout: float = DEFAULT_TIMEOUT) -> list:
+    """
+    尝试从文档服务器的索引（GET doc_base_url）发现接口列表。
+    支持返回字符串数组，或包含 path / api_path / url 字段的对象数组（也可包在 data / list 字段中）；
+    服务器没有索引时返回空列表。
+    """
+    import requests
+
+    session = session or requests
+    try:
+        response = session.get(doc_base_url, timeout=timeout)
+        response.raise_for_status()
+        index = response.json()
+    except Exception as e:
+        print(f"文档服务器没有可用的索引: {e}")
+        return []
+    if isinstance(index, dict):
+        index = index.get("data") or index.get("list") or index.get("apis") or []
+    endpoints = []
+    for item in index if isinstance(index, list) else []:
+        if isinstance(item, dict):
+            item = item.get("path") or item.get("api_path") or item.get("url")
+        if isinstance(item, str) and item.startswith("/") and item not in endpoints:
+            endpoints.append(item)
+    return endpoints
+
+
+def create_snapshot(endpoints: list, archive_path: str = DEFAULT_ARCHIVE, doc_base_url: str = None,
+                    concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    并发获取接口文档和引用的模型，写入新的快照归档（先写临时文件，完成后替换）。
+    返回 {"docs", "models", "failed": [...], "bytes", "elapsed"}。
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    doc_base_url = doc_base_url or doubao.BASE_DOC_URL
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    started = time.time()
+    failed = []
+
+    def fetch(url):
+        try:
+            response = session.get(url, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            failed.append(f"{url}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        docs = dict(zip(endpoints, pool.map(lambda p: fetch(f"{doc_base_url}{p}"), endpoints)))
+        urls = sorted({url for doc in docs.values() if doc for url in model_urls(doc).values()})
+        models = dict(zip(urls, pool.map(fetch, urls)))
+
+    tmp_path = f"{archive_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        now = time.time()
+        with conn:
+            conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                             [(KIND_DOC, path, _pack(doc), now) for path, doc in docs.items() if doc is not None])
+            conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                             [(KIND_MODEL, url, _pack(model), now) for url, model in models.items() if model is not None])
+            conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                             [("doc_base_url", doc_base_url), ("created_at", str(now))])
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, archive_path)
+
+    return {
+        "docs": sum(1 for doc in docs.values() if doc is not None),
+        "models": sum(1 for model in models.values() if model is not None),
+        "failed": failed,
+        "bytes": os.path.getsize(archive_path),
+        "elapsed": round(time.time() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 文档快照（离线归档）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create", help="预取文档并生成快照")
+    create.add_argument("endpoints", nargs="?", default=None, help="接口列表文件（每行一个）；不指定时尝试从服务器索引发现")
+    create.add_argument("-o", "--output", default=DEFAULT_ARCHIVE, help="快照文件路径")
+    create.add_argument("--doc-base-url", default=doubao.BASE_DOC_URL, help="文档服务器地址")
+    create.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="并发请求数")
+
+    list_parser = sub.add_parser("list", help="列出快照中的接口")
+    list_parser.add_argument("archive", nargs="?", default=DEFAULT_ARCHIVE)
+
+    show = sub.add_parser("show", help="输出快照中某个接口的文档")
+    show.add_argument("api_path")
+    show.add_argument("--archive", default=DEFAULT_ARCHIVE)
+    args = parser.parse_args()
+
+    if args.command == "create":
+        endpoints = load_endpoints(args.endpoints) if args.endpoints else discover_endpoints(args.doc_base_url)
+        if not endpoints:
+            print("没有要预取的接口")
+            return
+        stats = create_snapshot(endpoints, args.output, args.doc_base_url, args.concurrency)
+        print(f"已生成快照 {args.output}：{stats['docs']} 个接口文档，{stats['models']} 个模型，"
+              f"{stats['bytes'] / 1024:.1f} KB，耗时 {stats['elapsed']}s")
+        for line in stats["failed"]:
+            print(f"   ❌ {line}")
+    elif args.command == "list":
+        snapshot = DocSnapshot(args.archive)
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(float(snapshot.meta.get("created_at", 0))))
+        print(f"# {snapshot.meta.get('doc_base_url')}  {created}")
+        for api_path in snapshot.api_paths():
+            print(api_path)
+    elif args.command == "show":
+        doc = DocSnapshot(args.archive).get_doc(args.api_path)
+        if doc is None:
+            print(f"快照中没有接口 {args.api_path}")
+            return
+        print(json.dumps(doc, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
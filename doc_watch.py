@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档监视模式：定期从文档服务器（doubao.BASE_DOC_URL）拉取一组接口的文档，与上一次快照比较，
+只为文档或其引用的复杂对象模型发生变化的接口排队重新生成（经 case_store 增量更新）。
+
+- 条件请求：记录每个 URL 的 ETag / Last-Modified，服务器返回 304 时不传输文档；
+  不支持条件请求的服务器则按内容哈希比较；
+- 限流：--concurrency 限制同时进行的请求数，--budget 限制每轮最多请求的文档数，
+  接口较多时按轮次轮转检查，保证文档服务器的负载有上限；
+- 快照（URL 校验信息、各接口的内容哈希）保存在 JSON 状态文件中，重启后继续比较；
+  有变化的接口在重新生成成功（confirm）后才记录新的哈希，获取文档失败、生成失败或被取消时下一轮会再次发现该变化。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import doubao
+from batch_export import atomic_write_text
+
+DEFAULT_STATE = "doc_watch_state.json"
+DEFAULT_INTERVAL = 300.0
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 20.0
+
+
+def _hash_json(value) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def model_urls(api_doc: dict) -> dict:
+    """返回 args 中 type.url 引用的模型 {参数名: url}。"""
+    urls = {}
+    for arg in (api_doc or {}).get("request", {}).get("args", []):
+        if isinstance(arg, dict) and isinstance(arg.get("type"), dict) and arg["type"].get("url"):
+            urls[arg.get("name")] = arg["type"]["url"]
+    return urls
+
+
+def load_endpoints(path: str) -> list:
+    """读取接口列表文件：每行一个接口路径，忽略空行和 # 注释。"""
+    endpoints = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and line not in endpoints:
+                endpoints.append(line)
+    return endpoints
+
+
+class DocWatcher:
+    """
+    轮询文档服务器。on_change(api_path, api_doc, models, revision) 在某接口的文档或模型发生变化时调用，
+    api_doc / models 为本次获取的最新内容，revision 为新的内容哈希。调用方处理完成后调用
+    confirm(api_path, revision) 记录新快照，失败时调用 discard(api_path, revision)；在此之前该变化处于待处理状态，
+    相同的变化不会重复通知。未设置 on_change 时直接记录新快照。
+    """
+
+    def __init__(self, endpoints: list, doc_base_url: str = None, state_path: str = DEFAULT_STATE,
+                 concurrency: int = DEFAULT_CONCURRENCY, budget: int = 0, timeout: float = DEFAULT_TIMEOUT,
+                 on_change=None, notify_new: bool = False):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.endpoints = list(endpoints)
+        self.doc_base_url = doc_base_url or doubao.BASE_DOC_URL
+        self.state_path = state_path
+        self.concurrency = max(1, concurrency)
+        self.budget = budget
+        self.timeout = timeout
+        self.on_change = on_change
+        self.notify_new = notify_new
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "errors": 0}
+        self.state = self._load_state()
+        # 本轮已请求过的 URL：多个接口引用同一模型时每轮只请求一次，并共享取到的内容
+        self._cycle_fetches = {}
+        # 已通知、尚未确认的变化 {接口路径: 快照条目}，只在内存中保存，重启后会重新发现
+        self.pending = {}
+
+    def _load_state(self) -> dict:
+        state = {"urls": {}, "endpoints": {}, "cursor": 0}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    state.update(json.load(f))
+            except Exception as e:
+                print(f"读取监视状态失败，将重新建立快照: {e}")
+        return state
+
+    def save_state(self) -> None:
+        with self._lock:
+            text = json.dumps(self.state, ensure_ascii=False, indent=2)
+        atomic_write_text(self.state_path, text)
+
+    def _fetch(self, url: str):
+        """条件请求一个 URL，返回 (body, content_hash)；304 时 body 为 None、哈希沿用上次的值。"""
+        with self._lock:
+            event = self._cycle_fetches.get(url)
+            owner = event is None
+            if owner:
+                event = self._cycle_fetches[url] = {"done": threading.Event(), "result": None}
+        if not owner:
+            event["done"].wait()
+            if event["result"] is None:
+                raise RuntimeError(f"请求失败 {url}")
+            return event["result"]
+        try:
+            event["result"] = self._fetch_remote(url)
+            return event["result"]
+        finally:
+            event["done"].set()
+
+    def _fetch_remote(self, url: str):
+        with self._lock:
+            cached = dict(self.state["urls"].get(url) or {})
+        headers = {}
+        # 没有上次内容的哈希时 304 无法使用，不发送条件请求头
+        if cached.get("hash"):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        with self._lock:
+            self.stats["requests"] += 1
+        if response.status_code == 304:
+            if not headers:
+                raise RuntimeError(f"未发送条件请求却返回 304: {url}")
+            with self._lock:
+                self.stats["not_modified"] += 1
+            return None, cached["hash"]
+        response.raise_for_status()
+        body = response.json()
+        content_hash = _hash_json(body)
+        with self._lock:
+            self.state["urls"][url] = {"etag": response.headers.get("ETag"),
+                                       "last_modified": response.headers.get("Last-Modified"),
+                                       "hash": content_hash}
+        return body, content_hash
+
+    def check_endpoint(self, api_path: str) -> bool:
+        """检查一个接口，返回文档或模型是否有变化（首次检查只建立快照）。"""
+        doc_url = f"{self.doc_base_url}{api_path}"
+        try:
+            api_doc, doc_hash = self._fetch(doc_url)
+            with self._lock:
+                previous = dict(self.state["endpoints"].get(api_path) or {})
+                pending = self.pending.get(api_path)
+            if api_doc is None:
+                # 文档未变化：模型列表取最近一次获取到的（待确认的变化优先）
+                urls = (pending or previous).get("models", {})
+            else:
+                urls = model_urls(api_doc)
+
+            models = {}
+            model_hashes = {}
+            for name, url in sorted(urls.items()):
+                body, model_hashes[name] = self._fetch(url)
+                if body is not None:
+                    models[name] = body
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            print(f"检查接口失败 {api_path}: {e}")
+            return False
+
+        combined = _hash_json({"doc": doc_hash, "models": model_hashes})
+        entry = {"hash": combined, "models": urls, "checked_at": time.time()}
+        changed = previous.get("hash") != combined
+        if not changed or (not previous and not self.notify_new) or self.on_change is None:
+            with self._lock:
+                self.state["endpoints"][api_path] = entry
+                self.pending.pop(api_path, None)
+            if changed and previous:
+                print(f"🔄 接口文档有变化: {api_path}")
+                return True
+            return False
+        with self._lock:
+            if (self.pending.get(api_path) or {}).get("hash") == combined:
+                return False  # 同一变化已在处理中
+            self.pending[api_path] = entry
+
+        # 文档 304 而仅模型变化时需要完整文档，回退为一次普通请求
+        if api_doc is None:
+            try:
+                response = self.session.get(doc_url, timeout=self.timeout)
+                response.raise_for_status()
+                api_doc = response.json()
+            except Exception as e:
+                print(f"获取接口文档失败 {api_path}: {e}")
+                self.discard(api_path, combined)
+                return False
+        print(f"🔄 接口文档有变化: {api_path}")
+        try:
+            self.on_change(api_path, api_doc, models, combined)
+        except Exception as e:
+            print(f"处理接口变化失败 {api_path}: {e}")
+            self.discard(api_path, combined)
+            return False
+        return True
+
+    def confirm(self, api_path: str, revision: str) -> None:
+        """变化已处理（重新生成成功）：记录新快照并保存状态。revision 已被更新的变化取代时忽略。"""
+        with self._lock:
+            entry = self.pending.get(api_path)
+            if entry is None or entry["hash"] != revision:
+                return
+            del self.pending[api_path]
+            self.state["endpoints"][api_path] = entry
+        self.save_state()
+
+    def discard(self, api_path: str, revision: str) -> None:
+        """变化处理失败：保留旧快照，下一轮再次通知。"""
+        with self._lock:
+            if (self.pending.get(api_path) or {}).get("hash") == revision:
+                del self.pending[api_path]
+
+    def _batch(self) -> list:
+        """本轮要检查的接口：未设预算时全部检查，否则从上次的位置起轮转取 budget 个。"""
+        if not self.budget or self.budget >= len(self.endpoints):
+            return list(self.endpoints)
+        start = self.state.get("cursor", 0) % len(self.endpoints)
+        batch = [self.endpoints[(start + i) % len(self.endpoints)] for i in range(self.budget)]
+        self.state["cursor"] = (start + self.budget) % len(self.endpoints)
+        return batch
+
+    def poll_once(self) -> list:
+        """执行一轮检查，返回有变化的接口。"""
+        batch = self._batch()
+        with self._lock:
+            self._cycle_fetches = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            flags = list(pool.map(self.check_endpoint, batch))
+        self.save_state()
+        return [api_path for api_path, changed in zip(batch, flags) if changed]
+
+    def run(self, interval: float = DEFAULT_INTERVAL, stop_event: threading.Event = None, cycles: int = 0) -> None:
+        """按间隔循环检查，直到 stop_event 被设置或完成 cycles 轮（0 表示不限）。"""
+        stop_event = stop_event or threading.Event()
+        done = 0
+        while not stop_event.is_set():
+            started = time.time()
+            changed = self.poll_once()
+            done += 1
+            print(f"[{time.strftime('%H:%M:%S')}] 检查完成：{len(changed)} 个接口有变化，"
+                  f"累计请求 {self.stats['requests']}（304: {self.stats['not_modified']}，失败: {self.stats['errors']}）")
+            if cycles and done >= cycles:
+                break
+            stop_event.wait(max(0.0, interval - (time.time() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监视接口文档，变化时自动重新生成用例")
+    parser.add_argument("endpoints", help="接口列表文件（每行一个接口路径）")
+    parser.add_argument("--doc-base-url", default=doubao.BASE_DOC_URL, help="文档服务器地址")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="两轮检查之间的间隔（秒）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同时进行的文档请求数")
+    parser.add_argument("--budget", type=int, default=0, help="每轮最多检查的接口数，0 表示全部")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="快照状态文件")
+    parser.add_argument("--cycles", type=int, default=0, help="检查轮数，0 表示一直运行")
+    parser.add_argument("--notify-new", action="store_true", help="首次检查的接口也视为有变化（立即生成）")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--model", default=doubao.DEFAULT_MODEL, help="生成用例使用的模型")
+    parser.add_argument("--case-db", default="case_store.db", help="生成用例库（增量更新依赖它）")
+    parser.add_argument("--workers", type=int, default=2, help="同时进行的生成任务数")
+    parser.add_argument("--usage-db", default="llm_usage.db", help="模型调用 token 用量库")
+    parser.add_argument("--dry-run", action="store_true", help="只报告变化，不重新生成")
+    args = parser.parse_args()
+
+    from job_runner import JobRunner, STATUS_DONE
+
+    watcher = None
+    # 生成任务 → 触发它的变化（revision），任务结束时确认或放弃该变化
+    revisions = {}
+
+    def settle(job):
+        revision = revisions.pop(job.id, None)
+        if revision is None:
+            return
+        if job.status == STATUS_DONE:
+            watcher.confirm(job.api_path, revision)
+        else:
+            watcher.discard(job.api_path, revision)
+
+    def on_job_update(job):
+        if job.finished:
+            mark = "✅" if job.status == STATUS_DONE else "❌"
+            print(f"{mark} {job.api_path}: {job.message or job.error}")
+            settle(job)
+
+    runner = None if args.dry_run else JobRunner(max_workers=args.workers, on_update=on_job_update,
+                                                usage_db=args.usage_db)
+
+    def on_change(api_path, api_doc, models, revision):
+        # 把刚获取的文档和模型放入共享缓存，生成任务不必再次请求，也不会读到旧的缓存
+        runner.caches.put("doc", f"{args.doc_base_url}{api_path}", api_doc)
+        for name, url in model_urls(api_doc).items():
+            if name in models:
+                runner.caches.put("model", url, models[name])
+        job = runner.submit(api_path, args.test_data, model=args.model, doc_base_url=args.doc_base_url,
+                            case_db=args.case_db, render_scripts=False)
+        revisions[job.id] = revision
+        # 任务可能在登记 revision 之前就已结束
+        if job.finished:
+            settle(job)
+
+    watcher = DocWatcher(load_endpoints(args.endpoints), doc_base_url=args.doc_base_url, state_path=args.state,
+                         concurrency=args.concurrency, budget=args.budget,
+                         on_change=None if runner is None else on_change,
+                         notify_new=args.notify_new)
+    print(f"开始监视 {len(watcher.endpoints)} 个接口，间隔 {args.interval}s，并发 {watcher.concurrency}")
+    try:
+        watcher.run(args.interval, cycles=args.cycles)
+        # 限定轮数时等待已排队的生成任务完成
+        while runner is not None and runner.active_count:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("已停止监视，取消未完成的生成任务")
+    finally:
+        if runner is not None:
+            runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,31 @@
-import requests
 import json
 import os
 import re
-
-
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    print("警告: 未安装openai库，请运行: pip install openai")
-    OPENAI_AVAILABLE = False
+import socket
+import time
+from contextlib import closing
+from functools import lru_cache
+
+from job_context import JobCancelled
+import var_library
+import var_refs
+import json_like
+import tracing
+import llm_usage
+import profiling
+import prompt_cache
+
+# 注意：requests 与 openai 均在首次使用时才导入，避免拖慢 GUI / 打包程序的启动
+_OPENAI_CLIENT_CLASS = None
 
 DOUBAO_BASE_URL = "https://ark.cn-beijing.volces.com/api/v3"
 DOUBAO_CHAT_URL = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
 DOUBAO_API_KEY = os.environ.get("DOUBAO_API_KEY")  # 用户必须通过环境变量或GUI配置
+BASE_DOC_URL = "http://114.67.231.162/api/doc"
+DEFAULT_MODEL = "doubao-seed-1-6-250615"
+# 文档快照（doc_snapshot.py 生成）路径；设置后优先从快照读取文档和模型，不访问文档服务器
+DOC_SNAPSHOT_ENV = "AUTOAPI_DOC_SNAPSHOT"
+_doc_snapshot = None
 
 def get_doubao_appkey():
     """获取豆包的appkey（需要用户手动配置或通过抓包获取）"""
@@ -31,53 +43,206 @@ def get_doubao_appkey():
         return None
     return DOUBAO_API_KEY
 
-def call_doubao_api(prompt: str, model: str = "doubao-seed-1-6-250615") -> str:
-    """调用豆包API生成内容"""
-    api_key = get_doubao_appkey()
+def _get_openai_client_class():
+    """首次调用时导入 openai 库，返回 OpenAI 类；未安装时返回 None。"""
+    global _OPENAI_CLIENT_CLASS
+    if _OPENAI_CLIENT_CLASS is None:
+        try:
+            from openai import OpenAI
+            _OPENAI_CLIENT_CLASS = OpenAI
+        except ImportError:
+            print("警告: 未安装openai库，请运行: pip install openai")
+            _OPENAI_CLIENT_CLASS = False
+    return _OPENAI_CLIENT_CLASS or None
+
+def set_doc_snapshot(path: str = None) -> None:
+    """设置进程级的文档快照（None 表示不使用）；未设置时读取 AUTOAPI_DOC_SNAPSHOT 环境变量。"""
+    global _doc_snapshot
+    if path:
+        from doc_snapshot import DocSnapshot
+        _doc_snapshot = DocSnapshot(path)
+    else:
+        _doc_snapshot = False
+
+def get_doc_snapshot(ctx=None):
+    """返回当前生效的文档快照：任务上下文中指定的优先，其次为进程级快照；没有时返回 None。"""
+    global _doc_snapshot
+    if ctx is not None and ctx.doc_snapshot is not None:
+        return ctx.doc_snapshot
+    if _doc_snapshot is None:
+        path = os.environ.get(DOC_SNAPSHOT_ENV)
+        try:
+            set_doc_snapshot(path)
+        except Exception as e:
+            print(f"打开文档快照失败 {path}: {e}")
+            _doc_snapshot = False
+    return _doc_snapshot or None
+
+def _report(ctx, stage: str, message: str = "") -> None:
+    """向任务上下文报告阶段（未传入上下文时忽略），同时检查是否已取消。"""
+    if ctx is not None:
+        ctx.report(stage, message)
+
+def _abort_response(response) -> None:
+    """取消回调：关闭底层 socket。直接 close() 会等待另一线程中阻塞的读取完成，shutdown 可立即打断读取。"""
+    raw = response.raw
+    conn = getattr(raw, "connection", None) or getattr(raw, "_connection", None)
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        # 非 keep-alive 响应的连接对象已释放 socket，改从 http.client 响应的文件对象上取
+        fp = getattr(getattr(raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+def _http_get_json(url: str, timeout: float, ctx=None):
+    """GET 并解析 JSON。传入任务上下文时以流式读取，取消时关闭连接以中止进行中的请求。"""
+    import requests
+
+    if ctx is None:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        tracing.current_span().add("bytes_in", len(response.content))
+        return response.json()
+
+    ctx.check_cancelled()
+    response = requests.get(url, timeout=timeout, stream=True)
+    abort = lambda: _abort_response(response)
+    ctx.cancel_token.add_callback(abort)
+    try:
+        response.raise_for_status()
+        chunks = []
+        for chunk in response.iter_content(chunk_size=65536):
+            ctx.check_cancelled()
+            chunks.append(chunk)
+        body = b"".join(chunks)
+        tracing.current_span().add("bytes_in", len(body))
+        return json.loads(body)
+    except Exception:
+        # 连接被取消回调关闭时，底层会抛出各种读取异常，统一转为取消
+        ctx.check_cancelled()
+        raise
+    finally:
+        ctx.cancel_token.remove_callback(abort)
+        response.close()
+
+def _stream_chat_completion(client, model: str, messages: list, ctx, extra_body: dict = None) -> tuple:
+    """以流式方式调用模型，逐块检查取消；取消时关闭流以中止请求。返回 (内容, usage)，usage 来自最后一个数据块。"""
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=4000,
+        stream=True,
+        stream_options={"include_usage": True},
+        extra_body=extra_body
+    )
+    ctx.cancel_token.add_callback(stream.close)
+    parts = []
+    usage = None
+    try:
+        for chunk in stream:
+            ctx.check_cancelled()
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+    except Exception:
+        ctx.check_cancelled()
+        raise
+    finally:
+        ctx.cancel_token.remove_callback(stream.close)
+    return "".join(parts), usage
+
+def _chat_completion(client, model: str, messages: list, ctx, extra_body: dict = None) -> tuple:
+    """调用一次模型，返回 (内容, usage)。任务模式下使用流式调用，便于随时取消。"""
+    if ctx is not None:
+        return _stream_chat_completion(client, model, messages, ctx, extra_body)
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=4000,
+        extra_body=extra_body
+    )
+    content = response.choices[0].message.content if response.choices else ""
+    return content or "", response.usage
+
+def call_doubao_api(prompt: str, model: str = "doubao-seed-1-6-250615", ctx=None, purpose: str = "generate",
+                    prefix: str = None) -> str:
+    """调用豆包API生成内容。传入任务上下文时使用其中的密钥和服务地址，而不是模块全局配置。
+
+    prefix 为提示词中各接口共用的固定前缀，作为 system 消息放在最前面；上下文缓存模式（见 prompt_cache.py）下
+    前缀只在创建上下文时发送一次，之后只发送 prompt。
+    每次调用的 token 用量和耗时记录到 ctx.usage（见 llm_usage.py），purpose 标明调用用途（generate / incremental）。
+    """
+    api_key = (ctx.api_key if ctx is not None else None) or get_doubao_appkey()
     if not api_key:
         print("豆包API密钥未配置")
         return ""
     
-    if not OPENAI_AVAILABLE:
+    OpenAI = _get_openai_client_class()
+    if OpenAI is None:
         print("openai库未安装，无法调用API")
         return ""
     
     try:
         print(f">>> 正在请求豆包API设计智能测试用例，请稍候...")
         print(f"使用模型: {model}")
-        
-        # 使用openai库调用豆包API
-        client = OpenAI(
-            base_url=DOUBAO_BASE_URL,
-            api_key=api_key,
-        )
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
-        
-        if response.choices and len(response.choices) > 0:
-            content = response.choices[0].message.content
+
+        base_url = (ctx.llm_base_url if ctx is not None else None) or DOUBAO_BASE_URL
+        messages = [{"role": "user", "content": prompt}]
+        if prefix:
+            messages.insert(0, {"role": "system", "content": prefix})
+
+        span = tracing.current_span()
+        content = usage = None
+        if prefix and prompt_cache.resolve_mode(ctx) == "context":
+            context_id = prompt_cache.get_context(base_url, api_key, model, prefix, ctx)
+            if context_id:
+                started = time.perf_counter()
+                try:
+                    client = OpenAI(base_url=prompt_cache.context_base_url(base_url), api_key=api_key)
+                    content, usage = _chat_completion(client, model, messages[1:], ctx, {"context_id": context_id})
+                    span.set("context_id", context_id)
+                    span.add("bytes_out", len(prompt.encode("utf-8")))
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    # 上下文过期或被服务端清理：丢弃后按普通方式调用，下次调用时重建
+                    print(f"上下文缓存调用失败，改为普通调用: {e}")
+                    prompt_cache.invalidate(base_url, model, prefix, context_id)
+                    content = None
+
+        if content is None:
+            # 使用openai库调用豆包API
+            client = OpenAI(base_url=base_url, api_key=api_key)
+            span.add("bytes_out", sum(len(m["content"].encode("utf-8")) for m in messages))
+            started = time.perf_counter()
+            content, usage = _chat_completion(client, model, messages, ctx)
+
+        llm_usage.record(ctx, llm_usage.make_usage("doubao", model, time.perf_counter() - started, purpose=purpose,
+                                                   **llm_usage.openai_usage_fields(usage)))
+        span.add("bytes_in", len(content.encode("utf-8")))
+        if content:
             print(f"<<< 豆包API成功设计了测试用例！")
-            return content
         else:
             print("豆包API返回格式异常")
-            return ""
-            
+        return content
+
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"调用豆包API失败: {e}")
         return ""
 
 def call_doubao_api_fallback(prompt: str, model: str = "doubao-seed-1-6-250615") -> str:
     """备用方法：直接HTTP调用豆包API"""
+    import requests
+
     api_key = get_doubao_appkey()
     if not api_key:
         print("豆包API密钥未配置")
@@ -107,14 +272,20 @@ def call_doubao_api_fallback(prompt: str, model: str = "doubao-seed-1-6-250615")
         "max_tokens": 4000
     }
     
-    for endpoint in api_endpoints:
+    span = tracing.current_span()
+    for attempt, endpoint in enumerate(api_endpoints):
+        if attempt:
+            span.add("retries")
         try:
             print(f">>> 正在请求豆包API ({endpoint}) 设计智能测试用例，请稍候...")
             print(f"使用模型: {model}")
+            started = time.perf_counter()
             response = requests.post(endpoint, headers=headers, json=data, timeout=60)
             response.raise_for_status()
             
             result = response.json()
+            llm_usage.record(None, llm_usage.make_usage("doubao", model, time.perf_counter() - started,
+                                                        **llm_usage.openai_usage_fields(result.get("usage"))))
             if "choices" in result and len(result["choices"]) > 0:
                 content = result["choices"][0]["message"]["content"]
                 print(f"<<< 豆包API成功设计了测试用例！")
@@ -131,32 +302,16 @@ def call_doubao_api_fallback(prompt: str, model: str = "doubao-seed-1-6-250615")
             continue
     return ""
 
-def design_knowledge_driven_cases(api_doc: dict, test_data_json: str, model: str = "doubao-seed-1-6-250615") -> list:
-    """使用豆包API，结合API文档和预设业务数据，设计出引用环境变量的测试用例。"""
-    if not api_doc:
-        return []
-
-    # 使用与gemini.py相同的prompt模板
-    prompt_template = """
+# 用例设计提示词。固定的设计说明和测试环境变量库在前（同一批次内不变，作为 system 消息，可命中服务端的前缀缓存），
+# 每个接口不同的 API 文档和复杂对象模型在后（作为 user 消息），见 prompt_cache.py
+DESIGN_PROMPT_PREFIX = """
     你是一位顶尖的中文测试开发专家。你的任务是基于我提供的API文档和一套已有的测试环境变量，设计出高质量、有业务价值的测试用例。
 
-    **第一部分：这是你要测试的API的文档。**
-    ```json
-    {api_doc_json}
-    ```
-
-    **第二部分：这是你可以使用的、包含真实业务含义的【测试环境变量库】。**
+    **第一部分：这是你可以使用的、包含真实业务含义的【测试环境变量库】。**
     ```json
     {test_data_json}
     ```
 
-    **第三部分：这些是 `args` 中引用的复杂对象模型文档（当存在时）。**
-    - 你需要基于这些模型的字段来构建对应参数（如 query_body、query_extend）的 JSON 结构。
-    - 仅使用与业务有关的必需或常用字段，避免无意义的冗余字段。
-    ```json
-    {related_models_json}
-    ```
-
     **你的核心工作方法和原则：**
     1.  **用例范围**：只设计 `args` 部分的业务参数。**完全不需要考虑 `_app`, `_t`, `_sign`, `_sign_kind` 等系统参数**，它们由框架自动处理。
     2.  **智能映射是关键！** 你需要深刻理解API参数的含义（参考其`description`），然后在【测试环境变量库】中找到`description`最匹配的变量。
@@ -171,6 +326,8 @@ def design_knowledge_driven_cases(api_doc: dict, test_data_json: str, model: str
     6.  **负向用例同样重要**：
         -   业务规则违反（例如，"shop_name和shop_nick不能同时为空"的场景）。
         -   **创造性负向**：对于需要测试"不存在的"或"非法"场景的负向用例，你可以**合理地创造**符合数据类型和长度的**具体虚拟值**（例如`"shop_nick": "non_existent_shop_12345"`）。
+    7.  **复杂对象参数**：对于引用了复杂对象模型的参数（如 query_body、query_extend），基于第三部分给出的模型字段构建 JSON 结构，
+        仅使用与业务有关的必需或常用字段，避免无意义的冗余字段。
 
     **最终输出格式（必须严格遵守）：**
     - 你的整个回答必须是一个**纯粹的、合法的JSON数组**。
@@ -178,119 +335,253 @@ def design_knowledge_driven_cases(api_doc: dict, test_data_json: str, model: str
     - `parameters`键的值是一个对象，其键值对必须遵循上述的**引用格式**（`page`, `limit`, 和创造性负向用例的值除外）。
     """
 
-    # 采集复杂对象模型文档，用于增强提示
-    related_models = collect_related_models(api_doc)
+DESIGN_PROMPT_SUFFIX = """
+    **第二部分：这是你要测试的API的文档。**
+    ```json
+    {api_doc_json}
+    ```
 
-    prompt = prompt_template.format(
+    **第三部分：这些是 `args` 中引用的复杂对象模型文档（当存在时）。**
+    ```json
+    {related_models_json}
+    ```
+
+    请按上述原则为该API设计测试用例，只输出JSON数组。
+    """
+
+@lru_cache(maxsize=8)
+def build_design_prefix(test_data_json: str) -> str:
+    """提示词的固定前缀（设计说明 + 变量库），同一变量库只拼接一次。"""
+    return DESIGN_PROMPT_PREFIX.format(test_data_json=test_data_json)
+
+def build_design_prompt_parts(api_doc: dict, test_data_json: str, related_models: dict) -> tuple:
+    """返回 (固定前缀, 接口相关的后缀)。"""
+    suffix = DESIGN_PROMPT_SUFFIX.format(
         api_doc_json=json.dumps(api_doc, ensure_ascii=False,indent=2),
-        test_data_json=test_data_json,
         related_models_json=json.dumps(related_models, ensure_ascii=False, indent=2)
     )
+    return build_design_prefix(test_data_json), suffix
+
+def build_design_prompt(api_doc: dict, test_data_json: str, related_models: dict) -> str:
+    """按模板拼出完整的用例设计提示词（前缀 + 后缀）。"""
+    return "".join(build_design_prompt_parts(api_doc, test_data_json, related_models))
+
+def extract_json_array(raw_text: str):
+    """从模型输出中取出第一个 "[" 到最后一个 "]" 之间的 JSON 数组并解析；找不到时返回 None，格式错误时抛出 JSONDecodeError。"""
+    json_match = re.search(r'\[.*\]', raw_text or "", re.DOTALL)
+    if not json_match:
+        return None
+    return json.loads(json_match.group(0))
+
+@profiling.profiled("design")
+def design_knowledge_driven_cases(api_doc: dict, test_data_json: str, model: str = "doubao-seed-1-6-250615", ctx=None) -> list:
+    """使用豆包API，结合API文档和预设业务数据，设计出引用环境变量的测试用例。"""
+    if not api_doc:
+        return []
+    if ctx is not None and ctx.model:
+        model = ctx.model
+
+
+    # 采集复杂对象模型文档，用于增强提示
+    _report(ctx, "models", "获取复杂对象模型")
+    related_models = collect_related_models(api_doc, ctx)
+
+    with tracing.span(ctx, "prompt") as span:
+        prefix, prompt = build_design_prompt_parts(api_doc, test_data_json, related_models)
+        span.set("chars", len(prefix) + len(prompt))
 
     try:
-        raw_text = call_doubao_api(prompt, model)
+        _report(ctx, "llm", f"请求模型 {model}")
+        with tracing.span(ctx, "llm", model=model):
+            raw_text = call_doubao_api(prompt, model, ctx, prefix=prefix)
+        _report(ctx, "llm", "解析模型输出")
         
         if not raw_text:
             print("豆包API未返回有效内容")
             return []
 
-        json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
-
-        if not json_match:
-            print("在豆包API的响应中未能找到有效的JSON数组。")
-            print("原始响应内容:", raw_text[:1000])
-            return []
+        with tracing.span(ctx, "parse", chars=len(raw_text)):
+            test_cases = extract_json_array(raw_text)
 
-        json_string = json_match.group(0)
-        test_cases = json.loads(json_string)
+            if test_cases is None:
+                print("在豆包API的响应中未能找到有效的JSON数组。")
+                print("原始响应内容:", raw_text[:1000])
+                return []
 
         print(f"<<< 豆包API成功设计了 {len(test_cases)} 个智能测试用例！")
         return test_cases
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"\n调用或解析豆包API时出错: {e}")
         return []
 
-def collect_related_models(api_doc: dict) -> dict:
-    """收集 args 中包含 type.url 的复杂对象模型，返回 {param_name: model_doc}。"""
+def regenerate_incrementally(api_doc: dict, test_data_json: str, previous: dict, related_models: dict,
+                             model: str = DEFAULT_MODEL, ctx=None):
+    """按文档差异增量更新已有用例，只把受影响的用例和变化的参数交给模型。
+
+    previous 为 case_store 中的上一次生成。返回 (test_cases, summary)；
+    模型调用失败时返回 (None, summary)，由调用方改为完整生成。
+    变量库放在与完整生成相同的固定前缀中（build_design_prefix），命中前缀 / 上下文缓存，
+    每次增量调用的新增输入只有变化说明与受影响的用例，与变化的规模成正比。
+    """
+    import doc_diff
+
+    with tracing.span(ctx, "diff"):
+        changes = doc_diff.diff_docs(previous["api_doc"], api_doc, previous.get("related_models"), related_models)
+        old_cases = previous["test_cases"]
+        plan = doc_diff.plan_update(old_cases, changes)
+    summary = {"changes": changes, "kept": len(plan["keep"]), "patched": len(plan["patch_removed"]),
+               "dropped": len(plan["drop"]), "regenerated": len(plan["regenerate"]),
+               "added_params": plan["added_params"]}
+
+    updated = list(old_cases)
+    for index, params in plan["patch_removed"].items():
+        updated[index] = doc_diff.remove_params(old_cases[index], params)
+    dropped = set(plan["drop"])
+    if not plan["regenerate"] and not plan["added_params"]:
+        return [case for i, case in enumerate(updated) if i not in dropped], summary
+
+    affected_params = {c["param"] for c in changes if c["kind"] != doc_diff.REMOVED}
+    arg_defs = [arg for arg in api_doc.get("request", {}).get("args", [])
+                if isinstance(arg, dict) and arg.get("name") in affected_params]
+    removed = sorted({c["param"] for c in changes if c["kind"] == doc_diff.REMOVED and c["path"] == c["param"]})
+    affected_cases = [doc_diff.remove_params(old_cases[i], removed) for i in plan["regenerate"]]
+
+    prompt = f"""
+    **本次任务不是重新设计，而是增量更新：**某个API的文档发生了变化，已有测试用例经过人工评审，请只做最小的修改。
+
+    **变化说明：**
+    {doc_diff.format_changes(changes)}
+
+    **变化后的相关参数定义：**
+    ```json
+    {json.dumps(arg_defs, ensure_ascii=False, indent=2)}
+    ```
+
+    **相关复杂对象模型（当存在时）：**
+    ```json
+    {json.dumps({name: doc for name, doc in related_models.items() if name in affected_params}, ensure_ascii=False, indent=2)}
+    ```
+
+    **需要更新的已有用例：**
+    ```json
+    {json.dumps(affected_cases, ensure_ascii=False, indent=2)}
+    ```
+
+    **要求：**
+    1. 对每个已有用例，保持 `case_name` 不变，只修改与上述变化相关的参数，其它参数原样保留；新增的必填参数（{", ".join(plan["fill_required"]) or "无"}）需补上取值。
+    2. 为新增参数（{", ".join(plan["added_params"]) or "无"}）额外设计 1~3 个新用例，`case_name` 必须是新的中文名称。
+    3. 引用第一部分【测试环境变量库】中的变量时使用 `${{变量名}}` 格式；`page` 和 `limit` 使用字面量 1 和 20。
+    4. 你的整个回答必须是一个纯粹的、合法的JSON数组，元素包含 `case_name` 和 `parameters`。
+    """
+
+    _report(ctx, "llm", f"增量更新 {len(affected_cases)} 个用例（{len(changes)} 处变化）")
+    with tracing.span(ctx, "llm", model=model, incremental=True):
+        raw_text = call_doubao_api(prompt, model, ctx, purpose="incremental", prefix=build_design_prefix(test_data_json))
+    with tracing.span(ctx, "parse", chars=len(raw_text or "")):
+        try:
+            returned = extract_json_array(raw_text)
+        except json.JSONDecodeError:
+            returned = None
+    if not isinstance(returned, list):
+        print("增量更新未得到有效的JSON数组，改为完整生成")
+        return None, summary
+
+    by_name = {case.get("case_name"): case for case in returned if isinstance(case, dict)}
+    for index, affected in zip(plan["regenerate"], affected_cases):
+        updated[index] = by_name.pop(affected.get("case_name"), affected)
+    new_cases = list(by_name.values())
+    summary["new_cases"] = len(new_cases)
+    print(f"<<< 增量更新完成：保留 {summary['kept']}，去参 {summary['patched']}，删除 {summary['dropped']}，"
+          f"更新 {summary['regenerated']}，新增 {len(new_cases)} 个用例")
+    return [case for i, case in enumerate(updated) if i not in dropped] + new_cases, summary
+
+def collect_related_models(api_doc: dict, ctx=None) -> dict:
+    """收集 args 中包含 type.url 的复杂对象模型，返回 {param_name: model_doc}。设置了文档快照时优先从快照读取。"""
     models: dict = {}
-    try:
-        args = api_doc.get("request", {}).get("args", [])
-        for arg in args:
-            if not isinstance(arg, dict):
-                continue
-            name = arg.get("name")
-            t = arg.get("type")
-            if not name or not isinstance(t, dict):
-                continue
-            url = t.get("url")
-            if not url:
-                continue
-            try:
-                resp = requests.get(url, timeout=20)
-                resp.raise_for_status()
-                models[name] = resp.json()
-            except Exception as fetch_err:
-                # 失败时跳过，不影响主流程
-                models[name] = {"_error": f"fetch_failed: {str(fetch_err)}", "url": url}
-    except Exception:
-        pass
+    snapshot = get_doc_snapshot(ctx)
+    with tracing.span(ctx, "models") as span:
+        try:
+            args = api_doc.get("request", {}).get("args", [])
+            for arg in args:
+                if not isinstance(arg, dict):
+                    continue
+                name = arg.get("name")
+                t = arg.get("type")
+                if not name or not isinstance(t, dict):
+                    continue
+                url = t.get("url")
+                if not url:
+                    continue
+                cached = ctx.caches.get("model", url) if ctx is not None else None
+                if cached is not None:
+                    models[name] = cached
+                    span.add("cache_hits")
+                    continue
+                if snapshot is not None:
+                    model_doc = snapshot.get_model(url)
+                    if model_doc is not None:
+                        models[name] = model_doc
+                        span.add("snapshot_hits")
+                        continue
+                try:
+                    models[name] = _http_get_json(url, 20, ctx)
+                    if ctx is not None:
+                        ctx.caches.put("model", url, models[name])
+                except JobCancelled:
+                    raise
+                except Exception as fetch_err:
+                    # 失败时跳过，不影响主流程
+                    models[name] = {"_error": f"fetch_failed: {str(fetch_err)}", "url": url}
+                    span.add("failures")
+        except JobCancelled:
+            raise
+        except Exception:
+            pass
+        span.set("count", len(models))
     return models
 
-def get_api_doc(api_path: str) -> dict:
-    """获取API文档"""
-    BASE_DOC_URL = "http://114.67.231.162/api/doc"
-    doc_url = f"{BASE_DOC_URL}{api_path}"
-    try:
-        response = requests.get(doc_url, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"获取或解析API文档失败 {api_path}: {e}")
-        return None
+def get_api_doc(api_path: str, ctx=None) -> dict:
+    """获取API文档。传入任务上下文时使用其文档服务器地址与共享缓存；设置了文档快照时优先从快照读取。"""
+    doc_base_url = (ctx.doc_base_url if ctx is not None else None) or BASE_DOC_URL
+    doc_url = f"{doc_base_url}{api_path}"
+    _report(ctx, "doc", f"获取接口文档 {api_path}")
+    with tracing.span(ctx, "doc", api_path=api_path) as span:
+        cached = ctx.caches.get("doc", doc_url) if ctx is not None else None
+        if cached is not None:
+            span.set("source", "cache")
+            return cached
+        snapshot = get_doc_snapshot(ctx)
+        if snapshot is not None:
+            api_doc = snapshot.get_doc(api_path)
+            if api_doc is not None:
+                span.set("source", "snapshot")
+                return api_doc
+            print(f"文档快照中没有接口 {api_path}，改为从文档服务器获取")
+        span.set("source", "http")
+        try:
+            api_doc = _http_get_json(doc_url, 30, ctx)
+            if ctx is not None:
+                ctx.caches.put("doc", doc_url, api_doc)
+            return api_doc
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"获取或解析API文档失败 {api_path}: {e}")
+            return None
 
 def load_test_data(file_path: str) -> str:
-    """加载测试数据文件"""
-    try:
-        # 处理相对路径和绝对路径
-        if not os.path.isabs(file_path):
-            # 如果是相对路径，尝试从当前工作目录查找
-            current_dir = os.getcwd()
-            full_path = os.path.join(current_dir, file_path)
-        else:
-            full_path = file_path
-            
-        # 检查文件是否存在
-        if not os.path.exists(full_path):
-            print(f"测试数据文件不存在: {full_path}")
-            return "[]"
-            
-        with open(full_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        # 验证数据格式
-        if not isinstance(data, list):
-            print(f"测试数据文件格式错误，应为JSON数组: {file_path}")
-            return "[]"
-            
-        simplified_data = [
-            {"name": item.get("name"), "value": item.get("value"), "description": item.get("description", "")}
-            for item in data
-        ]
-        
-        print(f"成功加载测试数据文件: {full_path} ({len(simplified_data)} 条数据)")
-        return json.dumps(simplified_data, ensure_ascii=False, indent=2)
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON格式错误 '{file_path}': {e}")
-        return "[]"
-    except Exception as e:
-        print(f"读取或处理测试数据文件 '{file_path}' 失败: {e}")
-        return "[]"
+    """加载测试数据文件（按路径、修改时间和大小缓存，见 var_library.py）"""
+    return var_library.load_test_data(file_path)
 
-def generate_scripts_for_case(api_doc: dict, test_case: dict) -> str:
-    """为单个测试用例生成最终正确的BeanShell脚本和请求体"""
-    case_name = test_case.get("case_name", "未命名用例")
-    case_params = test_case.get("parameters", {})
+def build_business_param_parts(api_doc: dict, case_params: dict) -> tuple:
+    """按 API 文档中的参数定义生成排序后的 "name=value" 业务参数片段。
+
+    返回 (sorted_business_params, special_literal_overrides)，后者记录需要覆盖写入
+    BeanShell 变量定义的特殊字面量（如规范化后的复杂对象参数）。
+    生成 BeanShell 脚本与 Python 侧签名（signing.py）共用此逻辑，保证两边完全一致。
+    """
     api_args = api_doc.get("request", {}).get("args", [])
 
     # 准备业务参数部分
@@ -324,6 +615,21 @@ def generate_scripts_for_case(api_doc: dict, test_case: dict) -> str:
                 business_param_parts.append(f"{name}={value}")
 
     sorted_business_params = sorted(business_param_parts, key=lambda p: p.split('=')[0])
+    return sorted_business_params, special_literal_overrides
+
+def extract_sign_var_name(value_str: str) -> str:
+    """从 "${var}" 或 "${__urlencode(${var})}" 中取出签名时读取的变量名（预编译正则，按文本缓存）。"""
+    return var_refs.sign_var_name(value_str)
+
+@profiling.profiled("render")
+def generate_scripts_for_case(api_doc: dict, test_case: dict, ctx=None) -> str:
+    """为单个测试用例生成最终正确的BeanShell脚本和请求体"""
+    if ctx is not None:
+        ctx.check_cancelled()
+    case_name = test_case.get("case_name", "未命名用例")
+    case_params = test_case.get("parameters", {})
+
+    sorted_business_params, special_literal_overrides = build_business_param_parts(api_doc, case_params)
     sorted_business_params_str = '&'.join(sorted_business_params)
 
     # 1. 定义用例数据 (第一个前置脚本)
@@ -342,10 +648,7 @@ def generate_scripts_for_case(api_doc: dict, test_case: dict) -> str:
         param_name, value_str = (part.split('=', 1) + [''])[:2]
 
         if value_str.startswith('${'): # 如果是变量引用
-            env_var_name = re.search(r'\${(.*)}', value_str).group(1)
-            # 对于被__urlencode包裹的，提取内部的变量名
-            if "__urlencode" in env_var_name:
-                env_var_name = re.search(r'\${(.*)}', env_var_name).group(1)
+            env_var_name = extract_sign_var_name(value_str)
 
             if param_name == 'page' or param_name == 'limit':
                 beanshell_sign_builder_parts.append(f'if (vars.get("{env_var_name}") != null) {{ paramParts.add("{param_name}=" + vars.get("{env_var_name}")); }}')
@@ -417,27 +720,140 @@ vars.put("time", time);
 
     return "\n".join(output_lines)
 
+def render_case(api_doc: dict, test_case: dict, ctx=None) -> dict:
+    """渲染单个用例并解析为 {"case_name", "pre1", "pre2", "body"}，供界面在选中时按需渲染。"""
+    with tracing.span(ctx, "render", cases=1):
+        return parse_script_block(generate_scripts_for_case(api_doc, test_case, ctx))
+
+def run_generation_job(api_path: str, test_data_json: str, ctx=None, render_scripts: bool = True) -> dict:
+    """完整执行一次生成：获取文档 → 设计用例 → 渲染脚本。
+
+    返回 {"api_path", "api_doc", "test_cases", "script_blocks", "parsed_cases", "cached", "incremental",
+    "unknown_vars", "usage", "dedup", "error"}，失败时 error 为错误描述；任务被取消时抛出 JobCancelled。
+    unknown_vars 为用例引用了、但变量库中不存在的变量名；usage 为本次模型调用的用量汇总（见 llm_usage.summarize_calls）；
+    dedup 为模型新生成用例的去重报告（见 case_dedup.dedup_cases，模式取 ctx.dedup），复用用例库时为 None。
+    ctx.case_db 设置时先查生成用例库：参数定义（含复杂对象模型）未变化则直接复用（cached 为 True）；
+    只有文档变化时按差异增量更新（incremental 为更新摘要）；否则完整生成。结果都会写入用例库。
+    render_scripts 为 False 时跳过渲染（script_blocks / parsed_cases 为空），由调用方用 render_case 按需渲染。
+    """
+    result = {"api_path": api_path, "api_doc": None, "test_cases": [], "script_blocks": [],
+              "parsed_cases": [], "cached": False, "incremental": None, "unknown_vars": [], "usage": None,
+              "dedup": None, "error": ""}
+
+    api_doc = get_api_doc(api_path, ctx)
+    if not api_doc:
+        result["error"] = "获取API文档失败"
+        return result
+    result["api_doc"] = api_doc
+
+    if not test_data_json or test_data_json == "[]":
+        result["error"] = "测试数据文件为空"
+        return result
+
+    case_db = ctx.case_db if ctx is not None else None
+    model = (ctx.model if ctx is not None else None) or DEFAULT_MODEL
+    test_cases = None
+    related_models = None
+    if case_db:
+        import case_store
+        import doc_diff
+        previous = None
+        try:
+            with tracing.span(ctx, "case_store", op="lookup") as span, closing(case_store.connect(case_db)) as conn:
+                previous = (case_store.find_cases(conn, api_path, api_doc, test_data_json, model)
+                            or case_store.previous_cases(conn, api_path, test_data_json, model))
+                span.set("hit", previous is not None)
+        except Exception as e:
+            print(f"读取用例库失败: {e}")
+
+        if previous:
+            # 模型文档经任务共享缓存获取，之后设计用例时不会重复请求
+            _report(ctx, "models", "获取复杂对象模型")
+            related_models = collect_related_models(api_doc, ctx)
+            changes = doc_diff.diff_docs(previous["api_doc"], api_doc, previous["related_models"], related_models)
+            if not changes:
+                _report(ctx, "cache", f"复用用例库中的 {len(previous['test_cases'])} 个用例")
+                test_cases = previous["test_cases"]
+                result["cached"] = True
+            else:
+                _report(ctx, "diff", f"文档有 {len(changes)} 处参数变化，增量更新")
+                updated, summary = regenerate_incrementally(api_doc, test_data_json, previous, related_models, model, ctx)
+                if updated:
+                    test_cases, result["incremental"] = updated, summary
+                # 增量更新失败（或没有剩余用例）时改为完整生成，incremental 保持 None
+            if result["cached"] and previous["doc_hash"] == case_store.content_hash(api_doc):
+                case_db = None  # 完全相同，无需再写一条记录
+
+    if not test_cases:
+        test_cases = design_knowledge_driven_cases(api_doc, test_data_json, model, ctx=ctx)
+        if not test_cases:
+            result["error"] = "未能生成测试用例"
+            return result
+    if not result["cached"]:
+        import case_dedup
+        mode = ctx.dedup if ctx is not None else "exact"
+        test_cases, result["dedup"] = case_dedup.dedup_cases(test_cases, mode, api_doc)
+        if result["dedup"]["kept"] < result["dedup"]["input"]:
+            print(f"<<< {case_dedup.format_report(result['dedup'])}")
+    if case_db:
+        try:
+            if related_models is None:
+                related_models = collect_related_models(api_doc, ctx)
+            with tracing.span(ctx, "case_store", op="save"), closing(case_store.connect(case_db)) as conn:
+                case_store.save_cases(conn, api_path, api_doc, test_data_json, model, test_cases, related_models)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"写入用例库失败: {e}")
+    result["test_cases"] = test_cases
+    if ctx is not None:
+        result["usage"] = llm_usage.summarize_calls(ctx.usage, len(test_cases))
+    result["unknown_vars"] = var_refs.unknown_variables(test_cases, var_refs.library_names(test_data_json))
+    if result["unknown_vars"]:
+        print(f"⚠️ {api_path} 的用例引用了变量库中不存在的变量: {', '.join(result['unknown_vars'])}")
+    if not render_scripts:
+        return result
+
+    _report(ctx, "render", f"渲染 {len(test_cases)} 个用例脚本")
+    with tracing.span(ctx, "render", cases=len(test_cases)):
+        for case in test_cases:
+            script_block = generate_scripts_for_case(api_doc, case, ctx)
+            result["script_blocks"].append(script_block)
+            result["parsed_cases"].append(parse_script_block(script_block))
+    return result
+
 def _normalize_json_like_to_compact_text(value) -> str:
-    """将 dict/list 或 JSON/类JSON 字符串统一为双引号的紧凑 JSON 文本。"""
+    """将 dict/list 或 JSON/类JSON 字符串统一为双引号的紧凑 JSON 文本（容错解析见 json_like.py，按文本缓存）。"""
+    if isinstance(value, str):
+        return json_like.compact(value)
     try:
-        if isinstance(value, (dict, list)):
-            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
-        if isinstance(value, str):
-            # 先尝试当作合法 JSON
-            try:
-                parsed = json.loads(value)
-                return json.dumps(parsed, ensure_ascii=False, separators=(',', ':'))
-            except Exception:
-                # 简单容错：单引号替换为双引号，并去除多余空白
-                tmp = value.replace("'", '"')
-                tmp = re.sub(r"\s+", "", tmp)
-                return tmp
-        # 其他类型，按 JSON 序列化
-        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
-    except Exception:
+        return json_like.dumps_compact(value)
+    except (TypeError, ValueError):
         # 兜底：转字符串
         return str(value)
 
+@profiling.profiled("parse")
+def parse_script_block(script_block: str) -> dict:
+    """从 generate_scripts_for_case 的文本块中解析出 case_name、pre1、pre2、body。"""
+    result = {"case_name": "", "pre1": "", "pre2": "", "body": ""}
+
+    # 提取用例名
+    m = re.search(r"--- 用例: (.*?) ---", script_block)
+    if m:
+        result["case_name"] = m.group(1).strip()
+
+    # 提取代码块，顺序依次是：可选pre1、pre2、body
+    code_blocks = re.findall(r"```(?:beanshell|text)\n(.*?)\n```", script_block, flags=re.DOTALL)
+    if len(code_blocks) == 3:
+        result["pre1"], result["pre2"], result["body"] = code_blocks
+    elif len(code_blocks) == 2:
+        # 没有前置脚本1的情况
+        result["pre1"] = ""
+        result["pre2"], result["body"] = code_blocks
+    elif len(code_blocks) == 1:
+        result["body"] = code_blocks[0]
+    return result
+
 # --- 测试函数 ---
 def test_doubao_connection():
     """测试豆包API连接和基本功能"""
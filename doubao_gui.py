@@ -1,16 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter.scrolledtext import ScrolledText
-import re
 import threading
+import queue
+import time
+import multiprocessing
 import traceback
+import uuid
 import os
 import json
 from pathlib import Path
 
 import doubao
+import llm_usage
+import tracing
+import var_library
+from case_browser import CaseBrowser
+from job_context import SharedCaches
+from job_runner import JobRunner, STATUS_DONE, STATUS_FAILED, STATUS_LABELS, STAGE_LABELS
 
 CONFIG_FILE = "doubao_gui_config.json"
+# 生成用例库（case_store），启动时加载已有结果，文档与变量库未变时不再调用大模型
+CASE_DB_FILE = "case_store.db"
+USAGE_DB_FILE = "llm_usage.db"
+# 启动基准（startup_bench.py，其中同名常量须保持一致）通过该环境变量传入文件路径，窗口显示后写入时间戳并退出
+STARTUP_PROBE_ENV = "AUTOAPI_STARTUP_PROBE"
+UI_QUEUE_POLL_MS = 50
+# 同时运行的接口生成任务数，以及队列面板刷新耗时的间隔
+JOB_WORKERS = 3
+JOB_TICK_MS = 500
 
 def load_config():
     """加载配置文件"""
@@ -45,28 +63,6 @@ def save_config(config):
         print(f"保存配置文件失败: {e}")
 
 
-def parse_script_block(script_block: str) -> dict:
-    """从 generate_scripts_for_case 的文本块中解析出 case_name、pre1、pre2、body。"""
-    result = {"case_name": "", "pre1": "", "pre2": "", "body": ""}
-
-    # 提取用例名
-    m = re.search(r"--- 用例: (.*?) ---", script_block)
-    if m:
-        result["case_name"] = m.group(1).strip()
-
-    # 提取代码块，顺序依次是：可选pre1、pre2、body
-    code_blocks = re.findall(r"```(?:beanshell|text)\n(.*?)\n```", script_block, flags=re.DOTALL)
-    if len(code_blocks) == 3:
-        result["pre1"], result["pre2"], result["body"] = code_blocks
-    elif len(code_blocks) == 2:
-        # 没有前置脚本1的情况
-        result["pre1"] = ""
-        result["pre2"], result["body"] = code_blocks
-    elif len(code_blocks) == 1:
-        result["body"] = code_blocks[0]
-    return result
-
-
 class App(tk.Tk):
     def __init__(self) -> None:
         super().__init__()
@@ -87,13 +83,31 @@ class App(tk.Tk):
         self.test_data_file_var = tk.StringVar(value=self.config.get("test_data_file", "MS_25_Environments_variables.json"))
 
         self.test_cases = []
-        self.script_blocks = []
-        self.parsed_cases = []
         self.api_doc = None
+        self.current_api = None
+        # 已完成的生成结果：api_path -> run_generation_job 的返回值；脚本在选中用例时按需渲染并缓存
+        self.results = {}
+        self.rendered_cases = {}
+        self.displayed_case = None
+
+        # 工作线程通过队列把界面更新交给主线程；多个任务共享文档/模型缓存
+        self.ui_queue = queue.Queue()
+        self.shared_caches = SharedCaches()
+        # 各阶段耗时记录在内存中供状态栏汇总；设置 AUTOAPI_TRACE 时同时写入 JSONL 文件
+        self.tracer = tracing.Tracer(os.environ.get(tracing.TRACE_ENV))
+        tracing.set_tracer(self.tracer)
+        self.job_runner = JobRunner(max_workers=JOB_WORKERS, caches=self.shared_caches, tracer=self.tracer,
+                                    usage_db=USAGE_DB_FILE,
+                                    on_update=lambda job: self._post(self._on_job_update, job.id))
+        # 点击“生成”提交的任务完成后自动显示
+        self.follow_job_id = None
+        self._job_tick_scheduled = False
 
         self._bind_config_events()
 
         self._build_ui()
+        self.after(UI_QUEUE_POLL_MS, self._drain_ui_queue)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _bind_config_events(self):
         """绑定配置变更事件"""
@@ -150,6 +164,7 @@ class App(tk.Tk):
         ttk.Entry(top, textvariable=self.api_path_var, width=50).pack(side=tk.LEFT, padx=8)
         self.generate_btn = ttk.Button(top, text="生成", command=self.on_generate)
         self.generate_btn.pack(side=tk.LEFT, padx=8)
+        ttk.Button(top, text="导出", command=self.on_export).pack(side=tk.LEFT)
         ttk.Label(top, textvariable=self.case_count_var).pack(side=tk.RIGHT)
 
         # 豆包API配置行
@@ -185,22 +200,35 @@ class App(tk.Tk):
         self.progress.pack(side=tk.LEFT)
         ttk.Label(status_row, textvariable=self.status_var).pack(side=tk.LEFT, padx=8)
 
+        # 左侧任务队列，右侧用例内容
+        paned = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
+        paned.pack(fill=tk.BOTH, expand=True, padx=12, pady=(6, 8))
+        left = ttk.PanedWindow(paned, orient=tk.VERTICAL)
+        queue_panel = ttk.Frame(left)
+        self._build_queue_panel(queue_panel)
+        left.add(queue_panel, weight=1)
+        self.case_browser = CaseBrowser(left, on_select=self._show_case)
+        left.add(self.case_browser, weight=2)
+        paned.add(left, weight=1)
+        content = ttk.Frame(paned)
+        paned.add(content, weight=3)
+
         # 中部：接口名称 + 导航
-        mid = ttk.Frame(self)
-        mid.pack(fill=tk.X, padx=12, pady=6)
+        mid = ttk.Frame(content)
+        mid.pack(fill=tk.X, padx=(8, 0), pady=(0, 6))
         ttk.Button(mid, text="↑ 上一条", command=self.on_prev).pack(side=tk.LEFT)
         ttk.Entry(mid, textvariable=self.api_title_var, state="readonly", justify=tk.CENTER, width=60).pack(side=tk.LEFT, padx=12, expand=True)
         ttk.Button(mid, text="下一条 ↓", command=self.on_next).pack(side=tk.LEFT)
 
         # 用例名称行
-        case_row = ttk.Frame(self)
-        case_row.pack(fill=tk.X, padx=12, pady=4)
+        case_row = ttk.Frame(content)
+        case_row.pack(fill=tk.X, padx=(8, 0), pady=4)
         ttk.Label(case_row, text="当前用例:").pack(side=tk.LEFT)
         ttk.Entry(case_row, textvariable=self.case_name_var, state="readonly", justify=tk.CENTER, width=80).pack(side=tk.LEFT, padx=8, expand=True)
 
         # 四个文本框区域
-        body = ttk.Frame(self)
-        body.pack(fill=tk.BOTH, expand=True, padx=12, pady=8)
+        body = ttk.Frame(content)
+        body.pack(fill=tk.BOTH, expand=True, padx=(8, 0), pady=(8, 0))
 
         # 第一行：前置脚本1和前置脚本2
         row1 = ttk.Frame(body)
@@ -236,8 +264,31 @@ class App(tk.Tk):
         self.body_text = ScrolledText(row2, height=20)
         self.body_text.pack(fill=tk.BOTH, expand=True)
         
-        # 初始化文件状态
-        self.update_file_status()
+        # 初始化文件状态：校验测试数据需要解析整个文件，放到窗口显示之后进行
+        self.after_idle(self.update_file_status)
+        self.after_idle(self._load_stored_cases)
+
+    def _build_queue_panel(self, parent) -> None:
+        """任务队列面板：批量加入接口、查看各任务的状态/阶段/耗时、取消与清理"""
+        ttk.Label(parent, text="批量接口（每行一个）").pack(anchor=tk.W)
+        self.batch_text = tk.Text(parent, height=5, width=40)
+        self.batch_text.pack(fill=tk.X, pady=(2, 4))
+
+        buttons = ttk.Frame(parent)
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="加入队列", command=self.on_enqueue_batch).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="取消所选", command=self.on_cancel_selected).pack(side=tk.LEFT, padx=4)
+        ttk.Button(buttons, text="清除已完成", command=self.on_clear_finished).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="导出追踪", command=self.on_export_trace).pack(side=tk.LEFT, padx=4)
+
+        columns = ("api_path", "status", "stage", "elapsed")
+        self.job_tree = ttk.Treeview(parent, columns=columns, show="headings", selectmode="extended")
+        for column, title, width in (("api_path", "接口", 200), ("status", "状态", 60),
+                                     ("stage", "阶段", 50), ("elapsed", "耗时", 60)):
+            self.job_tree.heading(column, text=title)
+            self.job_tree.column(column, width=width, stretch=(column == "api_path"))
+        self.job_tree.pack(fill=tk.BOTH, expand=True, pady=(6, 6))
+        self.job_tree.bind("<<TreeviewSelect>>", self._on_job_select)
 
     def select_test_data_file(self):
         """选择测试数据文件"""
@@ -264,13 +315,12 @@ class App(tk.Tk):
             
         if os.path.exists(file_path):
             try:
-                # 尝试读取文件内容验证格式
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list) and len(data) > 0:
-                        self.file_status_var.set(f"✅ 有效文件 ({len(data)} 条数据)")
-                    else:
-                        self.file_status_var.set("⚠️ 文件格式异常")
+                # 经 var_library 解析验证格式，结果被缓存，之后生成时不再重复解析
+                library = var_library.load_library(file_path)
+                if len(library) > 0:
+                    self.file_status_var.set(f"✅ 有效文件 ({len(library)} 条数据)")
+                else:
+                    self.file_status_var.set("⚠️ 文件格式异常")
             except Exception as e:
                 self.file_status_var.set(f"❌ 文件读取失败: {str(e)}")
         else:
@@ -289,106 +339,295 @@ class App(tk.Tk):
         except Exception as e:
             self.status_var.set(f"复制失败: {e}")
 
-    def on_generate(self):
-        """生成测试用例"""
+    def _post(self, func, *args):
+        """从工作线程向 UI 线程投递回调；Tk 不是线程安全的，所有界面更新都经由队列在主线程执行。"""
+        self.ui_queue.put((func, args))
+
+    def _drain_ui_queue(self):
+        """在主线程中执行工作线程投递的界面更新"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception:
+                    print(f"界面更新失败: {traceback.format_exc()}")
+        except queue.Empty:
+            pass
+        self.after(UI_QUEUE_POLL_MS, self._drain_ui_queue)
+
+    def _collect_job_settings(self):
+        """在主线程读取生成所需的配置，校验失败时返回 None"""
         # 验证API密钥
         api_key = self.api_key_var.get().strip()
         if not api_key:
             messagebox.showerror("错误", "请输入豆包API密钥")
-            return
+            return None
             
         # 验证文件
         file_path = self.test_data_file_var.get()
         if not file_path or not os.path.exists(file_path):
             messagebox.showerror("错误", "请选择有效的测试数据文件")
-            return
-            
-        self.generate_btn.config(state="disabled")
+            return None
+
+        return {"api_key": api_key, "model": self.model_var.get(), "test_data_file": file_path}
+
+    def _enqueue(self, api_paths, settings):
+        """把接口加入任务队列，返回提交的任务列表；同一次加入的接口记为一个用量批次"""
+        # 所有配置在主线程读取后放入任务上下文，工作线程不再访问 Tk 变量或修改模块全局变量
+        batch_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:4]
+        jobs = [self.job_runner.submit(api_path, settings["test_data_file"], api_key=settings["api_key"],
+                                       model=settings["model"], render_scripts=False, case_db=CASE_DB_FILE,
+                                       batch_id=batch_id)
+                for api_path in api_paths]
         self.progress.start()
+        self._schedule_job_tick()
+        return jobs
+
+    def on_generate(self):
+        """生成测试用例：把当前接口加入队列，完成后自动显示"""
+        settings = self._collect_job_settings()
+        if settings is None:
+            return
+
+        api_path = self.api_path_var.get().strip()
+        if not api_path:
+            self.status_var.set("请输入接口路径")
+            return
+
+        job = self._enqueue([api_path], settings)[0]
+        self.follow_job_id = job.id
         self.status_var.set("正在生成测试用例...")
-        
-        # 在新线程中执行生成逻辑
-        thread = threading.Thread(target=self._generate_in_thread)
-        thread.daemon = True
-        thread.start()
 
-    def _generate_in_thread(self):
-        """在线程中执行生成逻辑"""
+    def on_enqueue_batch(self):
+        """把批量输入框中的接口全部加入队列"""
+        api_paths = []
+        for line in self.batch_text.get("1.0", tk.END).splitlines():
+            line = line.strip()
+            if line and line not in api_paths:
+                api_paths.append(line)
+        if not api_paths:
+            self.status_var.set("请在左侧输入接口路径（每行一个）")
+            return
+
+        settings = self._collect_job_settings()
+        if settings is None:
+            return
+        self._enqueue(api_paths, settings)
+        self.status_var.set(f"已加入队列 {len(api_paths)} 个接口")
+
+    def on_cancel_selected(self):
+        """取消所选任务（排队中或运行中）"""
+        cancelled = sum(1 for job_id in self.job_tree.selection() if self.job_runner.cancel(job_id))
+        self.status_var.set(f"已请求取消 {cancelled} 个任务" if cancelled else "所选任务均已结束")
+
+    def on_clear_finished(self):
+        """从队列中移除已结束的任务"""
+        for job_id in self.job_runner.remove_finished():
+            if self.job_tree.exists(job_id):
+                self.job_tree.delete(job_id)
+
+    def _job_row_values(self, job):
+        stage = STAGE_LABELS.get(job.stage, job.stage) if not job.finished else "-"
+        return (job.api_path, STATUS_LABELS.get(job.status, job.status), stage, f"{job.elapsed:.1f}s")
+
+    def _on_job_update(self, job_id):
+        """任务状态变化（主线程中执行）"""
+        job = self.job_runner.get(job_id)
+        if job is None:
+            return
+        values = self._job_row_values(job)
+        if self.job_tree.exists(job_id):
+            self.job_tree.item(job_id, values=values)
+        else:
+            self.job_tree.insert("", tk.END, iid=job_id, values=values)
+
+        if job_id == self.follow_job_id:
+            if job.status == STATUS_DONE:
+                self._show_job_result(job)
+            elif job.finished:
+                self.status_var.set(f"生成失败: {job.error}" if job.status == STATUS_FAILED else job.message)
+            elif job.message:
+                self.status_var.set(f"[{job.stage}] {job.message}")
+        elif job.finished:
+            self.status_var.set(self._with_trace_summary(f"{job.api_path}: {job.message}", job))
+
+    def _with_trace_summary(self, text, job):
+        """在状态栏文字后附上该任务各阶段的耗时与 token 用量"""
+        parts = [text, tracing.format_summary(self.tracer.summary(job.id))]
+        if job.result and job.result.get("usage"):
+            parts.append(llm_usage.format_usage(job.result["usage"]))
+        return "  |  ".join(part for part in parts if part)
+
+    def on_export_trace(self):
+        """把已记录的各阶段耗时导出为 Chrome trace（.json）或 JSONL 文件"""
+        path = filedialog.asksaveasfilename(
+            title="导出追踪",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json"), ("JSONL", "*.jsonl")],
+            initialfile="autoapi_trace.json",
+        )
+        if not path:
+            return
         try:
-            # 更新豆包API配置
-            doubao.DOUBAO_API_KEY = self.api_key_var.get()
-            model = self.model_var.get()
-            
-            # 获取API文档
-            api_path = self.api_path_var.get().strip()
-            if not api_path:
-                self.status_var.set("请输入接口路径")
-                return
-            
-            self.api_doc = doubao.get_api_doc(api_path)
-            if not self.api_doc:
-                self.status_var.set("获取API文档失败")
-                return
-            
-            # 设置接口标题
-            self.api_title_var.set(api_path)
-            
-            # 加载测试数据
-            env_file_path = self.test_data_file_var.get()
-            test_data = doubao.load_test_data(env_file_path)
-            
-            if test_data == "[]":
-                self.status_var.set("测试数据文件为空")
-                return
-            
-            # 设计测试用例
-            self.test_cases = doubao.design_knowledge_driven_cases(self.api_doc, test_data, model)
-            
-            if not self.test_cases:
-                self.status_var.set("未能生成测试用例")
-                return
-            
-            # 生成脚本
-            self.script_blocks = []
-            self.parsed_cases = []
-            
-            for case in self.test_cases:
-                script_block = doubao.generate_scripts_for_case(self.api_doc, case)
-                self.script_blocks.append(script_block)
-                
-                parsed = parse_script_block(script_block)
-                self.parsed_cases.append(parsed)
-            
-            # 更新UI
-            self.after(0, self._update_ui_after_generate)
-            
+            if path.endswith(".jsonl"):
+                count = self.tracer.write_jsonl(path)
+            else:
+                count = self.tracer.write_chrome_trace(path)
+            self.status_var.set(f"已导出 {count} 个追踪记录到 {path}")
         except Exception as e:
-            error_msg = f"生成失败: {str(e)}"
-            print(f"错误详情: {traceback.format_exc()}")
-            self.after(0, lambda: self.status_var.set(error_msg))
-        finally:
-            self.after(0, self._finish_generate)
-
-    def _update_ui_after_generate(self):
-        """生成完成后更新UI"""
+            messagebox.showerror("错误", f"导出追踪失败: {e}")
+
+    def _schedule_job_tick(self):
+        if not self._job_tick_scheduled:
+            self._job_tick_scheduled = True
+            self.after(JOB_TICK_MS, self._job_tick)
+
+    def _job_tick(self):
+        """定时刷新运行中任务的耗时；队列清空后停止进度条"""
+        self._job_tick_scheduled = False
+        for job in self.job_runner.jobs():
+            if not job.finished and self.job_tree.exists(job.id):
+                self.job_tree.item(job.id, values=self._job_row_values(job))
+        if self.job_runner.active_count:
+            self._schedule_job_tick()
+        else:
+            self.progress.stop()
+
+    def _on_job_select(self, event=None):
+        """选中已完成的任务时显示其用例"""
+        selection = self.job_tree.selection()
+        if len(selection) != 1:
+            return
+        job = self.job_runner.get(selection[0])
+        if job is not None and job.status == STATUS_DONE:
+            self._show_job_result(job, switch=True)
+
+    def _show_job_result(self, job, switch=False):
+        """显示某个任务生成的用例；switch 为 False 时不把用户从正在查看的其他接口切走"""
+        self.follow_job_id = None
+        self._update_ui_after_generate(job.result, switch)
+        self.status_var.set(self._with_trace_summary(self.status_var.get(), job))
+
+    def _on_close(self):
+        """关闭窗口时取消未完成的任务"""
+        self.job_runner.shutdown()
+        self.destroy()
+
+    def _update_ui_after_generate(self, result, switch=False):
+        """生成完成后更新UI：当前没有显示接口、显示的就是该接口或 switch 为 True 时切换到其第一条用例"""
+        api_path = result["api_path"]
+        if self.results.get(api_path) is not result:
+            self.results[api_path] = result
+            self.rendered_cases = {key: value for key, value in self.rendered_cases.items() if key[0] != api_path}
+            if self.displayed_case and self.displayed_case[0] == api_path:
+                self.displayed_case = None
+            self.case_browser.set_cases(api_path, result["test_cases"])
+        if not (switch or self.current_api is None or self.current_api == api_path):
+            self.status_var.set(f"{api_path} 成功生成 {len(result['test_cases'])} 个测试用例，可在用例浏览器中查看")
+            return
+        self._show_case(api_path, 0)
+        self.status_var.set(f"成功生成 {len(self.test_cases)} 个测试用例")
+
+    def _load_stored_cases(self):
+        """在后台线程读取用例库中各接口最近一次的结果"""
+        if not os.path.exists(CASE_DB_FILE):
+            return
+
+        def run():
+            try:
+                import case_store
+                conn = case_store.connect(CASE_DB_FILE)
+                try:
+                    stored = case_store.latest_cases(conn)
+                finally:
+                    conn.close()
+            except Exception as e:
+                self._post(self.status_var.set, f"读取用例库失败: {e}")
+                return
+            self._post(self._on_stored_cases_loaded, stored)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def _on_stored_cases_loaded(self, stored):
+        """把用例库中的结果加入用例浏览器；当前接口有结果时直接显示"""
+        for item in stored:
+            api_path = item["api_path"]
+            if api_path in self.results:
+                continue
+            self.results[api_path] = {"api_path": api_path, "api_doc": item["api_doc"], "test_cases": item["test_cases"],
+                                      "script_blocks": [], "parsed_cases": [], "cached": True, "error": ""}
+            self.case_browser.set_cases(api_path, item["test_cases"])
+        current = self.api_path_var.get().strip()
+        if self.current_api is None and current in self.results:
+            self._show_case(current, 0)
+        if stored:
+            self.status_var.set(f"已从用例库加载 {len(stored)} 个接口的用例")
+
+    def _show_case(self, api_path, idx):
+        """切换到某个接口的某条用例（用例浏览器、队列选择和上一条/下一条共用）"""
+        result = self.results.get(api_path)
+        if not result or not 0 <= idx < len(result["test_cases"]):
+            return
+        # 每次都从结果中读取：同一接口重新生成后 self.results 中已换成新的结果
+        self.current_api = api_path
+        self.api_doc = result["api_doc"]
+        self.test_cases = result["test_cases"]
+        self.api_title_var.set(api_path)
         self.case_count_var.set(f"生成的用例数量: {len(self.test_cases)}")
-        self.current_idx_var.set(0)
+        self.current_idx_var.set(idx)
         self._display_current_case()
-        self.status_var.set(f"成功生成 {len(self.test_cases)} 个测试用例")
+        self.case_browser.select(api_path, idx, notify=False)
+
+    def _rendered_case(self, api_path, idx):
+        """返回解析后的用例脚本；未预先渲染时在首次查看时渲染并缓存"""
+        result = self.results[api_path]
+        if result["parsed_cases"]:
+            return result["parsed_cases"][idx]
+        key = (api_path, idx)
+        if key not in self.rendered_cases:
+            self.rendered_cases[key] = doubao.render_case(result["api_doc"], result["test_cases"][idx])
+        return self.rendered_cases[key]
+
+    def on_export(self):
+        """将当前接口的用例导出为 JSONL / Markdown / JMX 文件"""
+        if not self.test_cases or not self.api_doc:
+            messagebox.showwarning("警告", "没有测试用例可导出")
+            return
+
+        output_dir = filedialog.askdirectory(title="选择导出目录")
+        if not output_dir:
+            return
 
-    def _finish_generate(self):
-        """完成生成操作"""
-        self.generate_btn.config(state="normal")
-        self.progress.stop()
+        job = {"api_path": self.api_title_var.get(), "api_doc": self.api_doc, "test_cases": list(self.test_cases)}
+        self.status_var.set("正在导出...")
+
+        def run():
+            try:
+                import batch_export
+                stats = batch_export.export_batch([job], output_dir)
+                message = f"导出完成: 新导出 {stats['exported']}，跳过 {stats['skipped']}，失败 {stats['failed']}"
+            except Exception as e:
+                message = f"导出失败: {e}"
+            self._post(self.status_var.set, message)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
 
     def _display_current_case(self):
         """显示当前用例"""
-        if not self.parsed_cases:
+        if not self.test_cases:
             return
         
         idx = self.current_idx_var.get()
-        if 0 <= idx < len(self.parsed_cases):
-            case = self.parsed_cases[idx]
+        if (self.current_api, idx) == self.displayed_case:
+            return
+        if 0 <= idx < len(self.test_cases):
+            case = self._rendered_case(self.current_api, idx)
+            self.displayed_case = (self.current_api, idx)
             
             self.case_name_var.set(case["case_name"])
             
@@ -407,31 +646,40 @@ class App(tk.Tk):
 
     def on_prev(self):
         """显示上一条用例"""
-        if not self.parsed_cases:
+        if not self.test_cases:
             return
         
         current = self.current_idx_var.get()
         if current > 0:
-            self.current_idx_var.set(current - 1)
-            self._display_current_case()
+            self._show_case(self.current_api, current - 1)
             self.status_var.set(f"显示第 {current} 条用例")
         else:
             self.status_var.set("已经是第一条")
 
     def on_next(self):
         """显示下一条用例"""
-        if not self.parsed_cases:
+        if not self.test_cases:
             return
         
         current = self.current_idx_var.get()
-        if current < len(self.parsed_cases) - 1:
-            self.current_idx_var.set(current + 1)
-            self._display_current_case()
+        if current < len(self.test_cases) - 1:
+            self._show_case(self.current_api, current + 1)
             self.status_var.set(f"显示第 {current + 2} 条用例")
         else:
             self.status_var.set("已经是最后一条")
 
 
 if __name__ == "__main__":
+    # 打包后的程序在导出时会启动子进程，需要先处理 multiprocessing 的冻结入口
+    multiprocessing.freeze_support()
     app = App()
+    probe_path = os.environ.get(STARTUP_PROBE_ENV)
+    if probe_path:
+        def _on_map(event):
+            if event.widget is not app:
+                return
+            with open(probe_path, "w", encoding="utf-8") as f:
+                f.write(repr(time.time()))
+            app.after(0, app.destroy)
+        app.bind("<Map>", _on_map)
     app.mainloop() 
\ No newline at end of file
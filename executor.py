@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内置用例执行器：在本地完成签名与变量解析后，通过带连接池的异步 HTTP 客户端并发发送请求，
+记录每个用例的状态码、耗时和响应片段。
+
+HTTP 客户端基于 asyncio 标准库实现（HTTP/1.1 keep-alive），不引入额外依赖。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import time
+from urllib.parse import urlsplit
+
+import doubao
+import signing
+from job_context import JobContext
+
+OPEN_API_BASE_URL = os.environ.get("OPEN_API_BASE_URL", "")
+DEFAULT_CONCURRENCY = 10
+DEFAULT_TIMEOUT = 30.0
+SNIPPET_LENGTH = 500
+
+
+class HttpResponse:
+    """异步客户端返回的响应。"""
+
+    def __init__(self, status: int, reason: str, headers: dict, body: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+class AsyncHttpPool:
+    """
+    简单的 HTTP/1.1 异步连接池：按 (scheme, host, port) 复用空闲连接。
+
+    max_idle_per_host 为每个目标主机保留的空闲连接上限；并发度由调用方控制。
+    """
+
+    def __init__(self, max_idle_per_host: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._ssl_context = None
+        self.connections_opened = 0
+
+    async def _open(self, key):
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context), self.timeout)
+        self.connections_opened += 1
+        return reader, writer
+
+    async def _acquire(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return (reader, writer), True
+            writer.close()
+        return await self._open(key), False
+
+    def _release(self, key, conn):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle_per_host:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def _read_body(self, reader, headers: dict, status: int, method: str) -> tuple:
+        """读取响应体，返回 (body, 连接是否可复用)。"""
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return b"", True
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # 跳过 trailer，直到空行
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return b"".join(chunks), True
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"])), True
+        # 既无长度也非分块：读到连接关闭为止
+        return await reader.read(), False
+
+    async def _roundtrip(self, conn, method: str, host_header: str, target: str, body: bytes, headers: dict):
+        reader, writer = conn
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}", "Connection: keep-alive",
+                 f"Content-Length: {len(body)}"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        head = await reader.readuntil(b"\r\n\r\n")
+        head_lines = head.decode("latin-1").split("\r\n")
+        status_parts = head_lines[0].split(" ", 2)
+        status = int(status_parts[1])
+        reason = status_parts[2] if len(status_parts) > 2 else ""
+        resp_headers = {}
+        for line in head_lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                resp_headers[name.strip().lower()] = value.strip()
+
+        resp_body, reusable = await self._read_body(reader, resp_headers, status, method)
+        if resp_headers.get("connection", "").lower() == "close" or status_parts[0] == "HTTP/1.0":
+            reusable = False
+        return HttpResponse(status, reason, resp_headers, resp_body), reusable
+
+    async def request(self, method: str, url: str, body: bytes = b"", headers: dict = None) -> HttpResponse:
+        """发送一个请求；复用的空闲连接若已被服务端关闭，会自动换新连接重试一次。"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        default_port = (scheme == "https" and port == 443) or (scheme == "http" and port == 80)
+        host_header = parts.hostname if default_port else f"{parts.hostname}:{port}"
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        for attempt in range(2):
+            conn, reused = await self._acquire(key)
+            try:
+                response, reusable = await asyncio.wait_for(
+                    self._roundtrip(conn, method, host_header, target, body, headers), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                conn[1].close()
+                if reused and attempt == 0:
+                    continue
+                raise ConnectionError(f"请求失败 {url}: {e}") from e
+            except BaseException:
+                conn[1].close()
+                raise
+            if reusable:
+                self._release(key, conn)
+            else:
+                conn[1].close()
+            return response
+
+    async def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+async def execute_case(pool: AsyncHttpPool, url: str, api_doc: dict, test_case: dict, variables: dict,
+                       app_key: str = None, secret: str = None, snippet_length: int = SNIPPET_LENGTH) -> dict:
+    """签名并发送单个用例，返回执行结果。"""
+    resolved = signing.resolve_case_request(api_doc, test_case, variables, app_key, secret)
+    result = {
+        "case_name": resolved["case_name"],
+        "request_body": resolved["body"],
+        "unresolved": resolved["unresolved"],
+        "status": None,
+        "ok": False,
+        "latency_ms": None,
+        "response_snippet": "",
+        "error": "",
+    }
+    headers = {"Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"}
+    started = time.perf_counter()
+    try:
+        response = await pool.request("POST", url, resolved["body"].encode("utf-8"), headers)
+        result["status"] = response.status
+        result["ok"] = 200 <= response.status < 400
+        result["response_snippet"] = response.text()[:snippet_length]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+async def execute_cases_async(api_path: str, api_doc: dict, test_cases: list, variables: dict,
+                              base_url: str = None, app_key: str = None, secret: str = None,
+                              concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                              pool: AsyncHttpPool = None) -> list:
+    """并发执行一个接口的全部用例，结果顺序与 test_cases 一致。"""
+    base_url = (base_url or OPEN_API_BASE_URL).rstrip("/")
+    if not base_url:
+        raise ValueError("未配置开放平台地址，请设置 OPEN_API_BASE_URL 或传入 base_url")
+    url = f"{base_url}{api_path}"
+
+    own_pool = pool is None
+    pool = pool or AsyncHttpPool(max_idle_per_host=concurrency, timeout=timeout)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(case):
+        async with semaphore:
+            return await execute_case(pool, url, api_doc, case, variables, app_key, secret)
+
+    try:
+        return await asyncio.gather(*(run_one(case) for case in test_cases))
+    finally:
+        if own_pool:
+            await pool.close()
+
+
+def execute_cases(api_path: str, api_doc: dict, test_cases: list, variables: dict, **kwargs) -> list:
+    """execute_cases_async 的同步封装，便于在线程或命令行中调用。"""
+    return asyncio.run(execute_cases_async(api_path, api_doc, test_cases, variables, **kwargs))
+
+
+def summarize_results(results: list) -> str:
+    """生成执行结果的文本摘要。"""
+    lines = []
+    passed = sum(1 for r in results if r["ok"])
+    latencies = sorted(r["latency_ms"] for r in results if r["latency_ms"] is not None)
+    for r in results:
+        mark = "✅" if r["ok"] else "❌"
+        detail = r["error"] or r["response_snippet"][:120].replace("\n", " ")
+        lines.append(f"{mark} [{r['status']}] {r['latency_ms']}ms {r['case_name']} - {detail}")
+    if latencies:
+        lines.append(f"通过 {passed}/{len(results)}，耗时 最小 {latencies[0]}ms / "
+                     f"中位 {latencies[len(latencies) // 2]}ms / 最大 {latencies[-1]}ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成并执行接口用例（本地签名 + 异步并发请求）")
+    parser.add_argument("api_path", help="接口路径，例如 /erp/opentrade/v2/list/trades")
+    parser.add_argument("--base-url", default=OPEN_API_BASE_URL, help="开放平台地址，默认读取 OPEN_API_BASE_URL")
+    parser.add_argument("--cases", default=None, help="已有用例 JSON 文件；不指定时调用豆包实时生成")
+    parser.add_argument("--api-doc", default=None, help="API 文档 JSON 文件；不指定时从文档服务器获取")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--model", default="doubao-seed-1-6-250615", help="生成用例使用的模型")
+    parser.add_argument("--doc-snapshot", default=None, help="文档快照（doc_snapshot.py 生成），从快照读取文档不访问文档服务器")
+    parser.add_argument("--usage-db", default="llm_usage.db", help="实时生成用例时把模型调用的 token 用量写入该库")
+    parser.add_argument("--trace", default=None, help="把文档获取、模型调用等各阶段的耗时写入 JSONL 追踪文件")
+    parser.add_argument("--profile", default=None, metavar="MODES", help="剖析用例设计与脚本生成阶段：cpu,stack,mem 或 all")
+    parser.add_argument("--profile-dir", default=None, help="剖析结果目录，默认 profiles/")
+    parser.add_argument("--case-db", default=None, help="生成用例库（SQLite）；文档与变量库未变化时直接复用其中的用例")
+    parser.add_argument("--dedup", default="exact", choices=("off", "exact", "classes", "minimize"),
+                        help="实时生成用例后的去重模式（见 case_dedup.py）")
+    parser.add_argument("--context-cache", default=None, choices=("off", "context"),
+                        help="实时生成用例时的提示词前缀缓存（见 prompt_cache.py）")
+    parser.add_argument("--app-key", default=None, help="appKey，默认读取变量库中的 appKey")
+    parser.add_argument("--secret", default=None, help="secret，默认读取变量库中的 secret")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="最大并发请求数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个请求超时（秒）")
+    parser.add_argument("--output", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--record", default=None, help="将本次结果写入性能基线库（SQLite 路径）")
+    parser.add_argument("--env", default=os.environ.get("AUTOAPI_ENV", "default"), help="写入基线库时的环境名称")
+    args = parser.parse_args()
+    # 在生成用例（可能调用模型）之前检查，避免生成完才因缺少地址失败
+    if not args.base_url.strip():
+        parser.error("未配置开放平台地址，请设置 OPEN_API_BASE_URL 或传入 --base-url")
+
+    if args.doc_snapshot:
+        doubao.set_doc_snapshot(args.doc_snapshot)
+    if args.trace:
+        import tracing
+        tracing.set_tracer(tracing.Tracer(args.trace))
+    if args.profile:
+        import profiling
+        profiling.enable(args.profile, args.profile_dir)
+    test_data = doubao.load_test_data(args.test_data)
+    variables = signing.variables_from_test_data(test_data)
+
+    # 实时生成时经任务上下文收集模型调用用量；用例库、去重与提示词缓存也经上下文传给 run_generation_job
+    ctx = JobContext(model=args.model, case_db=args.case_db, dedup=args.dedup, context_cache=args.context_cache)
+    if args.api_doc:
+        with open(args.api_doc, "r", encoding="utf-8") as f:
+            api_doc = json.load(f)
+        # 放入任务的文档缓存，run_generation_job 直接使用该文档而不再请求文档服务器
+        ctx.caches.put("doc", f"{doubao.BASE_DOC_URL}{args.api_path}", api_doc)
+    else:
+        api_doc = doubao.get_api_doc(args.api_path, ctx)
+    if not api_doc:
+        return
+
+    if args.cases:
+        with open(args.cases, "r", encoding="utf-8") as f:
+            test_cases = json.load(f)
+    else:
+        result = doubao.run_generation_job(args.api_path, test_data, ctx, render_scripts=False)
+        if result["error"]:
+            print(result["error"])
+        elif result["cached"]:
+            print(f"复用用例库中的 {len(result['test_cases'])} 个用例")
+        test_cases = result["test_cases"]
+    if ctx.usage and args.usage_db:
+        import llm_usage
+        summary = llm_usage.summarize_calls(ctx.usage, len(test_cases or []))
+        print(f"模型用量: {llm_usage.format_usage(summary)}")
+        conn = llm_usage.connect(args.usage_db)
+        llm_usage.save_calls(conn, ctx.usage, args.api_path, len(test_cases or []), job_id=ctx.job_id)
+        conn.close()
+    if not test_cases:
+        print("没有可执行的用例")
+        return
+
+    started = time.perf_counter()
+    results = execute_cases(args.api_path, api_doc, test_cases, variables, base_url=args.base_url,
+                            app_key=args.app_key, secret=args.secret,
+                            concurrency=args.concurrency, timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+    print(summarize_results(results))
+    print(f"共执行 {len(results)} 个用例，总耗时 {elapsed:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.record:
+        import perf_store
+        conn = perf_store.connect(args.record)
+        run_id = perf_store.record_run(conn, perf_store.entries_from_executor_results(args.api_path, results),
+                                       args.env, "executor")
+        print(f"已写入性能基线库: {run_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,46 @@
-import requests
 import json
 import time
 import os
 import re
-import google.generativeai as genai
+
+import llm_usage
+import var_library
 
 BASE_DOC_URL = "http://114.67.231.162/api/doc"
+GEMINI_MODEL_NAME = "gemini-2.5-pro"
+
+# google.generativeai 导入和模型初始化都较慢，推迟到首次调用时进行
+_gemini_api_key = None
+_gemini_model = None
+
+def set_gemini_api_key(api_key: str) -> None:
+    """设置Gemini API密钥，下次调用时按新密钥重新初始化模型"""
+    global _gemini_api_key, _gemini_model
+    _gemini_api_key = api_key
+    _gemini_model = None
+
+def get_gemini_model():
+    """首次使用时导入SDK并初始化Gemini模型，失败时返回None"""
+    global _gemini_model
+    if _gemini_model is not None:
+        return _gemini_model
+    try:
+        import google.generativeai as genai
 
-try:
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("警告: 未找到环境变量 GEMINI_API_KEY。请在PyCharm运行配置中设置。")
-    genai.configure(api_key=api_key)
-    gemini_model = genai.GenerativeModel('gemini-2.5-pro')
-except Exception as e:
-    print(f"Gemini 初始化失败: {e}")
-    gemini_model = None
+        api_key = _gemini_api_key or os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            print("警告: 未找到环境变量 GEMINI_API_KEY。请在PyCharm运行配置中设置。")
+        genai.configure(api_key=api_key)
+        _gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    except Exception as e:
+        print(f"Gemini 初始化失败: {e}")
+        _gemini_model = None
+    return _gemini_model
 
 def get_api_doc(api_path: str) -> dict:
     """获取API文档信息"""
+    import requests
+
     doc_url = f"{BASE_DOC_URL}{api_path}"
     try:
         response = requests.get(doc_url, timeout=30)
@@ -29,21 +51,15 @@ def get_api_doc(api_path: str) -> dict:
         return None
 
 def load_test_data(file_path: str) -> str:
-    """加载并简化测试数据"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        simplified_data = [
-            {"name": item.get("name"), "value": item.get("value"), "description": item.get("description", "")}
-            for item in data
-        ]
-        return json.dumps(simplified_data, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"读取或处理测试数据文件 '{file_path}' 失败: {e}")
-        return "[]"
+    """加载并简化测试数据（与 doubao 共用 var_library 的缓存）"""
+    return var_library.load_test_data(file_path)
 
-def design_knowledge_driven_cases(api_doc: dict, test_data_json: str) -> list:
-    """使用Gemini，结合API文档和预设业务数据，设计出引用环境变量的测试用例。"""
+def design_knowledge_driven_cases(api_doc: dict, test_data_json: str, usage: list = None) -> list:
+    """使用Gemini，结合API文档和预设业务数据，设计出引用环境变量的测试用例。
+
+    传入 usage 列表时追加本次调用的 token 用量（见 llm_usage.py）。
+    """
+    gemini_model = get_gemini_model() if api_doc else None
     if not gemini_model or not api_doc:
         return []
 
@@ -89,7 +105,11 @@ def design_knowledge_driven_cases(api_doc: dict, test_data_json: str) -> list:
     print("\n>>> 正在请求 Gemini 设计智能测试用例，请稍候...")
     try:
         request_options = {"timeout": 120}
+        started = time.perf_counter()
         response = gemini_model.generate_content(prompt, request_options=request_options)
+        llm_usage.record(None, llm_usage.make_usage(
+            "gemini", GEMINI_MODEL_NAME, time.perf_counter() - started,
+            **llm_usage.gemini_usage_fields(getattr(response, "usage_metadata", None))), sink=usage)
 
         raw_text = response.text
         json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
@@ -225,6 +245,61 @@ vars.put("time", time);
 
     return "\n".join(output_lines)
 
+def generate_test_cases_for_api(api_path: str, env_file_path: str, case_count: int = None,
+                                case_db: str = "case_store.db", usage_db: str = llm_usage.DEFAULT_DB) -> list:
+    """获取文档并设计用例，每个用例附带 name 与 script 供界面显示。
+
+    文档与变量库都未变化时直接复用生成用例库中的结果；case_count 限制返回的用例数量。
+    usage_db 设置时把模型调用的 token 用量写入该用量库。
+    """
+    from contextlib import closing
+
+    import case_store
+
+    api_doc = get_api_doc(api_path)
+    test_data = load_test_data(env_file_path)
+    if not api_doc or test_data == "[]":
+        return []
+
+    test_cases = None
+    if case_db:
+        try:
+            with closing(case_store.connect(case_db)) as conn:
+                stored = case_store.find_cases(conn, api_path, api_doc, test_data, GEMINI_MODEL_NAME)
+            if stored:
+                test_cases = stored["test_cases"]
+                print(f"复用用例库中的 {len(test_cases)} 个用例")
+        except Exception as e:
+            print(f"读取用例库失败: {e}")
+
+    if test_cases is None:
+        usage = []
+        test_cases = design_knowledge_driven_cases(api_doc, test_data, usage)
+        if usage and usage_db:
+            try:
+                with closing(llm_usage.connect(usage_db)) as conn:
+                    llm_usage.save_calls(conn, usage, api_path, len(test_cases))
+            except Exception as e:
+                print(f"写入用量库失败: {e}")
+        if test_cases and case_db:
+            try:
+                with closing(case_store.connect(case_db)) as conn:
+                    case_store.save_cases(conn, api_path, api_doc, test_data, GEMINI_MODEL_NAME, test_cases)
+            except Exception as e:
+                print(f"写入用例库失败: {e}")
+
+    if case_count:
+        test_cases = test_cases[:case_count]
+    return [dict(case, name=case.get("case_name", "未命名用例"), script=generate_scripts_for_case(api_doc, case))
+            for case in test_cases]
+
+def save_test_cases_to_file(test_cases: list, file_path: str) -> None:
+    """将用例保存为 JSON 文件（先写临时文件再替换，避免保存中断留下半个文件）"""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(test_cases, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, file_path)
+
 if __name__ == "__main__":
     env_file_path = "MS_25_Environments_variables.json"
     test_data = load_test_data(env_file_path)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+生成任务上下文：把凭据、模型、服务地址、共享缓存、取消令牌和进度回调显式地传给
+get_api_doc → design_knowledge_driven_cases → generate_scripts_for_case，
+取代修改模块全局变量（如 doubao.DOUBAO_API_KEY）的做法，使同一进程内可以安全地并行运行多个任务。
+"""
+
+import threading
+import time
+import uuid
+
+
+class JobCancelled(Exception):
+    """任务已被取消。"""
+
+
+class CancelToken:
+    """线程安全的取消令牌。可注册回调，在取消时中止进行中的 HTTP 请求或流式调用。"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled("任务已取消")
+
+    def add_callback(self, callback) -> None:
+        """注册取消回调；若已取消则立即执行。"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class SharedCaches:
+    """多个任务共享的线程安全缓存（API 文档、复杂对象模型等），按 (类别, 键) 存取。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, kind: str, key):
+        with self._lock:
+            return self._data.get((kind, key))
+
+    def put(self, kind: str, key, value) -> None:
+        with self._lock:
+            self._data[(kind, key)] = value
+
+    def clear(self, kind: str = None) -> None:
+        with self._lock:
+            if kind is None:
+                self._data.clear()
+            else:
+                for cache_key in [k for k in self._data if k[0] == kind]:
+                    del self._data[cache_key]
+
+
+class JobContext:
+    """
+    单个生成任务的上下文。
+
+    api_key / model / llm_base_url / doc_base_url 为 None 时使用 doubao 模块的默认配置；
+    case_db 为生成用例库（case_store）路径，设置后文档与变量库未变化时直接复用已有用例；
+    doc_snapshot 为 doc_snapshot.DocSnapshot，设置后优先从快照读取文档和模型；
+    tracer 为 tracing.Tracer，设置后记录各阶段的耗时与收发字节数；
+    dedup 为模型生成用例后的去重模式（见 case_dedup.MODES），默认只合并请求完全相同的用例；
+    context_cache 为提示词前缀的缓存模式（见 prompt_cache.MODES），为 None 时取环境变量 AUTOAPI_CONTEXT_CACHE；
+    progress 为可选回调 progress(ctx, stage, message)，由工作线程调用，调用方负责把更新转交给 UI 线程。
+    """
+
+    def __init__(self, api_key: str = None, model: str = None, llm_base_url: str = None,
+                 doc_base_url: str = None, caches: SharedCaches = None, cancel_token: CancelToken = None,
+                 progress=None, job_id: str = None, case_db: str = None, doc_snapshot=None,
+                 tracer=None, dedup: str = "exact", context_cache: str = None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.api_key = api_key
+        self.model = model
+        self.llm_base_url = llm_base_url
+        self.doc_base_url = doc_base_url
+        self.case_db = case_db
+        self.doc_snapshot = doc_snapshot
+        self.tracer = tracer
+        self.dedup = dedup
+        self.context_cache = context_cache
+        # 本任务的大模型调用用量（llm_usage.make_usage 的记录）
+        self.usage = []
+        self.caches = caches if caches is not None else SharedCaches()
+        self.cancel_token = cancel_token or CancelToken()
+        self.progress = progress
+        self.stage = "pending"
+        self.created_at = time.time()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    def check_cancelled(self) -> None:
+        self.cancel_token.raise_if_cancelled()
+
+    def report(self, stage: str, message: str = "") -> None:
+        """记录当前阶段并通知进度回调；会先检查是否已取消。"""
+        self.check_cancelled()
+        self.stage = stage
+        if self.progress:
+            self.progress(self, stage, message)
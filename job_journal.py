@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+批量生成的任务日志：只追加的 JSONL 文件，记录每个接口的状态 / 阶段变化和生成结果，
+进程中途退出（断网、休眠、关闭程序）后可据此续跑，已付费生成的用例不会丢失。
+
+- 每条记录一行，写入后立即 flush + fsync；进程在写入过程中退出时最后一行可能不完整，读取时忽略；
+- 任务完成时记录完整的 API 文档和用例，续跑时直接用于导出，不再调用模型；
+- replay() 把日志回放为每个接口的最终状态，供 --resume 决定跳过、只导出还是重新生成。
+"""
+
+import json
+import os
+import threading
+import time
+
+EVENT_BATCH = "batch"
+EVENT_STAGE = "stage"
+EVENT_EXPORTED = "exported"
+# 状态事件与 job_runner 的任务状态同名：queued / running / done / failed / cancelled
+
+
+class ApiState:
+    """一个接口在日志中的最终状态。"""
+
+    __slots__ = ("api_path", "status", "stage", "attempts", "error", "api_doc", "test_cases", "exported", "files")
+
+    def __init__(self, api_path: str):
+        self.api_path = api_path
+        self.status = None
+        self.stage = None
+        self.attempts = 0
+        self.error = ""
+        self.api_doc = None
+        self.test_cases = None
+        self.exported = False
+        self.files = {}
+
+    @property
+    def generated(self) -> bool:
+        """已生成用例（日志中保存了用例，可直接导出）。"""
+        return self.test_cases is not None
+
+
+class Journal:
+    """线程安全的只追加日志。与 JobRunner 配合时由 record_job 记录任务状态变化。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._last = {}
+        # 上次写入到一半时退出：先结束那一行，避免下一条记录接在不完整的行后面
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+                    self._file.flush()
+
+    def append(self, event: str, **fields) -> None:
+        record = dict(fields, event=event, ts=round(time.time(), 3))
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record_job(self, job) -> None:
+        """记录 job_runner.Job 的状态或阶段变化（只在变化时写入）；任务完成时写入文档和用例。"""
+        key = (job.status, job.stage)
+        with self._lock:
+            if self._last.get(job.id) == key:
+                return
+            previous = self._last.get(job.id)
+            self._last[job.id] = key
+        common = {"api_path": job.api_path, "job_id": job.id, "batch_id": job.batch_id}
+        if previous is not None and previous[0] == job.status:
+            self.append(EVENT_STAGE, stage=job.stage, **common)
+            return
+        fields = dict(common, stage=job.stage)
+        if job.status == "done" and job.result:
+            fields.update(api_doc=job.result["api_doc"], test_cases=job.result["test_cases"],
+                          usage=job.result.get("usage"), unknown_vars=job.result.get("unknown_vars"))
+        elif job.status == "failed":
+            fields["error"] = job.error
+        self.append(job.status, **fields)
+        if job.finished:
+            with self._lock:
+                self._last.pop(job.id, None)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_records(path: str) -> list:
+    """读取日志记录；不完整或损坏的行（进程在写入时退出）被忽略。"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def replay(records: list) -> tuple:
+    """回放日志，返回 (batch 记录或 None, {接口路径: ApiState})。"""
+    batch = None
+    states = {}
+    for record in records:
+        event = record.get("event")
+        if event == EVENT_BATCH:
+            batch = batch or record
+            continue
+        api_path = record.get("api_path")
+        if not api_path:
+            continue
+        state = states.get(api_path)
+        if state is None:
+            state = states[api_path] = ApiState(api_path)
+        if event == EVENT_STAGE:
+            state.stage = record.get("stage")
+        elif event == EVENT_EXPORTED:
+            state.exported = True
+            state.files = record.get("files") or {}
+        else:
+            if event == "running":
+                state.attempts += 1
+            state.status = event
+            state.stage = record.get("stage")
+            if event == "failed":
+                state.error = record.get("error", "")
+            elif event == "done":
+                state.api_doc = record.get("api_doc")
+                state.test_cases = record.get("test_cases")
+                state.error = ""
+                state.exported = False
+    return batch, states
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+多接口生成任务队列：有界线程池并发执行排队的接口生成任务，记录每个任务的阶段与耗时，
+支持随时取消（会中止进行中的 HTTP 请求或流式模型调用）。与界面无关，GUI 与服务模式共用。
+"""
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import doubao
+import llm_usage
+import tracing
+from job_context import JobCancelled, JobContext, SharedCaches
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+STATUS_LABELS = {
+    STATUS_QUEUED: "排队中",
+    STATUS_RUNNING: "运行中",
+    STATUS_DONE: "完成",
+    STATUS_FAILED: "失败",
+    STATUS_CANCELLED: "已取消",
+}
+
+STAGE_LABELS = {
+    "pending": "-",
+    "doc": "文档",
+    "cache": "用例库",
+    "diff": "增量",
+    "models": "模型",
+    "llm": "LLM",
+    "render": "渲染",
+}
+
+
+class Job:
+    """一个接口的生成任务。"""
+
+    def __init__(self, api_path: str, test_data_file: str, ctx: JobContext, render_scripts: bool = True,
+                 batch_id: str = ""):
+        self.id = ctx.job_id
+        self.batch_id = batch_id
+        self.api_path = api_path
+        self.test_data_file = test_data_file
+        self.render_scripts = render_scripts
+        self.ctx = ctx
+        self.status = STATUS_QUEUED
+        self.message = ""
+        self.result = None
+        self.error = ""
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def stage(self) -> str:
+        return self.ctx.stage
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "batch_id": self.batch_id,
+            "api_path": self.api_path,
+            "status": self.status,
+            "stage": self.stage,
+            "message": self.message,
+            "error": self.error,
+            "elapsed": round(self.elapsed, 3),
+            "submitted_at": self.submitted_at,
+            "case_count": len(self.result["test_cases"]) if self.result else 0,
+        }
+
+
+class JobRunner:
+    """
+    有界工作线程池。on_update(job) 在任务状态或阶段变化时由工作线程调用，
+    GUI 需自行把更新转交给主线程。tracer（tracing.Tracer）设置后记录每个任务各阶段的 span，
+    未设置时使用 tracing 的进程级追踪器（AUTOAPI_TRACE）。
+    usage_db 设置时把每个任务的模型调用用量按批次写入该 llm_usage 库；未指定批次的任务归入本次运行的默认批次。
+    journal（job_journal.Journal）设置时把每个任务的状态 / 阶段变化和生成结果追加到任务日志，供中断后续跑。
+    """
+
+    def __init__(self, max_workers: int = 3, on_update=None, caches: SharedCaches = None, tracer=None,
+                 usage_db: str = None, journal=None):
+        self.max_workers = max_workers
+        self.on_update = on_update
+        self.caches = caches if caches is not None else SharedCaches()
+        self.tracer = tracer
+        self.usage_db = usage_db
+        self.journal = journal
+        self.default_batch_id = time.strftime("%Y%m%d-%H%M%S")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="autoapi-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def _notify(self, job: Job) -> None:
+        if self.journal is not None:
+            try:
+                self.journal.record_job(job)
+            except Exception as e:
+                print(f"写入任务日志失败: {e}")
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception:
+                print(f"任务状态回调失败: {traceback.format_exc()}")
+
+    def submit(self, api_path: str, test_data_file: str, api_key: str = None, model: str = None,
+               llm_base_url: str = None, doc_base_url: str = None, render_scripts: bool = True,
+               case_db: str = None, batch_id: str = None, dedup: str = "exact", context_cache: str = None) -> Job:
+        """将一个接口加入队列，返回任务对象。render_scripts 为 False 时不预先渲染脚本（见 doubao.render_case）。
+        dedup 为生成用例后的去重模式（见 case_dedup.MODES），context_cache 为提示词前缀的缓存模式（见 prompt_cache.MODES）。"""
+        ctx = JobContext(api_key=api_key, model=model, llm_base_url=llm_base_url, doc_base_url=doc_base_url,
+                         caches=self.caches, case_db=case_db, tracer=self.tracer, dedup=dedup,
+                         context_cache=context_cache)
+        job = Job(api_path, test_data_file, ctx, render_scripts, batch_id or self.default_batch_id)
+
+        def on_progress(_ctx, stage, message):
+            job.message = message
+            self._notify(job)
+
+        ctx.progress = on_progress
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        self._notify(job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        if job.ctx.cancelled:
+            self._finish(job, STATUS_CANCELLED)
+            return
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        self._notify(job)
+        try:
+            with tracing.span(job.ctx, "job", api_path=job.api_path):
+                test_data = doubao.load_test_data(job.test_data_file)
+                result = doubao.run_generation_job(job.api_path, test_data, job.ctx, job.render_scripts)
+            if job.ctx.cancelled:
+                self._finish(job, STATUS_CANCELLED)
+            elif result["error"]:
+                job.error = result["error"]
+                self._finish(job, STATUS_FAILED)
+            else:
+                job.result = result
+                job.message = f"{len(result['test_cases'])} 个用例"
+                if result.get("cached"):
+                    job.message += "（复用用例库）"
+                elif result.get("incremental"):
+                    job.message += f"（增量更新，{len(result['incremental']['changes'])} 处变化）"
+                if result.get("dedup") and result["dedup"]["kept"] < result["dedup"]["input"]:
+                    job.message += f"，去重 {result['dedup']['input'] - result['dedup']['kept']} 个"
+                if result.get("unknown_vars"):
+                    job.message += f"，{len(result['unknown_vars'])} 个未定义变量"
+                if result.get("usage") and result["usage"]["total_tokens"]:
+                    job.message += f"，{result['usage']['total_tokens']} tokens"
+                self._finish(job, STATUS_DONE)
+        except JobCancelled:
+            self._finish(job, STATUS_CANCELLED)
+        except Exception as e:
+            print(f"任务失败 {job.api_path}: {traceback.format_exc()}")
+            job.error = str(e)
+            self._finish(job, STATUS_FAILED)
+
+    def _save_usage(self, job: Job) -> None:
+        """把任务的模型调用用量写入用量库（失败或取消的任务同样计入，调用已产生费用）。"""
+        if not self.usage_db or not job.ctx.usage:
+            return
+        case_count = len(job.result["test_cases"]) if job.result else 0
+        try:
+            conn = llm_usage.connect(self.usage_db)
+            try:
+                llm_usage.save_calls(conn, job.ctx.usage, job.api_path, case_count, job.batch_id, job.id)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"写入用量库失败: {e}")
+
+    def _finish(self, job: Job, status: str) -> None:
+        self._save_usage(job)
+        job.status = status
+        job.finished_at = time.time()
+        if status == STATUS_CANCELLED:
+            job.message = "已取消"
+        elif status == STATUS_FAILED:
+            job.message = job.error
+        self._notify(job)
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务：排队中的直接取消；运行中的会中止进行中的请求。"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.ctx.cancel_token.cancel()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, STATUS_CANCELLED)
+        return True
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def remove_finished(self) -> list:
+        """移除已结束的任务，返回被移除的任务 ID。"""
+        with self._lock:
+            removed = [job_id for job_id, job in self._jobs.items() if job.finished]
+            for job_id in removed:
+                del self._jobs[job_id]
+        return removed
+
+    def remove(self, job_ids) -> list:
+        """移除指定的已结束任务（未结束的忽略），返回被移除的任务 ID。"""
+        with self._lock:
+            removed = [job_id for job_id in job_ids if job_id in self._jobs and self._jobs[job_id].finished]
+            for job_id in removed:
+                del self._jobs[job_id]
+        return removed
+
+    @property
+    def active_count(self) -> int:
+        return sum(1 for job in self.jobs() if not job.finished)
+
+    def shutdown(self, cancel_pending: bool = True) -> None:
+        if cancel_pending:
+            for job in self.jobs():
+                if not job.finished:
+                    job.ctx.cancel_token.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型输出的类 JSON 字面量（如复杂对象参数 query_body 的值）的容错解析与规范化。
+
+模型给出的字面量经常不是合法 JSON：单引号字符串、末尾多余的逗号、Python 的 True / False / None、
+不加引号的键。原先的兜底做法是把 ' 全部替换为 " 并删除所有空白，会破坏字符串值中的空格和撇号。
+这里用一遍扫描的递归下降解析器处理这些写法：
+
+- 合法 JSON 的解析结果与 json.loads 相同，因此规范化输出与原先完全一致（签名不变）；
+- 字符串内的空白、引号原样保留，输出为双引号的紧凑 JSON（不排序键，保持模型给出的顺序）；
+- 规范化结果按文本缓存，同一批用例中重复出现的字面量只解析一次。
+"""
+
+import argparse
+import json
+import re
+from functools import lru_cache
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"[-+]?(0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?")
+# 不加引号的键：标识符或中文等非分隔符
+_BARE_KEY = re.compile(r"[^\s:,{}\[\]'\"]+")
+_LITERALS = {
+    "true": True, "false": False, "null": None,
+    "True": True, "False": False, "None": None,
+}
+_LITERAL = re.compile(r"true|false|null|True|False|None")
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+# 字符串中不含引号和反斜杠的连续片段，按引号种类各编译一次
+_CHUNKS = {'"': re.compile(r'[^"\\]*'), "'": re.compile(r"[^'\\]*")}
+
+
+class _Parser:
+    __slots__ = ("text", "pos")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message: str):
+        return ValueError(f"{message}（位置 {self.pos}）")
+
+    def skip(self) -> str:
+        """跳过空白，返回下一个字符（到末尾时返回空串）。"""
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+        return self.text[self.pos:self.pos + 1]
+
+    def value(self):
+        char = self.skip()
+        if char == "{":
+            return self.obj()
+        if char == "[":
+            return self.array()
+        if char in ('"', "'"):
+            return self.string(char)
+        match = _NUMBER.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            number = match.group(0)
+            if match.group(2) or match.group(3):
+                return float(number)
+            return int(number)
+        match = _LITERAL.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            return _LITERALS[match.group(0)]
+        raise self.error("无法识别的值")
+
+    def string(self, quote: str) -> str:
+        chunk = _CHUNKS[quote]
+        text = self.text
+        self.pos += 1
+        parts = []
+        while True:
+            end = chunk.match(text, self.pos).end()
+            parts.append(text[self.pos:end])
+            if end >= len(text):
+                self.pos = end
+                raise self.error("字符串没有结束")
+            if text[end] == quote:
+                self.pos = end + 1
+                return "".join(parts)
+            # 反斜杠转义；不认识的转义原样保留
+            escaped = text[end + 1:end + 2]
+            if escaped == "u" and len(text) >= end + 6:
+                try:
+                    code = int(text[end + 2:end + 6], 16)
+                    self.pos = end + 6
+                    # 与 json.loads 一致：😀 这样的代理对合并为一个字符
+                    if 0xD800 <= code <= 0xDBFF and text.startswith("\\u", self.pos):
+                        low = int(text[self.pos + 2:self.pos + 6], 16)
+                        if 0xDC00 <= low <= 0xDFFF:
+                            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                            self.pos += 6
+                    parts.append(chr(code))
+                    continue
+                except ValueError:
+                    self.pos = end
+            if escaped in _ESCAPES:
+                parts.append(_ESCAPES[escaped])
+            else:
+                parts.append("\\" + escaped)
+            self.pos = end + 2
+
+    def key(self) -> str:
+        char = self.text[self.pos:self.pos + 1]
+        if char in ('"', "'"):
+            return self.string(char)
+        match = _BARE_KEY.match(self.text, self.pos)
+        if not match:
+            raise self.error("缺少键")
+        self.pos = match.end()
+        return match.group(0)
+
+    def obj(self) -> dict:
+        self.pos += 1
+        result = {}
+        while True:
+            char = self.skip()
+            if char == "}":
+                self.pos += 1
+                return result
+            name = self.key()
+            if self.skip() != ":":
+                raise self.error("缺少冒号")
+            self.pos += 1
+            result[name] = self.value()
+            char = self.skip()
+            if char == ",":
+                self.pos += 1
+            elif char != "}":
+                raise self.error("缺少逗号或 }")
+
+    def array(self) -> list:
+        self.pos += 1
+        result = []
+        while True:
+            char = self.skip()
+            if char == "]":
+                self.pos += 1
+                return result
+            result.append(self.value())
+            char = self.skip()
+            if char == ",":
+                self.pos += 1
+            elif char != "]":
+                raise self.error("缺少逗号或 ]")
+
+
+def parse(text: str):
+    """容错解析类 JSON 文本；无法解析时抛出 ValueError。"""
+    parser = _Parser(text)
+    result = parser.value()
+    if parser.skip():
+        raise parser.error("值之后有多余内容")
+    return result
+
+
+def dumps_compact(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+@lru_cache(maxsize=65536)
+def compact(text: str) -> str:
+    """类 JSON 文本 → 紧凑 JSON 文本（按文本缓存）；不是类 JSON 的文本去掉首尾空白后原样返回。"""
+    try:
+        return dumps_compact(parse(text))
+    except ValueError:
+        return text.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把类 JSON 字面量规范化为紧凑 JSON")
+    parser.add_argument("text", help="类 JSON 文本，例如 \"{'status': 'WAIT_SEND', 'page': 1,}\"")
+    args = parser.parse_args()
+    try:
+        print(dumps_compact(parse(args.text)))
+    except ValueError as e:
+        print(f"无法解析: {e}")
+
+
+if __name__ == "__main__":
+    main()
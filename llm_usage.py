@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型调用的 token 用量、吞吐与费用统计。
+
+每次调用豆包 / Gemini 都记录 提示 tokens、输出 tokens、缓存命中 tokens 和耗时，存入本地 SQLite（llm_usage.db），
+按 接口 / 模型 / 批次 / 日期 汇总输出 tokens/s、每千 tokens 生成的用例数和费用，
+用来判断提示词压缩和上下文缓存在哪些接口上最划算。
+
+价格按每百万 tokens 计，默认值见 DEFAULT_PRICES，可用 AUTOAPI_LLM_PRICES 指定的 JSON 文件覆盖：
+{"模型名": {"input": 0.8, "output": 8.0, "cached_input": 0.16, "currency": "CNY"}}
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_DB = "llm_usage.db"
+PRICES_ENV = "AUTOAPI_LLM_PRICES"
+
+# 每百万 tokens 的价格（以官方价目表为准，变化时用 AUTOAPI_LLM_PRICES 覆盖）
+DEFAULT_PRICES = {
+    "doubao-seed-1-6-250615": {"input": 0.8, "output": 8.0, "cached_input": 0.16, "currency": "CNY"},
+    "gemini-2.5-pro": {"input": 1.25, "output": 10.0, "cached_input": 0.31, "currency": "USD"},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    batch_id TEXT NOT NULL DEFAULT '',
+    job_id TEXT NOT NULL DEFAULT '',
+    api_path TEXT NOT NULL DEFAULT '',
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    purpose TEXT NOT NULL DEFAULT '',
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached_tokens INTEGER,
+    latency REAL NOT NULL,
+    case_count INTEGER NOT NULL DEFAULT 0,
+    cost REAL,
+    currency TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_time ON llm_calls(created_at);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_api ON llm_calls(api_path, created_at);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_batch ON llm_calls(batch_id);
+"""
+
+GROUP_COLUMNS = {
+    "api": "api_path",
+    "model": "model",
+    "batch": "batch_id",
+    "day": "date(created_at, 'unixepoch', 'localtime')",
+}
+
+_prices = None
+
+
+def load_prices() -> dict:
+    """默认价格，叠加 AUTOAPI_LLM_PRICES 指定文件中的配置（只读取一次）。"""
+    global _prices
+    if _prices is None:
+        prices = {model: dict(price) for model, price in DEFAULT_PRICES.items()}
+        path = os.environ.get(PRICES_ENV)
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    prices.update(json.load(f))
+            except Exception as e:
+                print(f"读取价格配置失败 {path}: {e}")
+        _prices = prices
+    return _prices
+
+
+def call_cost(model: str, prompt_tokens, completion_tokens, cached_tokens=0) -> tuple:
+    """按价格表计算一次调用的费用，返回 (费用, 币种)；模型没有价格或用量未知时费用为 None。"""
+    price = load_prices().get(model)
+    if not price or prompt_tokens is None or completion_tokens is None:
+        return None, (price or {}).get("currency", "")
+    cached_tokens = cached_tokens or 0
+    cached_price = price.get("cached_input", price["input"])
+    amount = ((prompt_tokens - cached_tokens) * price["input"] + cached_tokens * cached_price
+              + completion_tokens * price["output"]) / 1_000_000
+    return amount, price.get("currency", "")
+
+
+def make_usage(provider: str, model: str, latency: float, prompt_tokens=None, completion_tokens=None,
+               cached_tokens=None, purpose: str = "") -> dict:
+    """一次调用的用量记录；服务端未返回用量时 token 数为 None（汇总时不计入）。"""
+    cost, currency = call_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+    return {"provider": provider, "model": model, "purpose": purpose, "latency": latency,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens, "cost": cost, "currency": currency}
+
+
+def openai_usage_fields(usage) -> dict:
+    """从 OpenAI 兼容接口的 usage 对象（或 dict）中取出 prompt / completion / cached tokens。"""
+    if usage is None:
+        return {}
+    get = usage.get if isinstance(usage, dict) else lambda key, default=None: getattr(usage, key, default)
+    details = get("prompt_tokens_details")
+    if isinstance(details, dict):
+        cached = details.get("cached_tokens")
+    else:
+        cached = getattr(details, "cached_tokens", None)
+    return {"prompt_tokens": get("prompt_tokens"), "completion_tokens": get("completion_tokens"),
+            "cached_tokens": cached}
+
+
+def gemini_usage_fields(usage_metadata) -> dict:
+    """从 Gemini 响应的 usage_metadata 中取出 prompt / completion / cached tokens。"""
+    if usage_metadata is None:
+        return {}
+    return {"prompt_tokens": getattr(usage_metadata, "prompt_token_count", None),
+            "completion_tokens": getattr(usage_metadata, "candidates_token_count", None),
+            "cached_tokens": getattr(usage_metadata, "cached_content_token_count", None)}
+
+
+def record(ctx, usage: dict, sink: list = None) -> None:
+    """登记一次调用：追加到任务上下文的 usage 列表（或 sink），并写入当前追踪 span 的属性。"""
+    import tracing
+
+    target = sink if sink is not None else getattr(ctx, "usage", None)
+    if target is not None:
+        target.append(usage)
+    span = tracing.current_span()
+    for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        if usage.get(key):
+            span.add(key, usage[key])
+
+
+def cache_saving(call: dict) -> float:
+    """缓存命中节省的费用：命中的提示 tokens 按全价计算的费用与实际费用之差；无法计算时为 0。"""
+    if call.get("cost") is None or not call.get("cached_tokens"):
+        return 0.0
+    full, _ = call_cost(call["model"], call["prompt_tokens"], call["completion_tokens"])
+    return full - call["cost"] if full is not None else 0.0
+
+
+def _single_currency(costs: dict) -> tuple:
+    """{币种: 费用} 只有一种币种时返回 (费用, 币种)，否则返回 (None, "")；不同币种的费用不能相加。"""
+    if len(costs) == 1:
+        currency, amount = next(iter(costs.items()))
+        return amount, currency
+    return None, ""
+
+
+def summarize_calls(calls: list, case_count: int = 0) -> dict:
+    """汇总一组调用：tokens、耗时、输出 tokens/s、每千 tokens 的用例数、费用和前缀缓存的命中率与节省的费用。
+
+    费用按币种分别汇总在 costs / cache_saved（{币种: 费用}）中；只有一种币种时 cost / currency 为其合计。
+    """
+    prompt = sum(c["prompt_tokens"] or 0 for c in calls)
+    completion = sum(c["completion_tokens"] or 0 for c in calls)
+    cached = sum(c.get("cached_tokens") or 0 for c in calls)
+    latency = sum(c["latency"] for c in calls)
+    costs = {}
+    saved = {}
+    for c in calls:
+        if c.get("cost") is None:
+            continue
+        currency = c.get("currency", "")
+        costs[currency] = costs.get(currency, 0.0) + c["cost"]
+        if c.get("cached_tokens"):
+            saved[currency] = saved.get(currency, 0.0) + cache_saving(c)
+    cost, currency = _single_currency(costs)
+    total = prompt + completion
+    return {
+        "calls": len(calls),
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "cached_tokens": cached,
+        "cached_ratio": cached / prompt if prompt else 0.0,
+        "cache_saved": saved,
+        "total_tokens": total,
+        "latency": latency,
+        "tokens_per_sec": completion / latency if latency else 0.0,
+        "cases_per_1k_tokens": case_count * 1000 / total if total else 0.0,
+        "costs": costs,
+        "cost": cost,
+        "currency": currency,
+    }
+
+
+def format_costs(costs: dict) -> str:
+    """按币种列出费用，例如 "¥0.0048 + $0.0012"。"""
+    parts = []
+    for currency, amount in sorted(costs.items()):
+        symbol = {"CNY": "¥", "USD": "$"}.get(currency, currency + " ")
+        parts.append(f"{symbol}{amount:.4f}")
+    return " + ".join(parts)
+
+
+def format_usage(summary: dict) -> str:
+    """单行摘要，例如 "3120 tokens（提示 2800 / 输出 320），18.5 tokens/s，¥0.0048，缓存命中 2400 tokens（86%）"。"""
+    if not summary or not summary["total_tokens"]:
+        return ""
+    text = (f"{summary['total_tokens']} tokens（提示 {summary['prompt_tokens']} / 输出 {summary['completion_tokens']}），"
+            f"{summary['tokens_per_sec']:.1f} tokens/s")
+    if summary.get("costs"):
+        text += f"，{format_costs(summary['costs'])}"
+    if summary.get("cached_tokens"):
+        text += f"，缓存命中 {summary['cached_tokens']} tokens（{summary['cached_ratio'] * 100:.0f}%）"
+        saved = {currency: amount for currency, amount in (summary.get("cache_saved") or {}).items() if amount}
+        if saved:
+            text += f"，节省 {format_costs(saved)}"
+    return text
+
+
+def connect(db_path: str = DEFAULT_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def save_calls(conn: sqlite3.Connection, calls: list, api_path: str = "", case_count: int = 0,
+               batch_id: str = "", job_id: str = "") -> None:
+    """写入一个任务的全部调用；生成的用例数计在最后一次调用上，按批次 / 接口汇总时即为该任务的用例数。"""
+    now = time.time()
+    rows = []
+    for position, call in enumerate(calls):
+        rows.append((now, batch_id or "", job_id or "", api_path or "", call["provider"], call["model"],
+                     call.get("purpose", ""), call["prompt_tokens"], call["completion_tokens"],
+                     call.get("cached_tokens"), call["latency"], case_count if position == len(calls) - 1 else 0,
+                     call.get("cost"), call.get("currency", "")))
+    with conn:
+        conn.executemany(
+            "INSERT INTO llm_calls (created_at, batch_id, job_id, api_path, provider, model, purpose, prompt_tokens,"
+            " completion_tokens, cached_tokens, latency, case_count, cost, currency)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def report(conn: sqlite3.Connection, group_by: str = "api", since: float = None) -> list:
+    """按 api / model / batch / day 汇总，返回 dict 列表（按总 tokens 降序）。
+
+    费用按币种分别汇总在 costs（{币种: 费用}）中，混有豆包（CNY）和 Gemini（USD）的分组不会把两者相加。
+    """
+    column = GROUP_COLUMNS[group_by]
+    where, params = ("WHERE created_at >= ?", (since,)) if since else ("", ())
+    rows = conn.execute(
+        f"SELECT {column} AS key, COUNT(*) AS calls, SUM(prompt_tokens) AS prompt_tokens,"
+        " SUM(completion_tokens) AS completion_tokens, SUM(cached_tokens) AS cached_tokens,"
+        " SUM(latency) AS latency, SUM(CASE WHEN completion_tokens IS NOT NULL THEN latency END) AS token_latency,"
+        " SUM(case_count) AS case_count"
+        f" FROM llm_calls {where} GROUP BY key", params).fetchall()
+    costs = {}
+    cost_where = f"{where} AND cost IS NOT NULL" if where else "WHERE cost IS NOT NULL"
+    for row in conn.execute(f"SELECT {column} AS key, currency, SUM(cost) AS cost FROM llm_calls {cost_where}"
+                            " GROUP BY key, currency", params):
+        costs.setdefault(row["key"], {})[row["currency"] or ""] = row["cost"]
+    result = []
+    for row in rows:
+        cost, currency = _single_currency(costs.get(row["key"], {}))
+        prompt = row["prompt_tokens"] or 0
+        completion = row["completion_tokens"] or 0
+        total = prompt + completion
+        result.append({
+            "key": row["key"] or "-",
+            "calls": row["calls"],
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cached_tokens": row["cached_tokens"] or 0,
+            "cached_ratio": (row["cached_tokens"] or 0) / prompt if prompt else 0.0,
+            "avg_latency": row["latency"] / row["calls"],
+            "tokens_per_sec": completion / row["token_latency"] if row["token_latency"] else 0.0,
+            "case_count": row["case_count"],
+            "cases_per_1k_tokens": row["case_count"] * 1000 / total if total else 0.0,
+            "costs": costs.get(row["key"], {}),
+            "cost": cost,
+            "currency": currency,
+        })
+    result.sort(key=lambda r: -(r["prompt_tokens"] + r["completion_tokens"]))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大模型 token 用量与费用统计")
+    parser.add_argument("--db", default=DEFAULT_DB, help="用量库路径")
+    parser.add_argument("--by", choices=sorted(GROUP_COLUMNS), default="api", help="汇总维度")
+    parser.add_argument("--days", type=float, default=None, help="只统计最近几天")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 86400 if args.days else None
+    rows = report(connect(args.db), args.by, since)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    if not rows:
+        print("没有用量记录")
+        return
+    print(f"{'维度':<40}{'调用':>6}{'提示':>10}{'输出':>9}{'缓存':>9}{'命中率':>7}{'平均耗时':>9}{'tok/s':>8}{'用例':>6}{'用例/千tok':>11}  {'费用'}")
+    for row in rows:
+        cost = " + ".join(f"{amount:.4f}{currency and ' ' + currency}"
+                          for currency, amount in sorted(row["costs"].items())) or "-"
+        print(f"{row['key']:<40}{row['calls']:>6}{row['prompt_tokens']:>10}{row['completion_tokens']:>9}"
+              f"{row['cached_tokens']:>9}{row['cached_ratio'] * 100:>6.0f}%{row['avg_latency']:>8.1f}s{row['tokens_per_sec']:>8.1f}{row['case_count']:>6}"
+              f"{row['cases_per_1k_tokens']:>11.2f}  {cost}")
+
+
+if __name__ == "__main__":
+    main()
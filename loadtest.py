@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压测模式：按目标请求速率（开放模型，支持爬坡/稳定/降速三个阶段）回放已生成的用例，
+以加权方式混合各用例，使用 HDR 风格的对数-线性直方图记录延迟，
+按用例和按接口输出 p50/p90/p99/max 与吞吐量（JSON + 文本摘要）。
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import random
+import time
+
+import batch_export
+import doubao
+import executor
+import signing
+
+# 每个指数段内的线性子桶位数：7 位 => 相对误差约 1%
+SUB_BUCKET_BITS = 7
+
+
+class LatencyHistogram:
+    """
+    HDR 风格的延迟直方图（单位：微秒）。
+
+    数值按 "指数段 + 段内线性子桶" 分桶，内存占用与样本数无关，
+    相对误差约为 2^-(SUB_BUCKET_BITS-1)，可合并，适合长时间压测。
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.min_value = None
+        self.max_value = 0
+
+    @staticmethod
+    def _bucket_index(value: int) -> int:
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def _bucket_value(index: int) -> int:
+        """返回桶的代表值（桶区间中点）。"""
+        shift = index >> SUB_BUCKET_BITS
+        sub = index & ((1 << SUB_BUCKET_BITS) - 1)
+        if shift == 0:
+            return sub
+        return (sub << shift) + (1 << (shift - 1))
+
+    def record(self, value_us: int) -> None:
+        value_us = max(0, int(value_us))
+        index = self._bucket_index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max_value = max(self.max_value, value_us)
+        self.min_value = value_us if self.min_value is None else min(self.min_value, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+
+    def value_at_rank(self, rank: int) -> int:
+        """返回排序后第 rank 个样本（从 1 开始）所在桶的代表值。"""
+        if not self.total:
+            return 0
+        rank = min(max(1, rank), self.total)
+        running = 0
+        for index in sorted(self.counts):
+            running += self.counts[index]
+            if running >= rank:
+                return min(self._bucket_value(index), self.max_value)
+        return self.max_value
+
+    def value_at_percentile(self, percentile: float) -> int:
+        return self.value_at_rank(math.ceil(self.total * percentile / 100.0))
+
+    def to_dict(self) -> dict:
+        """导出统计值（毫秒）与原始分桶，便于保存和比较。"""
+        return {
+            "count": self.total,
+            "min_ms": round((self.min_value or 0) / 1000.0, 3),
+            "p50_ms": round(self.value_at_percentile(50) / 1000.0, 3),
+            "p90_ms": round(self.value_at_percentile(90) / 1000.0, 3),
+            "p99_ms": round(self.value_at_percentile(99) / 1000.0, 3),
+            "max_ms": round(self.max_value / 1000.0, 3),
+            "buckets": {str(k): v for k, v in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        hist = cls()
+        for key, count in (data.get("buckets") or {}).items():
+            hist.counts[int(key)] = count
+            hist.total += count
+        hist.max_value = int(round(data.get("max_ms", 0) * 1000))
+        hist.min_value = int(round(data.get("min_ms", 0) * 1000)) if hist.total else None
+        return hist
+
+
+class LoadProfile:
+    """开放模型下的目标速率曲线：ramp_up 秒线性爬升到 rps，保持 steady 秒，再用 ramp_down 秒降到 0。"""
+
+    def __init__(self, rps: float, ramp_up: float = 0, steady: float = 60, ramp_down: float = 0):
+        self.rps = rps
+        self.ramp_up = ramp_up
+        self.steady = steady
+        self.ramp_down = ramp_down
+
+    @property
+    def duration(self) -> float:
+        return self.ramp_up + self.steady + self.ramp_down
+
+    def rate_at(self, t: float) -> float:
+        if t < self.ramp_up:
+            return self.rps * t / self.ramp_up
+        t -= self.ramp_up
+        if t < self.steady:
+            return self.rps
+        t -= self.steady
+        if t < self.ramp_down:
+            return self.rps * (1 - t / self.ramp_down)
+        return 0.0
+
+    def arrivals(self, poisson: bool = True, rng: random.Random = None):
+        """生成到达时刻（相对开始的秒数）。泊松模式使用 thinning 法处理变化的速率。"""
+        rng = rng or random.Random()
+        if self.rps <= 0:
+            return
+        t = 0.0
+        while True:
+            if poisson:
+                t += rng.expovariate(self.rps)
+                if t >= self.duration:
+                    return
+                if rng.random() * self.rps > self.rate_at(t):
+                    continue
+            else:
+                # 均匀模式：按当前速率确定下一次间隔，速率过低时以 1/10 目标速率推进
+                t += 1.0 / max(self.rate_at(t), self.rps / 10.0)
+                if t >= self.duration:
+                    return
+            yield t
+
+
+class StatsRecorder:
+    """按用例和按接口累计延迟直方图与错误数。"""
+
+    def __init__(self):
+        self.per_case = {}
+        self.per_api = {}
+        self.overall = {"hist": LatencyHistogram(), "errors": 0}
+
+    def _entry(self, table: dict, key):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {"hist": LatencyHistogram(), "errors": 0}
+        return entry
+
+    def record(self, api_path: str, case_name: str, latency_us: int, ok: bool) -> None:
+        for entry in (self._entry(self.per_case, (api_path, case_name)),
+                      self._entry(self.per_api, api_path), self.overall):
+            entry["hist"].record(latency_us)
+            if not ok:
+                entry["errors"] += 1
+
+    @staticmethod
+    def _summary(entry: dict, elapsed: float) -> dict:
+        data = entry["hist"].to_dict()
+        data["errors"] = entry["errors"]
+        data["error_rate"] = round(entry["errors"] / data["count"], 4) if data["count"] else 0.0
+        data["throughput_rps"] = round(data["count"] / elapsed, 3) if elapsed > 0 else 0.0
+        return data
+
+    def report(self, elapsed: float, profile: LoadProfile, dropped: int) -> dict:
+        return {
+            "profile": {"rps": profile.rps, "ramp_up": profile.ramp_up, "steady": profile.steady,
+                        "ramp_down": profile.ramp_down},
+            "elapsed_s": round(elapsed, 3),
+            "dropped": dropped,
+            "overall": self._summary(self.overall, elapsed),
+            "per_api": {api: self._summary(e, elapsed) for api, e in sorted(self.per_api.items())},
+            "per_case": [dict(api_path=api, case_name=name, **self._summary(e, elapsed))
+                         for (api, name), e in sorted(self.per_case.items())],
+        }
+
+
+def format_report(report: dict) -> str:
+    """将压测报告渲染为文本摘要。"""
+    def row(label, s):
+        return (f"{label:<60} {s['count']:>7} {s['throughput_rps']:>9.2f} {s['p50_ms']:>9.2f} "
+                f"{s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f} {s['error_rate'] * 100:>6.2f}%")
+
+    header = f"{'名称':<60} {'请求数':>7} {'RPS':>9} {'p50(ms)':>9} {'p90(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9} {'错误率':>7}"
+    lines = [f"压测耗时 {report['elapsed_s']}s，目标 {report['profile']['rps']} rps，"
+             f"因并发上限丢弃 {report['dropped']} 个请求", "", "== 按接口 ==", header]
+    for api, s in report["per_api"].items():
+        lines.append(row(api, s))
+    lines += ["", "== 按用例 ==", header]
+    for s in report["per_case"]:
+        lines.append(row(f"{s['api_path']} :: {s['case_name']}", s))
+    lines += ["", row("总计", report["overall"])]
+    return "\n".join(lines)
+
+
+def build_mix(jobs: list, weights: dict = None) -> list:
+    """将各接口的用例展开为 [(weight, api_path, api_doc, case)]；weights 可按用例名或接口路径指定权重。"""
+    weights = weights or {}
+    mix = []
+    for job in jobs:
+        api_path = job["api_path"]
+        for case in job.get("test_cases") or []:
+            weight = weights.get(case.get("case_name"), weights.get(api_path, 1.0))
+            if weight > 0:
+                mix.append((weight, api_path, job.get("api_doc") or {}, case))
+    return mix
+
+
+async def run_load_async(jobs: list, variables: dict, profile: LoadProfile, base_url: str = None,
+                         app_key: str = None, secret: str = None, weights: dict = None,
+                         max_in_flight: int = 200, timeout: float = executor.DEFAULT_TIMEOUT,
+                         poisson: bool = True, seed: int = None) -> dict:
+    """按负载曲线回放用例，返回压测报告。延迟从计划发送时刻计算，避免协调遗漏（coordinated omission）。"""
+    base_url = (base_url or executor.OPEN_API_BASE_URL).rstrip("/")
+    if not base_url:
+        raise ValueError("未配置开放平台地址，请设置 OPEN_API_BASE_URL 或传入 base_url")
+    mix = build_mix(jobs, weights)
+    if not mix:
+        raise ValueError("没有可回放的用例")
+
+    cumulative = []
+    total = 0.0
+    for weight, *_ in mix:
+        total += weight
+        cumulative.append(total)
+
+    rng = random.Random(seed)
+    pool = executor.AsyncHttpPool(max_idle_per_host=max_in_flight, timeout=timeout)
+    stats = StatsRecorder()
+    in_flight = set()
+    dropped = 0
+    headers = {"Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"}
+
+    async def fire(scheduled: float, api_path: str, api_doc: dict, case: dict):
+        resolved = signing.resolve_case_request(api_doc, case, variables, app_key, secret)
+        ok = False
+        try:
+            response = await pool.request("POST", f"{base_url}{api_path}", resolved["body"].encode("utf-8"), headers)
+            ok = 200 <= response.status < 400
+        except Exception:
+            ok = False
+        latency_us = (time.perf_counter() - scheduled) * 1_000_000
+        stats.record(api_path, resolved["case_name"], latency_us, ok)
+
+    started = time.perf_counter()
+    try:
+        for offset in profile.arrivals(poisson, rng):
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                dropped += 1
+                continue
+            _, api_path, api_doc, case = mix[bisect.bisect_left(cumulative, rng.random() * total)]
+            task = asyncio.ensure_future(fire(scheduled, api_path, api_doc, case))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        await pool.close()
+
+    return stats.report(time.perf_counter() - started, profile, dropped)
+
+
+def run_load(jobs: list, variables: dict, profile: LoadProfile, **kwargs) -> dict:
+    """run_load_async 的同步封装。"""
+    return asyncio.run(run_load_async(jobs, variables, profile, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按目标速率回放已生成的用例并统计延迟分布")
+    parser.add_argument("input", help="用例输入：JSONL 文件或目录（格式同 batch_export.py 的输入）")
+    parser.add_argument("--base-url", default=executor.OPEN_API_BASE_URL, help="开放平台地址，默认读取 OPEN_API_BASE_URL")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--app-key", default=None, help="appKey，默认读取变量库中的 appKey")
+    parser.add_argument("--secret", default=None, help="secret，默认读取变量库中的 secret")
+    parser.add_argument("--rps", type=float, required=True, help="稳定阶段的目标请求速率")
+    parser.add_argument("--ramp-up", type=float, default=0, help="爬坡时长（秒）")
+    parser.add_argument("--steady", type=float, default=60, help="稳定阶段时长（秒）")
+    parser.add_argument("--ramp-down", type=float, default=0, help="降速时长（秒）")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson", help="到达过程")
+    parser.add_argument("--weights", default=None, help="权重 JSON 文件：{用例名或接口路径: 权重}")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="最大在途请求数，超出时丢弃并计数")
+    parser.add_argument("--timeout", type=float, default=executor.DEFAULT_TIMEOUT, help="单个请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    parser.add_argument("--output", default="loadtest_report.json", help="JSON 报告输出路径")
+    parser.add_argument("--record", default=None, help="将本次结果写入性能基线库（SQLite 路径）")
+    parser.add_argument("--env", default=os.environ.get("AUTOAPI_ENV", "default"), help="写入基线库时的环境名称")
+    args = parser.parse_args()
+
+    jobs = list(batch_export.iter_jobs_from_path(args.input))
+    variables = signing.variables_from_test_data(doubao.load_test_data(args.test_data))
+    weights = None
+    if args.weights:
+        with open(args.weights, "r", encoding="utf-8") as f:
+            weights = json.load(f)
+
+    profile = LoadProfile(args.rps, args.ramp_up, args.steady, args.ramp_down)
+    print(f">>> 开始压测：目标 {profile.rps} rps，总时长 {profile.duration}s")
+    report = run_load(jobs, variables, profile, base_url=args.base_url, app_key=args.app_key,
+                      secret=args.secret, weights=weights, max_in_flight=args.max_in_flight,
+                      timeout=args.timeout, poisson=args.arrival == "poisson", seed=args.seed)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(format_report(report))
+    print(f"\nJSON 报告已写入: {args.output}")
+
+    if args.record:
+        import perf_store
+        conn = perf_store.connect(args.record)
+        run_id = perf_store.record_run(conn, perf_store.entries_from_loadtest_report(report), args.env, "loadtest")
+        print(f"已写入性能基线库: {run_id}")
+
+
+if __name__ == "__main__":
+    main()
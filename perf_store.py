@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基线库：将执行器 / 压测的延迟与错误率结果按运行（run）、git 版本和环境存入本地 SQLite，
+并与滚动基线比较，找出统计上显著的 p90/p99 退化，可作为每晚的接口性能回归门禁。
+
+显著性判断：
+- 分位数：按直方图计算候选运行与基线（记录了同一接口 / 用例的最近 N 次运行合并）的分位数置信区间（基于顺序统计量的
+  二项近似），要求候选区间下界高于基线区间上界，且相对增幅超过阈值；基线运行数足够时，
+  还要求候选值高于历次运行分位数的 均值 + z·标准差；
+- 错误率：双比例 z 检验。
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+from loadtest import LatencyHistogram
+
+DEFAULT_DB = "perf_baseline.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    git_rev TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    source TEXT NOT NULL,
+    notes TEXT DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_runs_env_time ON runs(environment, created_at);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    scope TEXT NOT NULL,
+    api_path TEXT NOT NULL,
+    case_name TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    p50_ms REAL, p90_ms REAL, p99_ms REAL, max_ms REAL,
+    buckets TEXT NOT NULL,
+    PRIMARY KEY (run_id, scope, api_path, case_name)
+);
+CREATE INDEX IF NOT EXISTS idx_results_key ON results(scope, api_path, case_name);
+"""
+
+
+def connect(db_path: str = DEFAULT_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def current_git_rev() -> str:
+    """返回当前仓库的 git 版本，获取失败时返回 unknown。"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def record_run(conn: sqlite3.Connection, entries: list, environment: str, source: str,
+               git_rev: str = None, run_id: str = None, notes: str = "") -> str:
+    """
+    写入一次运行。entries 为 [{"scope": "api"|"case", "api_path", "case_name", "errors", "hist": LatencyHistogram}]。
+    返回 run_id。
+    """
+    run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    with conn:
+        conn.execute("INSERT INTO runs(run_id, created_at, git_rev, environment, source, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                     (run_id, time.time(), git_rev or current_git_rev(), environment, source, notes))
+        for entry in entries:
+            data = entry["hist"].to_dict()
+            conn.execute(
+                "INSERT INTO results(run_id, scope, api_path, case_name, count, errors, p50_ms, p90_ms, p99_ms, max_ms, buckets) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, entry["scope"], entry["api_path"], entry.get("case_name", ""), data["count"], entry["errors"],
+                 data["p50_ms"], data["p90_ms"], data["p99_ms"], data["max_ms"], json.dumps(data["buckets"])))
+    return run_id
+
+
+def entries_from_loadtest_report(report: dict) -> list:
+    """将 loadtest.py 的 JSON 报告转换为入库条目。"""
+    entries = []
+    for api_path, summary in report.get("per_api", {}).items():
+        entries.append({"scope": "api", "api_path": api_path, "case_name": "", "errors": summary.get("errors", 0),
+                        "hist": LatencyHistogram.from_dict(summary)})
+    for summary in report.get("per_case", []):
+        entries.append({"scope": "case", "api_path": summary["api_path"], "case_name": summary["case_name"],
+                        "errors": summary.get("errors", 0), "hist": LatencyHistogram.from_dict(summary)})
+    return entries
+
+
+def entries_from_executor_results(api_path: str, results: list) -> list:
+    """将 executor.py 的逐用例结果转换为入库条目（按用例 + 按接口）。"""
+    api_entry = {"scope": "api", "api_path": api_path, "case_name": "", "errors": 0, "hist": LatencyHistogram()}
+    cases = {}
+    for r in results:
+        if r.get("latency_ms") is None:
+            continue
+        name = r.get("case_name", "")
+        entry = cases.get(name)
+        if entry is None:
+            entry = cases[name] = {"scope": "case", "api_path": api_path, "case_name": name, "errors": 0,
+                                   "hist": LatencyHistogram()}
+        for target in (entry, api_entry):
+            target["hist"].record(r["latency_ms"] * 1000)
+            if not r.get("ok"):
+                target["errors"] += 1
+    return [api_entry] + list(cases.values())
+
+
+def _load_hist(row) -> LatencyHistogram:
+    return LatencyHistogram.from_dict({"buckets": json.loads(row["buckets"]), "max_ms": row["max_ms"]})
+
+
+def quantile_ci(hist: LatencyHistogram, q: float, z: float) -> tuple:
+    """基于顺序统计量的分位数置信区间：秩 n·q ± z·sqrt(n·q·(1-q))。"""
+    n = hist.total
+    center = n * q
+    spread = z * math.sqrt(n * q * (1 - q))
+    return hist.value_at_rank(math.floor(center - spread)), hist.value_at_rank(math.ceil(center + spread))
+
+
+def _two_proportion_z(errors_a: int, n_a: int, errors_b: int, n_b: int) -> float:
+    """返回候选(b)错误率高于基线(a)的 z 值。"""
+    if not n_a or not n_b:
+        return 0.0
+    pooled = (errors_a + errors_b) / (n_a + n_b)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n_a + 1 / n_b))
+    if se == 0:
+        return 0.0
+    return (errors_b / n_b - errors_a / n_a) / se
+
+
+def compare_run(conn: sqlite3.Connection, run_id: str = None, window: int = 10, min_delta: float = 0.10,
+                z: float = 1.96, min_samples: int = 20, scope: str = None) -> dict:
+    """
+    将一次运行的每一项（范围 + 接口 + 用例）与滚动基线比较：基线为同环境、同来源（executor / loadtest）、
+    在此之前且记录了同一项的最近 window 次运行。executor 每个接口单独记录一次运行，
+    因此基线按项选取，而不是取最近 window 次运行（那样会被其它接口的运行占满）。
+
+    返回 {"run": {...}, "baseline_runs": [用到的基线运行], "regressions": [...], "checked": N}。
+    """
+    if run_id is None:
+        row = conn.execute("SELECT * FROM runs ORDER BY created_at DESC LIMIT 1").fetchone()
+    else:
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if row is None:
+        raise ValueError("找不到要比较的运行记录")
+    run = dict(row)
+
+    regressions = []
+    checked = 0
+    baseline_ids = {}
+    query = "SELECT * FROM results WHERE run_id = ?" + (" AND scope = ?" if scope else "")
+    candidates = conn.execute(query, (run["run_id"], scope) if scope else (run["run_id"],)).fetchall()
+    for cand in candidates:
+        if cand["count"] < min_samples:
+            continue
+        base_rows = conn.execute(
+            "SELECT results.*, runs.created_at FROM results JOIN runs ON runs.run_id = results.run_id "
+            "WHERE results.scope = ? AND results.api_path = ? AND results.case_name = ? "
+            "AND runs.environment = ? AND runs.source = ? AND runs.created_at < ? "
+            "ORDER BY runs.created_at DESC LIMIT ?",
+            (cand["scope"], cand["api_path"], cand["case_name"], run["environment"], run["source"],
+             run["created_at"], window)).fetchall()
+        if not base_rows:
+            continue
+        for r in base_rows:
+            baseline_ids[r["run_id"]] = r["created_at"]
+        checked += 1
+
+        cand_hist = _load_hist(cand)
+        base_hist = LatencyHistogram()
+        base_errors = 0
+        for r in base_rows:
+            base_hist.merge(_load_hist(r))
+            base_errors += r["errors"]
+
+        key = {"scope": cand["scope"], "api_path": cand["api_path"], "case_name": cand["case_name"]}
+        for label, q in (("p90", 0.90), ("p99", 0.99)):
+            cand_value = cand_hist.value_at_percentile(q * 100)
+            base_value = base_hist.value_at_percentile(q * 100)
+            if base_value <= 0:
+                continue
+            cand_lo, _ = quantile_ci(cand_hist, q, z)
+            _, base_hi = quantile_ci(base_hist, q, z)
+            rel = (cand_value - base_value) / base_value
+            if cand_lo <= base_hi or rel < min_delta:
+                continue
+            run_values = [r[f"{label}_ms"] for r in base_rows if r[f"{label}_ms"] is not None]
+            if len(run_values) >= 3:
+                mean = statistics.mean(run_values)
+                stdev = statistics.stdev(run_values)
+                if cand_value / 1000.0 <= mean + z * stdev:
+                    continue
+            regressions.append(dict(key, metric=label, baseline_ms=round(base_value / 1000.0, 3),
+                                    current_ms=round(cand_value / 1000.0, 3), change=round(rel, 4),
+                                    baseline_runs=len(base_rows)))
+
+        z_err = _two_proportion_z(base_errors, base_hist.total, cand["errors"], cand["count"])
+        if z_err > z:
+            regressions.append(dict(key, metric="error_rate",
+                                    baseline_ms=None, current_ms=None,
+                                    baseline_rate=round(base_errors / base_hist.total, 4),
+                                    current_rate=round(cand["errors"] / cand["count"], 4),
+                                    change=round(z_err, 2), baseline_runs=len(base_rows)))
+
+    baseline_runs = sorted(baseline_ids, key=baseline_ids.get, reverse=True)
+    return {"run": run, "baseline_runs": baseline_runs, "regressions": regressions, "checked": checked}
+
+
+def format_comparison(result: dict) -> str:
+    run = result["run"]
+    lines = [f"运行 {run['run_id']}（{run['environment']} @ {run['git_rev']}）对比 {len(result['baseline_runs'])} 次基线运行，"
+             f"检查 {result['checked']} 项"]
+    if not result["regressions"]:
+        lines.append("✅ 未发现显著的性能退化")
+        return "\n".join(lines)
+    for r in result["regressions"]:
+        name = r["api_path"] + (f" :: {r['case_name']}" if r["case_name"] else "")
+        if r["metric"] == "error_rate":
+            lines.append(f"❌ {name} 错误率 {r['baseline_rate'] * 100:.2f}% → {r['current_rate'] * 100:.2f}% (z={r['change']})")
+        else:
+            lines.append(f"❌ {name} {r['metric']} {r['baseline_ms']}ms → {r['current_ms']}ms (+{r['change'] * 100:.1f}%)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口性能基线库与回归检测")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite 数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="导入一次运行结果")
+    p_ingest.add_argument("report", help="loadtest.py 的 JSON 报告，或 executor.py --output 的结果文件")
+    p_ingest.add_argument("--api-path", default=None, help="导入执行器结果时必须指定接口路径")
+    p_ingest.add_argument("--env", default=os.environ.get("AUTOAPI_ENV", "default"), help="环境名称")
+    p_ingest.add_argument("--run-id", default=None)
+    p_ingest.add_argument("--git-rev", default=None, help="默认读取当前 git 版本")
+
+    p_compare = sub.add_parser("compare", help="与滚动基线比较，发现退化时以退出码 1 结束")
+    p_compare.add_argument("--run-id", default=None, help="默认比较最新一次运行")
+    p_compare.add_argument("--window", type=int, default=10, help="每项基线包含的最近运行次数")
+    p_compare.add_argument("--min-delta", type=float, default=0.10, help="最小相对增幅")
+    p_compare.add_argument("--z", type=float, default=1.96, help="显著性 z 值")
+    p_compare.add_argument("--min-samples", type=int, default=20, help="样本数不足时跳过")
+    p_compare.add_argument("--scope", choices=["api", "case"], default=None)
+    p_compare.add_argument("--json", action="store_true", help="以 JSON 输出比较结果")
+
+    sub.add_parser("list", help="列出已记录的运行")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "ingest":
+        with open(args.report, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            if not args.api_path:
+                parser.error("导入执行器结果时必须指定 --api-path")
+            entries, source = entries_from_executor_results(args.api_path, data), "executor"
+        else:
+            entries, source = entries_from_loadtest_report(data), "loadtest"
+        run_id = record_run(conn, entries, args.env, source, args.git_rev, args.run_id)
+        print(f"已记录运行 {run_id}（{len(entries)} 项）")
+    elif args.command == "compare":
+        result = compare_run(conn, args.run_id, args.window, args.min_delta, args.z, args.min_samples, args.scope)
+        print(json.dumps(result, ensure_ascii=False, indent=2) if args.json else format_comparison(result))
+        sys.exit(1 if result["regressions"] else 0)
+    elif args.command == "list":
+        for row in conn.execute("SELECT * FROM runs ORDER BY created_at DESC"):
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created_at"]))
+            print(f"{row['run_id']}  {created}  {row['environment']:<12} {row['git_rev']:<10} {row['source']}")
+
+
+if __name__ == "__main__":
+    main()
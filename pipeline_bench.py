@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成流程的离线性能基准：不访问豆包 API 和文档服务器，性能改动可在提交之间对比。
+
+- 合成数据：参数个数可变（含引用复杂对象模型的参数，模型字段再嵌套子模型）的 API 文档，
+  以及任意条数的测试环境变量库；
+- 函数级吞吐：load_test_data（冷 / 热）、构建提示词、从模型输出中提取 JSON、generate_scripts_for_case、parse_script_block；
+- 端到端：在本地桩服务（stub_server.py，模拟文档服务器和 OpenAI 兼容的 chat/completions，
+  可配置首字延迟、每秒输出 tokens 和预填充速率）上运行 run_generation_job，并按阶段记录耗时（tracing.py）；
+  --cache-modes 比较提示词前缀缓存的几种模式（none 无缓存 / prefix 服务端隐式前缀缓存 / context 上下文缓存，
+  见 prompt_cache.py），报告命中的提示 tokens 和模型调用耗时相对 none 的节省；
+- 结果为 JSON，可用 --output 保存、--baseline 与之前的结果比较（吞吐下降超过阈值时退出码为 1）。
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import doubao
+import prompt_cache
+import stub_server
+import tracing
+import var_library
+from job_context import JobContext
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARG_COUNTS = (1, 20, 100, 500)
+DEFAULT_LIBRARY_SIZES = (100, 10000, 100000)
+CASES_PER_DOC = 8
+BENCH_API_KEY = "bench-key"
+BENCH_MODEL = "bench-model"
+CACHE_MODES = ("none", "prefix", "context")
+
+
+def synthetic_api_doc(arg_count: int, base_url: str = "http://127.0.0.1", model_every: int = 10,
+                      seed: int = 0) -> tuple:
+    """构造一个含 arg_count 个参数的 API 文档，每 model_every 个参数中有一个引用复杂对象模型。
+
+    返回 (api_path, api_doc, models)，models 为 {模型名: 模型文档}，模型字段中再嵌套一层子模型引用。
+    """
+    rng = random.Random(seed * 1000003 + arg_count)
+    api_path = f"/bench/api_{arg_count}"
+    args = []
+    models = {}
+    for index in range(arg_count):
+        name = "page" if index == 0 and arg_count > 2 else "limit" if index == 1 and arg_count > 2 else f"arg_{index}"
+        arg = {"name": name, "required": index % 4 == 0,
+               "description": f"合成参数 {index}：{'商品编码' if index % 2 else '店铺名称'}，长度不超过 {rng.randint(16, 128)}"}
+        if model_every and index % model_every == model_every - 1:
+            model_name = f"Model{arg_count}_{index}"
+            child_name = f"{model_name}_Item"
+            arg["type"] = {"name": model_name, "url": f"{base_url}{stub_server.MODEL_PREFIX}{model_name}"}
+            models[model_name] = {
+                "name": model_name,
+                "fields": [{"name": f"field_{i}", "type": "string", "description": f"字段 {i}"} for i in range(8)]
+                + [{"name": "items", "type": {"name": child_name,
+                                              "url": f"{base_url}{stub_server.MODEL_PREFIX}{child_name}"},
+                    "description": "嵌套对象"}],
+            }
+            models[child_name] = {"name": child_name,
+                                  "fields": [{"name": f"sub_{i}", "type": "number"} for i in range(4)]}
+        else:
+            arg["type"] = rng.choice(["string", "number", "boolean", "date"])
+        args.append(arg)
+    api_doc = {"path": api_path, "name": f"合成接口 {arg_count} 参数", "request": {"args": args},
+               "response": {"fields": [{"name": "code", "type": "number"}, {"name": "msg", "type": "string"}]}}
+    return api_path, api_doc, models
+
+
+def synthetic_library(size: int, seed: int = 0) -> list:
+    """构造 size 条变量（var_0 ... var_{size-1}），值与描述长度随机。"""
+    rng = random.Random(seed * 1000003 + size)
+    return [{"name": f"var_{i}", "value": f"value_{i}_{rng.randint(0, 10 ** 6)}" if i % 5 else rng.randint(0, 10 ** 6),
+             "description": f"open测试变量 {i}，{'商品' if i % 2 else '店铺'}相关"}
+            for i in range(size)]
+
+
+def write_library(entries: list, directory: str) -> str:
+    path = os.path.join(directory, f"library_{len(entries)}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def measure(func, min_time: float = 0.2, max_runs: int = 10000, min_runs: int = 3) -> dict:
+    """重复调用 func 直到累计 min_time 秒（至少 min_runs 次），返回每次耗时的统计与每秒次数。"""
+    samples = []
+    total = 0.0
+    while len(samples) < max_runs and (total < min_time or len(samples) < min_runs):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        total += elapsed
+    mean = total / len(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(mean * 1000, 4),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "min_ms": round(min(samples) * 1000, 4),
+        "ops_per_sec": round(1 / mean, 2) if mean else None,
+    }
+
+
+def _quiet(func):
+    """调用期间屏蔽被测函数的 print 输出。"""
+    def wrapper():
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w", encoding="utf-8")
+        try:
+            return func()
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+    return wrapper
+
+
+def bench_functions(arg_counts, library_sizes, workdir: str, min_time: float) -> dict:
+    """函数级基准，返回 {"<函数>[<规模>]": 统计}。"""
+    results = {}
+    library_paths = {size: write_library(synthetic_library(size), workdir) for size in library_sizes}
+    for size, path in library_paths.items():
+        def cold(path=path):
+            var_library.clear_cache()
+            doubao.load_test_data(path)
+        results[f"load_test_data.cold[{size}]"] = measure(_quiet(cold), min_time)
+        results[f"load_test_data.warm[{size}]"] = measure(_quiet(lambda path=path: doubao.load_test_data(path)), min_time)
+
+    smallest = min(library_sizes)
+    test_data_json = var_library.load_library(library_paths[smallest]).prompt_json
+    for arg_count in arg_counts:
+        _, api_doc, models = synthetic_api_doc(arg_count)
+        related = {arg["name"]: models[arg["type"]["name"]] for arg in api_doc["request"]["args"]
+                   if isinstance(arg["type"], dict)}
+        prompt = doubao.build_design_prompt(api_doc, test_data_json, related)
+        reply = stub_server.default_llm_reply(prompt, CASES_PER_DOC)
+        raw_text = f"好的，以下是设计的测试用例：\n```json\n{reply}\n```\n以上用例覆盖了正向与负向场景。"
+        cases = doubao.extract_json_array(raw_text)
+        blocks = [doubao.generate_scripts_for_case(api_doc, case) for case in cases]
+
+        results[f"build_design_prompt[{arg_count} args/{smallest} vars]"] = measure(
+            lambda: doubao.build_design_prompt(api_doc, test_data_json, related), min_time)
+        results[f"extract_json_array[{arg_count} args]"] = measure(lambda: doubao.extract_json_array(raw_text), min_time)
+        results[f"generate_scripts_for_case[{arg_count} args]"] = measure(
+            lambda: [doubao.generate_scripts_for_case(api_doc, case) for case in cases], min_time)
+        results[f"parse_script_block[{arg_count} args]"] = measure(
+            lambda: [doubao.parse_script_block(block) for block in blocks], min_time)
+    return results
+
+
+def bench_end_to_end(arg_counts, library_size: int, workdir: str, llm_latency_ms: float, token_rate: float,
+                     repeat: int, cache_mode: str = "none", prefill_rate: float = 0) -> dict:
+    """在本地桩服务上运行完整的 run_generation_job，返回 {"run_generation_job[<规模>]": 统计 + 各阶段耗时 + 模型用量}。
+
+    cache_mode 为 none 以外的值时结果名后加 " cache=<模式>"：prefix 开启桩服务的隐式前缀缓存，
+    context 使用上下文缓存（prompt_cache.py）。llm_ms / prompt_tokens / cached_tokens 为每次生成调用的平均值，
+    创建上下文的一次性开销单独记为 context_create（同一模式下只在第一个规模创建）。
+    """
+    if doubao._get_openai_client_class() is None:
+        return {"run_generation_job": {"skipped": "未安装 openai"}}
+    server, base_url = stub_server.start_stub_server(llm_latency_ms=llm_latency_ms, token_rate=token_rate,
+                                                     prefix_cache=cache_mode == "prefix", prefill_rate=prefill_rate)
+    prompt_cache.clear()
+    suffix = "" if cache_mode == "none" else f" cache={cache_mode}"
+    results = {}
+    try:
+        library_path = write_library(synthetic_library(library_size), workdir)
+        var_library.clear_cache()
+        test_data_json = _quiet(lambda: doubao.load_test_data(library_path))()
+        for arg_count in arg_counts:
+            api_path, api_doc, models = synthetic_api_doc(arg_count, base_url)
+            server.docs[api_path] = api_doc
+            server.models.update(models)
+            tracer = tracing.Tracer()
+            samples = []
+            calls = []
+            cases = 0
+            for _ in range(repeat):
+                # 每次使用新的上下文（不共享文档与模型缓存），与 GUI 中单个任务的冷路径一致
+                ctx = JobContext(api_key=BENCH_API_KEY, model=BENCH_MODEL, llm_base_url=base_url,
+                                 doc_base_url=base_url + stub_server.DOC_PREFIX, tracer=tracer,
+                                 context_cache="context" if cache_mode == "context" else "off")
+                started = time.perf_counter()
+                result = _quiet(lambda: doubao.run_generation_job(api_path, test_data_json, ctx))()
+                samples.append(time.perf_counter() - started)
+                if result["error"]:
+                    raise RuntimeError(f"{api_path}: {result['error']}")
+                cases = len(result["test_cases"])
+                calls.extend(ctx.usage)
+            creates = [c for c in calls if c.get("purpose") == "context"]
+            calls = [c for c in calls if c.get("purpose") != "context"]
+            stages = {name: round(item["total"] / repeat * 1000, 3) for name, item in tracer.summary().items()}
+            mean = sum(samples) / len(samples)
+            results[f"run_generation_job[{arg_count} args/{library_size} vars]{suffix}"] = {
+                "runs": len(samples),
+                "mean_ms": round(mean * 1000, 3),
+                "median_ms": round(statistics.median(samples) * 1000, 3),
+                "min_ms": round(min(samples) * 1000, 3),
+                "ops_per_sec": round(1 / mean, 3),
+                "cases": cases,
+                "stages_ms": stages,
+                "llm_ms": round(sum(c["latency"] for c in calls) / repeat * 1000, 3),
+                "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in calls) // repeat,
+                "cached_tokens": sum(c.get("cached_tokens") or 0 for c in calls) // repeat,
+            }
+            if creates:
+                results[f"run_generation_job[{arg_count} args/{library_size} vars]{suffix}"]["context_create"] = {
+                    "calls": len(creates),
+                    "ms": round(sum(c["latency"] for c in creates) * 1000, 3),
+                    "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in creates),
+                }
+    finally:
+        server.shutdown()
+    return results
+
+
+def cache_savings(results: dict, prefill_rate: float = 0) -> list:
+    """各缓存模式相对 none 的每次调用节省：命中的提示 tokens 比例、提示 tokens 与模型调用耗时的变化；
+    创建上下文的一次性开销单独列出，不计入每次调用。
+    桩服务只在设置 prefill_rate 时按未命中的 tokens 增加延迟，否则各模式耗时只差在请求开销上，不比较耗时。"""
+    lines = []
+    for name, data in results.items():
+        if " cache=" not in name or "llm_ms" not in data:
+            continue
+        baseline = results.get(name.split(" cache=")[0])
+        if not baseline or "llm_ms" not in baseline:
+            continue
+        hit = data["cached_tokens"] / data["prompt_tokens"] * 100 if data["prompt_tokens"] else 0.0
+        line = (f"{name}: 每次调用命中 {data['cached_tokens']}/{data['prompt_tokens']} 提示 tokens（{hit:.0f}%），"
+                f"未命中 {baseline['prompt_tokens'] - baseline['cached_tokens']} → "
+                f"{data['prompt_tokens'] - data['cached_tokens']}")
+        if prefill_rate:
+            saved = baseline["llm_ms"] - data["llm_ms"]
+            ratio = saved / baseline["llm_ms"] * 100 if baseline["llm_ms"] else 0.0
+            line += f"，模型调用 {baseline['llm_ms']:.1f}ms → {data['llm_ms']:.1f}ms（节省 {saved:.1f}ms，{ratio:.0f}%）"
+        else:
+            line += "，耗时未比较（未设置 --prefill-rate）"
+        create = data.get("context_create")
+        if create:
+            line += f"；一次性创建上下文 {create['calls']} 次，{create['prompt_tokens']} tokens，{create['ms']:.1f}ms"
+        lines.append(line)
+    return lines
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare_with_baseline(results: dict, baseline: dict, max_regression: float) -> list:
+    """按 ops_per_sec 比较同名基准，返回吞吐下降超过阈值的列表。"""
+    regressions = []
+    previous_results = baseline.get("results", {})
+    for name, data in results.items():
+        current = data.get("ops_per_sec")
+        previous = (previous_results.get(name) or {}).get("ops_per_sec")
+        if not current or not previous:
+            continue
+        change = (previous - current) / previous
+        if change > max_regression:
+            regressions.append(f"{name}: {previous}/s → {current}/s (-{change * 100:.1f}%)")
+    return regressions
+
+
+def _parse_sizes(text: str) -> tuple:
+    return tuple(int(part) for part in text.split(",") if part.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成流程离线性能基准（合成文档 / 变量库 + 本地桩服务）")
+    parser.add_argument("--args", default=",".join(map(str, DEFAULT_ARG_COUNTS)), help="API 文档参数个数，逗号分隔")
+    parser.add_argument("--library", default=",".join(map(str, DEFAULT_LIBRARY_SIZES)), help="变量库条数，逗号分隔")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每个函数级基准的最短累计时间（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="端到端基准的重复次数")
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="桩模型接口的首字延迟（毫秒）")
+    parser.add_argument("--token-rate", type=float, default=0, help="桩模型接口每秒输出 tokens，0 表示不限速")
+    parser.add_argument("--prefill-rate", type=float, default=0,
+                        help="桩模型接口每秒预填充的提示 tokens，未命中缓存的部分增加首字延迟；0 表示不计")
+    parser.add_argument("--cache-modes", default="none",
+                        help=f"端到端基准比较的提示词前缀缓存模式，逗号分隔：{','.join(CACHE_MODES)}")
+    parser.add_argument("--skip-e2e", action="store_true", help="只运行函数级基准")
+    parser.add_argument("--output", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的最大吞吐相对下降")
+    args = parser.parse_args()
+
+    arg_counts = _parse_sizes(args.args)
+    library_sizes = _parse_sizes(args.library)
+    cache_modes = tuple(mode.strip() for mode in args.cache_modes.split(",") if mode.strip())
+    unknown = [mode for mode in cache_modes if mode not in CACHE_MODES]
+    if unknown:
+        parser.error(f"未知的缓存模式: {','.join(unknown)}")
+    report = {
+        "meta": {"commit": _git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "arg_counts": arg_counts,
+                 "library_sizes": library_sizes, "llm_latency_ms": args.llm_latency_ms, "token_rate": args.token_rate,
+                 "prefill_rate": args.prefill_rate, "cache_modes": cache_modes},
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="autoapi-bench-") as workdir:
+        report["results"].update(bench_functions(arg_counts, library_sizes, workdir, args.min_time))
+        if not args.skip_e2e:
+            for mode in cache_modes:
+                report["results"].update(bench_end_to_end(arg_counts, min(library_sizes), workdir, args.llm_latency_ms,
+                                                          args.token_rate, args.repeat, mode, args.prefill_rate))
+
+    print(f"{'基准':<56}{'次数':>8}{'平均(ms)':>12}{'中位(ms)':>12}{'次/秒':>12}")
+    for name, data in report["results"].items():
+        if "skipped" in data:
+            print(f"{name:<56}  跳过：{data['skipped']}")
+            continue
+        print(f"{name:<56}{data['runs']:>8}{data['mean_ms']:>12.3f}{data['median_ms']:>12.3f}{data['ops_per_sec']:>12.2f}")
+        if data.get("stages_ms"):
+            print("    " + " · ".join(f"{stage} {ms:.1f}ms" for stage, ms in data["stages_ms"].items()))
+    savings = cache_savings(report["results"], args.prefill_rate)
+    if savings:
+        print("前缀缓存:")
+        for line in savings:
+            print(f"   {line}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report["results"], baseline, args.max_regression)
+        if regressions:
+            print("❌ 吞吐退化:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ 吞吐无明显退化")
+
+
+if __name__ == "__main__":
+    main()
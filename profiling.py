@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可选的性能剖析钩子：不改代码即可对 用例设计 / 脚本渲染 / 脚本解析 / 导出 等阶段做 CPU 与内存剖析。
+
+通过 AUTOAPI_PROFILE 环境变量（或 batch_export / executor 的 --profile 参数）开启，值为逗号分隔的模式：
+- cpu：cProfile，每个阶段累积为一个 .pstats 文件；
+- stack：定时采样调用栈，输出 collapsed-stack 文件（可直接交给 flamegraph.pl / speedscope 生成火焰图）；
+- mem：tracemalloc，记录每个阶段的内存峰值和新增分配最多的 N 个代码行。峰值每次调用都记录；
+  新增分配需要前后两次快照对比，耗时与进程中存活的分配数成正比（常在秒级），因此按阶段采样：
+  首次调用必定对比，之后距上次对比的间隔至少为其耗时的 MEM_SAMPLE_FACTOR 倍，额外开销约为 1/MEM_SAMPLE_FACTOR；
+- all（或 1）：以上全部。
+结果写入 AUTOAPI_PROFILE_DIR（默认 profiles/），文件名带进程号，多进程批量导出时各工作进程分别写出，
+`python profiling.py profiles/` 合并汇总。未开启时被装饰的函数只多一次布尔判断。
+
+同一时刻只剖析一个阶段（cProfile 不支持多个剖析器同时工作）：嵌套在已剖析阶段内的调用计入外层阶段，
+其它线程中同时进行的阶段不剖析，只计数。
+"""
+
+import argparse
+import atexit
+import functools
+import glob
+import os
+import sys
+import threading
+import time
+
+PROFILE_ENV = "AUTOAPI_PROFILE"
+PROFILE_DIR_ENV = "AUTOAPI_PROFILE_DIR"
+DEFAULT_DIR = "profiles"
+MODES = ("cpu", "stack", "mem")
+SAMPLE_INTERVAL = 0.005
+TOP_N = 15
+MEM_SAMPLE_FACTOR = 10
+
+_enabled = False
+_modes = frozenset()
+_output_dir = DEFAULT_DIR
+_lock = threading.Lock()
+# 当前正在剖析的 (阶段, 线程 ID)；同一时刻只有一个
+_active = None
+_local = threading.local()
+_stages = {}
+_sampler = None
+_written = False
+
+
+class _StageStats:
+    """一个阶段在本进程中的累积剖析结果。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.skipped = 0
+        self.seconds = 0.0
+        self.profile = None
+        self.stacks = {}
+        self.mem_peak = 0
+        self.mem_diffs = {}
+        self.mem_samples = 0
+        self.mem_next = 0.0
+
+
+def _stage(name: str) -> _StageStats:
+    stats = _stages.get(name)
+    if stats is None:
+        stats = _stages[name] = _StageStats(name)
+    return stats
+
+
+def _parse_modes(value: str) -> frozenset:
+    value = (value or "").strip().lower()
+    if value in ("", "0", "off", "false", "none"):
+        return frozenset()
+    if value in ("1", "all", "on", "true"):
+        return frozenset(MODES)
+    return frozenset(mode.strip() for mode in value.split(",") if mode.strip() in MODES)
+
+
+def enable(modes="all", output_dir: str = None) -> None:
+    """开启剖析。modes 为逗号分隔的字符串或集合；同时写入环境变量，使之后启动的工作进程也开启。"""
+    global _enabled, _modes, _output_dir
+    if not isinstance(modes, str):
+        modes = ",".join(modes)
+    _modes = _parse_modes(modes)
+    _output_dir = output_dir or os.environ.get(PROFILE_DIR_ENV) or DEFAULT_DIR
+    _enabled = bool(_modes)
+    if not _enabled:
+        return
+    os.environ[PROFILE_ENV] = ",".join(sorted(_modes))
+    os.environ[PROFILE_DIR_ENV] = _output_dir
+    if "mem" in _modes:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            # 只按分配所在的代码行汇总，一层调用栈即可，快照与对比都更快
+            tracemalloc.start(1)
+    if "stack" in _modes:
+        _start_sampler()
+    atexit.register(write_reports)
+    _register_finalizer()
+
+
+def _register_finalizer() -> None:
+    # 进程池工作进程退出时不执行 atexit，但会执行 multiprocessing 的 finalizer
+    from multiprocessing import util
+    util.Finalize(None, write_reports, exitpriority=10)
+
+
+def _after_fork_in_child() -> None:
+    """fork 出的子进程：丢弃从父进程继承的结果和锁，重新启动采样线程并登记退出时写出。"""
+    global _lock, _active, _local, _stages, _sampler, _written
+    _lock = threading.Lock()
+    _active = None
+    _local = threading.local()
+    _stages = {}
+    _sampler = None
+    _written = False
+    if not _enabled:
+        return
+    if "stack" in _modes:
+        _start_sampler()
+    # multiprocessing 在子进程启动时会清空父进程登记的 finalizer，需在其 after-fork 回调中重新登记
+    from multiprocessing import util
+    util.register_after_fork(_FORK_MARKER, lambda _: _register_finalizer())
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _Sampler(threading.Thread):
+    """定时采样正在剖析的线程的调用栈，按阶段累计 collapsed stack。"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="autoapi-profile-sampler", daemon=True)
+        self.interval = interval
+
+    def run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            active = _active
+            if active is None:
+                continue
+            stage, thread_id = active
+            if thread_id == own:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(names))
+            stacks = _stage(stage).stacks
+            stacks[key] = stacks.get(key, 0) + 1
+
+
+def _start_sampler() -> None:
+    global _sampler
+    if _sampler is None:
+        _sampler = _Sampler(SAMPLE_INTERVAL)
+        _sampler.start()
+
+
+def _own_file(filename: str) -> bool:
+    """tracemalloc 和本模块自身的分配，汇总时跳过（不对快照调用 filter_traces，它和对比一样耗时）。"""
+    import tracemalloc
+    return filename in (tracemalloc.__file__, __file__)
+
+
+class _Profiled:
+    """一次阶段执行：获得剖析权时开启 cProfile / tracemalloc 快照，退出时累积到阶段结果。"""
+
+    __slots__ = ("name", "owner", "started", "snapshot")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.owner = False
+        self.started = 0.0
+        self.snapshot = None
+
+    def __enter__(self):
+        global _active
+        stats = _stage(self.name)
+        if getattr(_local, "depth", 0):
+            # 嵌套在本线程已剖析的阶段内，计入外层
+            _local.depth += 1
+            stats.calls += 1
+            return self
+        if not _lock.acquire(blocking=False):
+            stats.skipped += 1
+            return self
+        self.owner = True
+        _local.depth = 1
+        stats.calls += 1
+        if "mem" in _modes:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            if time.perf_counter() >= stats.mem_next:
+                self.snapshot = tracemalloc.take_snapshot()
+        if "cpu" in _modes:
+            import cProfile
+            if stats.profile is None:
+                stats.profile = cProfile.Profile()
+            stats.profile.enable()
+        _active = (self.name, threading.get_ident())
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        if not self.owner:
+            if getattr(_local, "depth", 0):
+                _local.depth -= 1
+            return False
+        stats = _stage(self.name)
+        stats.seconds += time.perf_counter() - self.started
+        _active = None
+        try:
+            if stats.profile is not None:
+                stats.profile.disable()
+            if "mem" in _modes:
+                import tracemalloc
+                stats.mem_peak = max(stats.mem_peak, tracemalloc.get_traced_memory()[1])
+            if self.snapshot is not None:
+                compare_started = time.perf_counter()
+                after = tracemalloc.take_snapshot()
+                for diff in after.compare_to(self.snapshot, "lineno"):
+                    frame = diff.traceback[0]
+                    if diff.size_diff <= 0 or _own_file(frame.filename):
+                        continue
+                    key = f"{frame.filename}:{frame.lineno}"
+                    size, count = stats.mem_diffs.get(key, (0, 0))
+                    stats.mem_diffs[key] = (size + diff.size_diff, count + diff.count_diff)
+                stats.mem_samples += 1
+                now = time.perf_counter()
+                stats.mem_next = now + (now - compare_started) * MEM_SAMPLE_FACTOR
+        finally:
+            _local.depth = 0
+            _lock.release()
+        return False
+
+
+class _Noop:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _ForkMarker:
+    pass
+
+
+_FORK_MARKER = _ForkMarker()
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def stage(name: str):
+    """剖析一段代码（with profiling.stage("export"): ...）；未开启时返回空操作对象。"""
+    return _Profiled(name) if _enabled else _NOOP
+
+
+def profiled(name: str):
+    """装饰器：把函数的每次调用作为阶段 name 剖析。未开启时只多一次布尔判断。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Profiled(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_reports() -> list:
+    """把本进程的剖析结果写入输出目录，返回写出的文件（每个进程只写一次）。"""
+    global _written
+    if _written or not _enabled or not _stages:
+        return []
+    _written = True
+    os.makedirs(_output_dir, exist_ok=True)
+    pid = os.getpid()
+    written = []
+    lines = [f"# pid {pid}  模式 {','.join(sorted(_modes))}"]
+    for name, stats in sorted(_stages.items()):
+        lines.append(f"{name}: 剖析 {stats.calls} 次，{stats.seconds:.3f}s"
+                     + (f"，并发跳过 {stats.skipped} 次" if stats.skipped else "")
+                     + (f"，内存峰值 {stats.mem_peak / 1024 / 1024:.1f} MB" if stats.mem_peak else ""))
+        if stats.profile is not None:
+            path = os.path.join(_output_dir, f"{name}-{pid}.pstats")
+            stats.profile.dump_stats(path)
+            written.append(path)
+        if stats.stacks:
+            path = os.path.join(_output_dir, f"{name}-{pid}.collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                for key, count in sorted(stats.stacks.items()):
+                    f.write(f"{key} {count}\n")
+            written.append(path)
+        if stats.mem_diffs:
+            top = sorted(stats.mem_diffs.items(), key=lambda kv: -kv[1][0])[:TOP_N]
+            lines.append(f"  新增分配最多的 {len(top)} 个位置（采样 {stats.mem_samples} / {stats.calls} 次调用）:")
+            lines.extend(f"    {size / 1024:>10.1f} KB {count:>8} 个  {key}" for key, (size, count) in top)
+    path = os.path.join(_output_dir, f"summary-{pid}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合并并查看各进程的剖析结果")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_DIR, help="剖析输出目录")
+    parser.add_argument("--top", type=int, default=20, help="每个阶段显示的函数数")
+    parser.add_argument("--sort", default="cumulative", help="pstats 排序字段（cumulative / tottime / calls）")
+    parser.add_argument("--collapsed", default=None, help="把各进程的 collapsed stack 合并写入该文件")
+    args = parser.parse_args()
+
+    import pstats
+
+    for path in sorted(glob.glob(os.path.join(args.directory, "summary-*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            print(f.read())
+
+    by_stage = {}
+    for path in glob.glob(os.path.join(args.directory, "*.pstats")):
+        by_stage.setdefault(os.path.basename(path).rsplit("-", 1)[0], []).append(path)
+    for name, paths in sorted(by_stage.items()):
+        print(f"========== {name}（{len(paths)} 个进程）==========")
+        pstats.Stats(*paths).strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+    if args.collapsed:
+        merged = {}
+        for path in glob.glob(os.path.join(args.directory, "*.collapsed")):
+            stage_name = os.path.basename(path).rsplit("-", 1)[0]
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    key = f"{stage_name};{stack}"
+                    merged[key] = merged.get(key, 0) + int(count)
+        with open(args.collapsed, "w", encoding="utf-8") as f:
+            for key, count in sorted(merged.items()):
+                f.write(f"{key} {count}\n")
+        print(f"已合并 {len(merged)} 条调用栈到 {args.collapsed}")
+
+
+if os.environ.get(PROFILE_ENV):
+    enable(os.environ[PROFILE_ENV])
+
+if __name__ == "__main__":
+    main()
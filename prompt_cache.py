@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+用例设计提示词的前缀缓存。
+
+design_knowledge_driven_cases 的提示词分为两部分：固定的设计说明 + 测试环境变量库在前（同一批次内不变，作为 system 消息），
+每个接口不同的 API 文档 + 复杂对象模型在后（作为 user 消息）。前缀稳定后有两种用法：
+
+- off（默认）：普通调用。服务端支持隐式前缀缓存时，同一批次的后续调用会命中前缀（usage 中 cached_tokens 大于 0）；
+- context：使用豆包（火山方舟）的上下文缓存（Context API，common_prefix 模式）。每个 (服务地址, 模型, 前缀)
+  只创建一次上下文，之后的调用只发送后缀；上下文过期或失效时丢弃并重建，创建失败时退回普通调用。
+
+模式取任务上下文的 context_cache，未设置时取环境变量 AUTOAPI_CONTEXT_CACHE。
+创建上下文的那次调用也记录到用量（purpose 为 context），命中节省的 tokens 和费用见 llm_usage.summarize_calls；
+stub_server.py 实现了同样的接口（含隐式前缀缓存和按未命中 tokens 计算的预填充耗时），
+pipeline_bench.py --cache-modes 在本地比较各模式的耗时和 tokens。
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+import llm_usage
+import tracing
+
+MODES = ("off", "context")
+CONTEXT_CACHE_ENV = "AUTOAPI_CONTEXT_CACHE"
+DEFAULT_TTL = 3600
+# 距过期不足该秒数的上下文不再使用，避免调用途中过期
+EXPIRY_MARGIN = 60
+# 创建失败（如模型不支持上下文缓存）后多久内不再尝试
+FAILURE_BACKOFF = 300
+CREATE_TIMEOUT = 60
+
+
+class _Entry:
+    __slots__ = ("lock", "context_id", "expires_at", "retry_at")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.context_id = None
+        self.expires_at = 0.0
+        self.retry_at = 0.0
+
+
+_lock = threading.Lock()
+_entries = {}
+
+
+def resolve_mode(ctx) -> str:
+    """任务使用的缓存模式：ctx.context_cache，未设置时取环境变量；无法识别的值按 off 处理。"""
+    mode = getattr(ctx, "context_cache", None) or os.environ.get(CONTEXT_CACHE_ENV) or "off"
+    return mode if mode in MODES else "off"
+
+
+def context_base_url(base_url: str) -> str:
+    """上下文缓存的接口地址：<base_url>/context/create 与 <base_url>/context/chat/completions。"""
+    return base_url.rstrip("/") + "/context"
+
+
+def _key(base_url: str, model: str, prefix: str) -> tuple:
+    return base_url.rstrip("/"), model, hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+def create_context(base_url: str, api_key: str, model: str, prefix: str, ttl: int = DEFAULT_TTL) -> tuple:
+    """创建 common_prefix 上下文，返回 (上下文 ID, usage)。"""
+    import requests
+
+    response = requests.post(
+        context_base_url(base_url) + "/create",
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        json={"model": model, "mode": "common_prefix", "ttl": ttl,
+              "messages": [{"role": "system", "content": prefix}]},
+        timeout=CREATE_TIMEOUT,
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data["id"], data.get("usage")
+
+
+def get_context(base_url: str, api_key: str, model: str, prefix: str, ctx=None, ttl: int = DEFAULT_TTL):
+    """返回可用的上下文 ID，没有或即将过期时创建；同一前缀的并发调用只创建一次。创建失败时返回 None。"""
+    key = _key(base_url, model, prefix)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = _entries[key] = _Entry()
+    with entry.lock:
+        now = time.time()
+        if entry.context_id and entry.expires_at - EXPIRY_MARGIN > now:
+            return entry.context_id
+        if entry.retry_at > now:
+            return None
+        started = time.perf_counter()
+        try:
+            with tracing.span(ctx, "context_create", chars=len(prefix)):
+                context_id, usage = create_context(base_url, api_key, model, prefix, ttl)
+        except Exception as e:
+            print(f"创建上下文缓存失败，{FAILURE_BACKOFF}s 内改为普通调用: {e}")
+            entry.context_id = None
+            entry.retry_at = now + FAILURE_BACKOFF
+            return None
+        fields = llm_usage.openai_usage_fields(usage)
+        if fields.get("prompt_tokens") is not None and fields.get("completion_tokens") is None:
+            fields["completion_tokens"] = 0
+        llm_usage.record(ctx, llm_usage.make_usage("doubao", model, time.perf_counter() - started, purpose="context",
+                                                   **fields))
+        print(f"已创建上下文缓存 {context_id}（{len(prefix)} 字符，有效期 {ttl}s）")
+        entry.context_id = context_id
+        entry.expires_at = now + ttl
+        return context_id
+
+
+def invalidate(base_url: str, model: str, prefix: str, context_id: str) -> None:
+    """丢弃失效的上下文（只在仍是该 ID 时），下次调用时重建。"""
+    with _lock:
+        entry = _entries.get(_key(base_url, model, prefix))
+    if entry is None:
+        return
+    with entry.lock:
+        if entry.context_id == context_id:
+            entry.context_id = None
+            entry.expires_at = 0.0
+
+
+def clear() -> None:
+    """清空已创建的上下文记录（不删除服务端的上下文，它们按 TTL 过期）。"""
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务模式：在本机以 HTTP 提供异步的用例生成任务接口，团队与 CI 共用一个常驻实例
+（共享文档 / 模型缓存、用例库和 API 密钥的限流），不必各自冷启动一份工具。
+
+接口（请求与响应均为 JSON）：
+- POST   /jobs                 提交任务 {"api_paths": [...], "model", "render_scripts", "batch_id", "dedup", "context_cache"}，
+                               返回批次号与任务列表（202）
+- GET    /jobs[?batch=ID]      任务列表
+- GET    /jobs/<id>            任务状态
+- GET    /jobs/<id>/events     任务进度（text/event-stream，任务结束后关闭）
+- GET    /jobs/<id>/result     生成结果；?format=jmx / md / jsonl 时返回对应格式的导出文本
+- DELETE /jobs/<id>            取消任务
+- GET    /health               运行状态
+已结束的任务保留 --retention 秒，且最多保留 --max-finished 个（超出时先清理最早结束的）；
+被清理的任务在 /jobs/<id> 等接口返回 410。
+设置 --token（或 AUTOAPI_SERVICE_TOKEN）后，请求须带 "Authorization: Bearer <token>"。
+"""
+
+import argparse
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import batch_export
+import case_dedup
+import doubao
+import prompt_cache
+from job_context import JobCancelled
+from job_runner import JobRunner
+
+TOKEN_ENV = "AUTOAPI_SERVICE_TOKEN"
+DEFAULT_PORT = 8765
+MAX_BODY = 1024 * 1024
+MAX_PATHS_PER_REQUEST = 1000
+EVENT_KEEPALIVE = 15.0
+DEFAULT_RETENTION = 3600.0
+DEFAULT_MAX_FINISHED = 1000
+# 记住最近被清理的任务 ID 的个数，用于返回 410 而不是 404
+EVICTED_MEMORY = 10000
+RESULT_FORMATS = {
+    "jmx": "application/xml; charset=utf-8",
+    "md": "text/markdown; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+class GenerationService:
+    """把 JobRunner 包装成服务：记录每个任务的更新序号，供进度流等待变化。
+
+    常驻运行时已结束的任务（连同完整的文档与用例）按 retention 秒和 max_finished 个清理，内存不会随请求数增长。
+    """
+
+    def __init__(self, runner_factory, test_data_file: str, api_key: str = None, model: str = None,
+                 case_db: str = None, doc_base_url: str = None, llm_base_url: str = None,
+                 retention: float = DEFAULT_RETENTION, max_finished: int = DEFAULT_MAX_FINISHED,
+                 dedup: str = case_dedup.DEFAULT_MODE, context_cache: str = None):
+        self.test_data_file = test_data_file
+        self.api_key = api_key
+        self.model = model
+        self.case_db = case_db
+        self.doc_base_url = doc_base_url
+        self.llm_base_url = llm_base_url
+        self.dedup = dedup
+        self.context_cache = context_cache
+        self.retention = retention
+        self.max_finished = max_finished
+        self.started_at = time.time()
+        self._changed = threading.Condition()
+        self._versions = {}
+        self._lock = threading.Lock()
+        # 按需渲染结果时的任务锁，避免并发请求同时渲染并写入 job.result
+        self._render_locks = {}
+        self._evicted = OrderedDict()
+        self.runner = runner_factory(self._on_update)
+
+    def _on_update(self, job) -> None:
+        with self._changed:
+            self._versions[job.id] = self._versions.get(job.id, 0) + 1
+            self._changed.notify_all()
+        if job.finished:
+            self.evict()
+
+    def evict(self) -> list:
+        """清理超过保留时间、或超出保留个数（最早结束的先清理）的已结束任务，返回被清理的任务 ID。"""
+        finished = sorted((job for job in self.runner.jobs() if job.finished), key=lambda job: job.finished_at or 0)
+        cutoff = time.time() - self.retention
+        expired = [job.id for job in finished if (job.finished_at or 0) < cutoff]
+        overflow = len(finished) - len(expired) - self.max_finished
+        if overflow > 0:
+            expired.extend(job.id for job in finished[len(expired):len(expired) + overflow])
+        if not expired:
+            return []
+        removed = self.runner.remove(expired)
+        with self._changed:
+            for job_id in removed:
+                self._versions.pop(job_id, None)
+        with self._lock:
+            for job_id in removed:
+                self._render_locks.pop(job_id, None)
+                self._evicted[job_id] = time.time()
+            while len(self._evicted) > EVICTED_MEMORY:
+                self._evicted.popitem(last=False)
+        return removed
+
+    def was_evicted(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._evicted
+
+    def version(self, job_id: str) -> int:
+        with self._changed:
+            return self._versions.get(job_id, 0)
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float) -> int:
+        """等待任务的更新序号超过 version（或超时），返回最新序号。"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._versions.get(job_id, 0) > version, timeout)
+            return self._versions.get(job_id, 0)
+
+    def submit(self, request: dict) -> dict:
+        """按请求提交一批任务；请求格式错误时抛出 ValueError。"""
+        api_paths = request.get("api_paths")
+        if api_paths is None and request.get("api_path"):
+            api_paths = [request["api_path"]]
+        if not isinstance(api_paths, list) or not api_paths:
+            raise ValueError("api_paths 应为非空的接口路径列表")
+        if len(api_paths) > MAX_PATHS_PER_REQUEST:
+            raise ValueError(f"单次最多提交 {MAX_PATHS_PER_REQUEST} 个接口")
+        if not all(isinstance(path, str) and path.startswith("/") for path in api_paths):
+            raise ValueError("接口路径应以 / 开头")
+        model = request.get("model") or self.model
+        if model is not None and not isinstance(model, str):
+            raise ValueError("model 应为字符串")
+        dedup = request.get("dedup") or self.dedup
+        if dedup not in case_dedup.MODES:
+            raise ValueError(f"dedup 应为 {' / '.join(case_dedup.MODES)} 之一")
+        context_cache = request.get("context_cache") or self.context_cache
+        if context_cache is not None and context_cache not in prompt_cache.MODES:
+            raise ValueError(f"context_cache 应为 {' / '.join(prompt_cache.MODES)} 之一")
+        batch_id = str(request.get("batch_id") or uuid.uuid4().hex[:12])
+        render_scripts = bool(request.get("render_scripts", True))
+        jobs = [self.runner.submit(path, self.test_data_file, api_key=self.api_key, model=model,
+                                   llm_base_url=self.llm_base_url, doc_base_url=self.doc_base_url,
+                                   render_scripts=render_scripts, case_db=self.case_db, batch_id=batch_id,
+                                   dedup=dedup, context_cache=context_cache)
+                for path in dict.fromkeys(api_paths)]
+        return {"batch_id": batch_id, "jobs": [job.to_dict() for job in jobs]}
+
+    def result(self, job) -> dict:
+        """任务结果（JSON 可序列化）。未预先渲染脚本的任务在此时渲染（同一任务只渲染一次）。"""
+        result = job.result
+        with self._lock:
+            render_lock = self._render_locks.setdefault(job.id, threading.Lock())
+        with render_lock:
+            if result["test_cases"] and not result["parsed_cases"]:
+                result["parsed_cases"] = [doubao.render_case(result["api_doc"], case) for case in result["test_cases"]]
+        keys = ("api_path", "test_cases", "parsed_cases", "cached", "incremental", "unknown_vars", "usage")
+        return dict({key: result.get(key) for key in keys}, job=job.to_dict())
+
+    def export(self, job, fmt: str) -> str:
+        """按 batch_export 的格式导出任务结果。"""
+        result = self.result(job)
+        if fmt == "jmx":
+            return batch_export.render_jmx(job.api_path, result["parsed_cases"])
+        if fmt == "jsonl":
+            return batch_export.render_jsonl(result["test_cases"], result["parsed_cases"])
+        blocks = job.result["script_blocks"] or [doubao.generate_scripts_for_case(job.result["api_doc"], case)
+                                                 for case in result["test_cases"]]
+        return batch_export.render_markdown(job.api_path, blocks)
+
+    def health(self) -> dict:
+        jobs = self.runner.jobs()
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        with self._lock:
+            evicted = len(self._evicted)
+        return {"status": "ok", "uptime": round(time.time() - self.started_at, 1),
+                "workers": self.runner.max_workers, "active": self.runner.active_count, "jobs": counts,
+                "recently_evicted": evicted}
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AutoApiService/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+    def _error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        header = self.headers.get("Authorization", "")
+        if header.startswith("Bearer ") and hmac.compare_digest(header[len("Bearer "):], token):
+            return True
+        self._error(401, "未授权")
+        return False
+
+    def _route(self):
+        """返回 (路径片段, 查询参数)。"""
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, {key: values[0] for key, values in parse_qs(url.query).items()}
+
+    def _job_or_404(self, job_id: str):
+        job = self.server.service.runner.get(job_id)
+        if job is None:
+            if self.server.service.was_evicted(job_id):
+                self._error(410, f"任务已结束并超过保留期限，结果已清理: {job_id}")
+            else:
+                self._error(404, f"任务不存在: {job_id}")
+        return job
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts, query = self._route()
+        service = self.server.service
+        service.evict()
+        if parts == ["health"]:
+            self._send_json(200, service.health())
+        elif parts == ["jobs"]:
+            batch = query.get("batch")
+            self._send_json(200, [job.to_dict() for job in service.runner.jobs()
+                                  if batch is None or job.batch_id == batch])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                self._send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                self._stream_events(job)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                self._send_result(job, query.get("format", "json"))
+        else:
+            self._error(404, "未知的接口")
+
+    def _send_result(self, job, fmt: str) -> None:
+        if fmt != "json" and fmt not in RESULT_FORMATS:
+            self._error(400, f"不支持的格式: {fmt}")
+            return
+        if not job.finished:
+            self._send_json(409, {"error": "任务尚未结束", "job": job.to_dict()})
+            return
+        if job.result is None:
+            self._send_json(409, {"error": job.error or "任务没有结果", "job": job.to_dict()})
+            return
+        try:
+            if fmt == "json":
+                self._send_json(200, self.server.service.result(job))
+            else:
+                self._send(200, self.server.service.export(job, fmt).encode("utf-8"), RESULT_FORMATS[fmt])
+        except JobCancelled:
+            self._error(409, "任务已取消")
+
+    def _stream_events(self, job) -> None:
+        """以 server-sent events 推送任务的状态 / 阶段变化，任务结束后发送 end 事件并关闭连接。"""
+        service = self.server.service
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        version = -1
+        try:
+            while True:
+                current = service.version(job.id)
+                if current != version:
+                    version = current
+                    data = json.dumps(job.to_dict(), ensure_ascii=False, default=str)
+                    self.wfile.write(f"event: progress\ndata: {data}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                if job.finished:
+                    self.wfile.write(b"event: end\ndata: {}\n\n")
+                    self.wfile.flush()
+                    return
+                if service.wait_for_change(job.id, version, EVENT_KEEPALIVE) == version:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts, _ = self._route()
+        if parts != ["jobs"]:
+            self._error(404, "未知的接口")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self._error(400, "Content-Length 无效")
+            return
+        if length > MAX_BODY:
+            self._error(413, "请求体过大")
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("请求体应为 JSON 对象")
+            self._send_json(202, self.server.service.submit(request))
+        except ValueError as e:
+            self._error(400, str(e))
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._error(404, "未知的接口")
+            return
+        job = self._job_or_404(parts[1])
+        if job is not None:
+            cancelled = self.server.service.runner.cancel(job.id)
+            self._send_json(200, {"cancelled": cancelled, "job": job.to_dict()})
+
+
+def start_service(service: GenerationService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                  token: str = None, verbose: bool = False):
+    """在后台线程启动服务，返回 (server, base_url)。port=0 时自动选择空闲端口。"""
+    server = ServiceServer((host, port), ServiceHandler)
+    server.service = service
+    server.token = token
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, name="autoapi-service")
+    thread.daemon = True
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用例生成服务：以 HTTP 接口提交和查询异步生成任务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（团队共用时可设为 0.0.0.0，并配置 --token）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV), help="访问令牌，默认读取 AUTOAPI_SERVICE_TOKEN")
+    parser.add_argument("--workers", type=int, default=3, help="同时进行的生成任务数")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--model", default=doubao.DEFAULT_MODEL, help="请求未指定模型时使用的模型")
+    parser.add_argument("--api-key", default=None, help="豆包 API 密钥，默认读取 DOUBAO_API_KEY")
+    parser.add_argument("--doc-base-url", default=None, help="文档服务器地址，默认 doubao.BASE_DOC_URL")
+    parser.add_argument("--llm-base-url", default=None, help="模型服务地址，默认 doubao.DOUBAO_BASE_URL")
+    parser.add_argument("--case-db", default="case_store.db", help="生成用例库，空字符串表示不使用")
+    parser.add_argument("--usage-db", default="llm_usage.db", help="模型调用 token 用量库，空字符串表示不记录")
+    parser.add_argument("--doc-snapshot", default=None, help="文档快照（doc_snapshot.py 生成），从快照读取文档")
+    parser.add_argument("--retention", type=float, default=DEFAULT_RETENTION, help="已结束任务的保留时间（秒）")
+    parser.add_argument("--max-finished", type=int, default=DEFAULT_MAX_FINISHED, help="最多保留的已结束任务数")
+    parser.add_argument("--dedup", choices=case_dedup.MODES, default=case_dedup.DEFAULT_MODE,
+                        help="请求未指定 dedup 时的去重模式")
+    parser.add_argument("--context-cache", choices=prompt_cache.MODES, default=None,
+                        help="请求未指定 context_cache 时的提示词前缀缓存模式，默认取 AUTOAPI_CONTEXT_CACHE")
+    parser.add_argument("--verbose", action="store_true", help="输出访问日志")
+    args = parser.parse_args()
+
+    if args.doc_snapshot:
+        doubao.set_doc_snapshot(args.doc_snapshot)
+    service = GenerationService(
+        lambda on_update: JobRunner(args.workers, on_update=on_update, usage_db=args.usage_db or None),
+        args.test_data, api_key=args.api_key, model=args.model, case_db=args.case_db or None,
+        doc_base_url=args.doc_base_url, llm_base_url=args.llm_base_url, retention=args.retention,
+        max_finished=args.max_finished, dedup=args.dedup, context_cache=args.context_cache)
+    server, base_url = start_service(service, args.host, args.port, args.token, args.verbose)
+    print(f"用例生成服务已启动: {base_url}（{args.workers} 个工作线程，Ctrl+C 退出）")
+    if args.host not in ("127.0.0.1", "localhost") and not args.token:
+        print("⚠️ 服务监听在非本机地址且未配置访问令牌")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        service.runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
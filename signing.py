@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python 侧的请求签名与请求体解析。
+
+与 generate_scripts_for_case 生成的 BeanShell 前置脚本保持逐字节一致：
+- 签名串：secret + "_app=" + appKey + "&_s=&_t=" + time + "&" + 排序后的业务参数 + secret，
+  MD5 后转大写十六进制；
+- 变量引用使用 Java URLEncoder 规则编码（空格转 "+"，仅保留 a-zA-Z0-9.-*_）；
+- 请求体中的 ${var} / ${__urlencode(${var})} 按 JMeter 的规则解析，未定义的变量原样保留。
+这样无需启动 JMeter 就能在进程内校验和执行大量用例。
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from urllib.parse import quote_plus
+
+import doubao
+import var_library
+from var_refs import find_closing_brace
+
+
+def java_urlencode(value: str) -> str:
+    """等价于 Java 的 URLEncoder.encode(value, "UTF-8")。"""
+    # Python 的 quote_plus 总是保留 "~"，而 Java 会将其编码为 %7E
+    return quote_plus(str(value), safe="*", encoding="utf-8").replace("~", "%7E")
+
+
+def compute_sign(app_key: str, secret: str, args_body: str, timestamp: str) -> tuple:
+    """按开放平台规则计算签名，返回 (string_to_sign, signature)。"""
+    string_to_sign = f"{secret}_app={app_key}&_s=&_t={timestamp}&{args_body}{secret}"
+    signature = hashlib.md5(string_to_sign.encode("utf-8")).hexdigest().upper()
+    return string_to_sign, signature
+
+
+def variables_from_test_data(test_data_json: str) -> dict:
+    """将 load_test_data 返回的变量库 JSON（或 var_library.VariableLibrary）转为 {变量名: 字符串值}，与 JMeter 变量一致。"""
+    if isinstance(test_data_json, var_library.VariableLibrary):
+        return dict(test_data_json.variables)
+    try:
+        items = json.loads(test_data_json) if isinstance(test_data_json, str) else test_data_json
+    except json.JSONDecodeError:
+        return {}
+    variables = {}
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        name = item.get("name")
+        value = item.get("value")
+        if name and value is not None:
+            variables[name] = str(value)
+    return variables
+
+
+def resolve_template(text: str, variables: dict, unresolved: list = None) -> str:
+    """按 JMeter 的规则解析文本中的 ${var} 与 ${__urlencode(...)}，未定义的变量原样保留。
+
+    传入 unresolved 列表时，会把未定义的变量名追加进去。
+    """
+    out = []
+    i = 0
+    while i < len(text):
+        begin = text.find("${", i)
+        if begin < 0:
+            out.append(text[i:])
+            break
+        out.append(text[i:begin])
+        end = find_closing_brace(text, begin + 2)
+        if end < 0:
+            out.append(text[begin:])
+            break
+        inner = text[begin + 2:end]
+        if inner.startswith("__urlencode(") and inner.endswith(")"):
+            out.append(java_urlencode(resolve_template(inner[len("__urlencode("):-1], variables, unresolved)))
+        elif inner in variables:
+            out.append(variables[inner])
+        else:
+            if unresolved is not None:
+                unresolved.append(inner)
+            out.append(text[begin:end + 1])
+        i = end + 1
+    return "".join(out)
+
+
+def case_variables(test_case: dict, overrides: dict, variables: dict) -> dict:
+    """模拟前置脚本1：在变量库基础上写入用例中的字面量值（vars.put）。"""
+    merged = dict(variables)
+    for name, value in sorted(test_case.get("parameters", {}).items()):
+        if not (isinstance(value, str) and value.startswith('${')):
+            merged[name] = str(overrides.get(name, value))
+    return merged
+
+
+def resolve_case_request(api_doc: dict, test_case: dict, variables: dict,
+                         app_key: str = None, secret: str = None, timestamp: str = None) -> dict:
+    """
+    解析单个用例最终发送的请求。
+
+    variables 为变量库 {name: value}（见 variables_from_test_data）；app_key / secret 未传入时
+    从变量库中的 appKey / secret 读取。返回 dict：
+    case_name、args_body、string_to_sign、signature、time、body，以及 unresolved（请求体中未定义的变量名）。
+    """
+    case_params = test_case.get("parameters", {})
+    sorted_parts, overrides = doubao.build_business_param_parts(api_doc, case_params)
+
+    merged = case_variables(test_case, overrides, variables)
+    if app_key is not None:
+        merged["appKey"] = app_key
+    if secret is not None:
+        merged["secret"] = secret
+    timestamp = timestamp or str(int(time.time()))
+
+    # 模拟前置脚本2：拼接签名用的业务参数，变量为 null 时跳过
+    param_parts = []
+    for part in sorted_parts:
+        param_name, value_str = (part.split('=', 1) + [''])[:2]
+        if value_str.startswith('${'):
+            env_var_name = doubao.extract_sign_var_name(value_str)
+            value = merged.get(env_var_name)
+            if value is None:
+                continue
+            if param_name == 'page' or param_name == 'limit':
+                param_parts.append(f"{param_name}={value}")
+            else:
+                param_parts.append(f"{param_name}={java_urlencode(value)}")
+        else:
+            param_parts.append(part)
+    args_body = "&".join(param_parts)
+
+    string_to_sign, signature = compute_sign(merged.get("appKey", "null"), merged.get("secret", "null"),
+                                             args_body, timestamp)
+    merged["signature"] = signature
+    merged["time"] = timestamp
+
+    body_template = f"_app=${{appKey}}&_s=&_sign=${{signature}}&_t=${{time}}&{'&'.join(sorted_parts)}"
+    unresolved = []
+    body = resolve_template(body_template, merged, unresolved)
+
+    return {
+        "case_name": test_case.get("case_name", "未命名用例"),
+        "args_body": args_body,
+        "string_to_sign": string_to_sign,
+        "signature": signature,
+        "time": timestamp,
+        "body": body,
+        "unresolved": unresolved,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地解析用例请求体并计算签名（无需 JMeter）")
+    parser.add_argument("api_doc", help="API 文档 JSON 文件")
+    parser.add_argument("cases", help="用例 JSON 数组文件（design_knowledge_driven_cases 的输出）")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--app-key", default=None, help="appKey，默认读取变量库中的 appKey")
+    parser.add_argument("--secret", default=None, help="secret，默认读取变量库中的 secret")
+    parser.add_argument("--time", default=None, help="固定时间戳（秒），便于与 JMeter 日志比对")
+    args = parser.parse_args()
+
+    with open(args.api_doc, "r", encoding="utf-8") as f:
+        api_doc = json.load(f)
+    with open(args.cases, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    variables = variables_from_test_data(doubao.load_test_data(args.test_data))
+
+    for case in cases:
+        resolved = resolve_case_request(api_doc, case, variables, args.app_key, args.secret, args.time)
+        print(f"\n--- 用例: {resolved['case_name']} ---")
+        print(f"签名串: {resolved['string_to_sign']}")
+        print(f"签名: {resolved['signature']}")
+        print(f"请求体: {resolved['body']}")
+        if resolved["unresolved"]:
+            print(f"⚠️ 未解析的变量: {', '.join(resolved['unresolved'])}")
+
+
+if __name__ == "__main__":
+    main()
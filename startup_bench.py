@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动性能基准：测量 doubao_gui 从进程启动到窗口显示的耗时（冷/热启动，源码/打包程序），
+并用 -X importtime 统计各模块导入耗时，可与基线比较以发现启动退化。
+
+- 冷启动：每次使用全新的 PYTHONPYCACHEPREFIX，所有模块都需重新编译字节码；
+- 热启动：复用同一个字节码缓存目录，先预热一次再计时；
+- 打包程序：直接运行 PyInstaller 生成的可执行文件（--exe）。
+窗口显示时刻由 doubao_gui 在收到 AUTOAPI_STARTUP_PROBE 环境变量后写入文件。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 与 doubao_gui.STARTUP_PROBE_ENV 相同；不导入 doubao_gui，避免把 tkinter 和生成流程加载进基准进程
+STARTUP_PROBE_ENV = "AUTOAPI_STARTUP_PROBE"
+HERE = os.path.dirname(os.path.abspath(__file__))
+GUI_SCRIPT = os.path.join(HERE, "doubao_gui.py")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """解析 -X importtime 输出，返回 {模块名: {"self_ms", "cumulative_ms"}}。"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "", 1).split("|")]
+            modules[name] = {"self_ms": int(self_us) / 1000.0, "cumulative_ms": int(cumulative_us) / 1000.0}
+        except ValueError:
+            continue
+    return modules
+
+
+def run_once(cmd: list, env: dict, timeout: float) -> dict:
+    """启动一次程序，返回 {"time_to_window_ms", "process_ms", "imports"}；窗口未显示时 time_to_window_ms 为 None。"""
+    fd, probe_path = tempfile.mkstemp(prefix="autoapi-probe-")
+    os.close(fd)
+    os.remove(probe_path)
+    env = dict(env, **{STARTUP_PROBE_ENV: probe_path})
+    started = time.time()
+    proc = subprocess.run(cmd, env=env, cwd=HERE, capture_output=True, text=True, timeout=timeout)
+    result = {"time_to_window_ms": None, "process_ms": round((time.time() - started) * 1000, 1),
+              "imports": parse_importtime(proc.stderr), "returncode": proc.returncode}
+    if os.path.exists(probe_path):
+        with open(probe_path, "r", encoding="utf-8") as f:
+            result["time_to_window_ms"] = round((float(f.read()) - started) * 1000, 1)
+        os.remove(probe_path)
+    elif proc.returncode != 0:
+        result["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"退出码 {proc.returncode}"
+    return result
+
+
+def _summarize(runs: list, top: int) -> dict:
+    times = [r["time_to_window_ms"] for r in runs if r["time_to_window_ms"] is not None]
+    process_times = [r["process_ms"] for r in runs]
+    merged = {}
+    for r in runs:
+        for name, data in r["imports"].items():
+            merged.setdefault(name, []).append(data["cumulative_ms"])
+    imports = sorted(((name, statistics.median(values)) for name, values in merged.items()),
+                     key=lambda item: item[1], reverse=True)[:top]
+    summary = {
+        "runs": len(runs),
+        "time_to_window_ms": {
+            "median": round(statistics.median(times), 1) if times else None,
+            "min": min(times) if times else None,
+            "max": max(times) if times else None,
+        },
+        "process_ms": {"median": round(statistics.median(process_times), 1) if process_times else None},
+        "top_imports_ms": [{"module": name, "cumulative_ms": round(value, 2)} for name, value in imports],
+    }
+    errors = [r["error"] for r in runs if r.get("error")]
+    if errors:
+        summary["errors"] = errors[:3]
+    return summary
+
+
+def bench_source(repeat: int, top: int, timeout: float, imports_only: bool) -> dict:
+    """源码方式的冷/热启动基准。imports_only 时只导入 doubao_gui，不创建窗口（适合无显示环境）。"""
+    if imports_only:
+        cmd = [sys.executable, "-X", "importtime", "-c", "import doubao_gui"]
+    else:
+        cmd = [sys.executable, "-X", "importtime", GUI_SCRIPT]
+
+    cold_runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="autoapi-pycache-") as prefix:
+            cold_runs.append(run_once(cmd, dict(os.environ, PYTHONPYCACHEPREFIX=prefix), timeout))
+
+    warm_runs = []
+    with tempfile.TemporaryDirectory(prefix="autoapi-pycache-") as prefix:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=prefix)
+        run_once(cmd, env, timeout)
+        for _ in range(repeat):
+            warm_runs.append(run_once(cmd, env, timeout))
+
+    return {"cold": _summarize(cold_runs, top), "warm": _summarize(warm_runs, top)}
+
+
+def bench_frozen(exe_path: str, repeat: int, top: int, timeout: float) -> dict:
+    """打包程序的基准：第一次运行视为冷启动，其余为热启动。"""
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1")
+    runs = [run_once([exe_path], env, timeout) for _ in range(repeat + 1)]
+    return {"cold": _summarize(runs[:1], top), "warm": _summarize(runs[1:], top)}
+
+
+def compare_with_baseline(results: dict, baseline: dict, max_regression: float) -> list:
+    """比较各模式的窗口显示中位耗时（无窗口时比较进程总耗时），返回超过阈值的退化列表。"""
+    regressions = []
+    for mode, data in results.items():
+        for kind in ("cold", "warm"):
+            for metric in ("time_to_window_ms", "process_ms"):
+                current = (data.get(kind) or {}).get(metric, {}).get("median")
+                previous = ((baseline.get(mode) or {}).get(kind) or {}).get(metric, {}).get("median")
+                if current is None or not previous:
+                    continue
+                change = (current - previous) / previous
+                if change > max_regression:
+                    regressions.append(f"{mode}/{kind} {metric}: {previous}ms → {current}ms (+{change * 100:.1f}%)")
+                break
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="doubao_gui 启动耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每种模式的重复次数")
+    parser.add_argument("--top", type=int, default=15, help="输出导入耗时最多的模块数量")
+    parser.add_argument("--timeout", type=float, default=60, help="单次启动超时（秒）")
+    parser.add_argument("--exe", default=None, help="PyInstaller 打包后的可执行文件路径")
+    parser.add_argument("--imports-only", action="store_true", help="只测导入耗时，不创建窗口（无显示环境）")
+    parser.add_argument("--output", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的最大相对退化")
+    args = parser.parse_args()
+
+    results = {"source": bench_source(args.repeat, args.top, args.timeout, args.imports_only)}
+    if args.exe:
+        results["frozen"] = bench_frozen(args.exe, args.repeat, args.top, args.timeout)
+
+    for mode, data in results.items():
+        for kind in ("cold", "warm"):
+            summary = data[kind]
+            ttw = summary["time_to_window_ms"]
+            if ttw["median"] is not None:
+                window = f"窗口显示耗时 中位 {ttw['median']}ms，最小 {ttw['min']}ms，最大 {ttw['max']}ms；"
+            else:
+                window = "未检测到窗口显示；"
+            print(f"== {mode} / {kind}（{summary['runs']} 次）{window}进程总耗时 中位 {summary['process_ms']['median']}ms")
+            for item in summary["top_imports_ms"]:
+                print(f"   {item['cumulative_ms']:>9.2f}ms  {item['module']}")
+            for error in summary.get("errors", []):
+                print(f"   ⚠️ {error}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.max_regression)
+        if regressions:
+            print("❌ 启动耗时退化:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ 启动耗时无明显退化")
+
+
+if __name__ == "__main__":
+    main()
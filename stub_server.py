@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地桩服务：模拟开放平台接口，用于在不访问真实环境的情况下验证执行器。
+
+- 任意 POST 请求返回 JSON；配置 secret 时按开放平台规则校验 _sign；
+- 可配置固定延迟，便于观察并发与连接复用的效果；
+- 同时模拟文档服务器（GET /api/doc/<接口路径>、GET /api/model/<模型名>）和 OpenAI 兼容的
+  POST /chat/completions（支持流式，可配置首字延迟和每秒输出 tokens），供离线基准（pipeline_bench.py）使用；
+- 模型接口可模拟提示词前缀缓存：隐式前缀缓存（与最近的提示词相同的前缀计为 cached_tokens），
+  以及豆包上下文缓存的 POST /context/create 与 /context/chat/completions（见 prompt_cache.py）；
+  配置预填充速率时，未命中缓存的提示 tokens 按该速率增加首字延迟。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DOC_PREFIX = "/api/doc"
+MODEL_PREFIX = "/api/model/"
+# 估算 token 数时每个 token 对应的字节数（中英文混合文本的粗略值）
+BYTES_PER_TOKEN = 4
+# 隐式前缀缓存记住的最近提示词条数与命中粒度（tokens）
+PREFIX_CACHE_SIZE = 32
+PREFIX_BLOCK_TOKENS = 64
+_JSON_BLOCK = re.compile(r"```json\s*(.*?)\s*```", re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+def default_llm_reply(prompt: str, case_count: int = 8) -> str:
+    """根据提示词中的 API 文档构造一组用例（JSON 数组文本），模拟模型的用例设计输出。"""
+    args = []
+    for block in _JSON_BLOCK.findall(prompt):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and isinstance(data.get("request"), dict):
+            args = [arg for arg in data["request"].get("args", []) if isinstance(arg, dict) and arg.get("name")]
+            break
+    cases = []
+    for index in range(case_count):
+        parameters = {}
+        for position, arg in enumerate(args):
+            name = arg["name"]
+            if (position + index) % 3 == 2:
+                continue
+            if isinstance(arg.get("type"), dict):
+                parameters[name] = {"field_0": f"value {index}", "page": 1}
+            elif name in ("page", "limit"):
+                parameters[name] = 1 if name == "page" else 20
+            elif index == case_count - 1:
+                parameters[name] = f"non_existent_{name}_{index}"
+            else:
+                parameters[name] = f"${{var_{(position * 7 + index) % 100}}}"
+        cases.append({"case_name": f"用例{index + 1}", "parameters": parameters})
+    return json.dumps(cases, ensure_ascii=False, indent=2)
+
+
+def verify_sign(raw_body: str, secret: str) -> bool:
+    """按签名规则校验请求体：去掉 _sign 后，secret + 其余参数 + secret 的 MD5 大写。"""
+    parts = raw_body.split("&")
+    sign = ""
+    rest = []
+    for part in parts:
+        if part.startswith("_sign="):
+            sign = part[len("_sign="):]
+        else:
+            rest.append(part)
+    expected = hashlib.md5(f"{secret}{'&'.join(rest)}{secret}".encode("utf-8")).hexdigest().upper()
+    return sign == expected
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认 backlog 只有 5，并发建连时会丢 SYN 导致约 1 秒的重传延迟
+    request_queue_size = 128
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AutoApiStub/1.0"
+    # 响应头与响应体分两次写出，关闭 Nagle 以免与延迟确认叠加出 40ms 级的额外延迟
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        """文档服务器：/api/doc/<接口路径> 与 /api/model/<模型名>，内容来自 server.docs / server.models。"""
+        with self.server.lock:
+            self.server.request_count += 1
+        if self.path.startswith(MODEL_PREFIX):
+            payload = self.server.models.get(self.path[len(MODEL_PREFIX):])
+        elif self.path.startswith(DOC_PREFIX):
+            payload = self.server.docs.get(self.path[len(DOC_PREFIX):])
+        else:
+            payload = None
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if payload is None:
+            self._send_json(404, {"code": 404, "msg": "not found", "path": self.path})
+        else:
+            self._send_json(200, payload)
+
+    def _prefill(self, prompt_tokens: int, cached_tokens: int) -> None:
+        """首字延迟：固定的 llm_latency，加上未命中缓存的提示 tokens 按 prefill_rate 计算的预填充时间。"""
+        delay = self.server.llm_latency
+        if self.server.prefill_rate:
+            delay += (prompt_tokens - cached_tokens) / self.server.prefill_rate
+        if delay > 0:
+            time.sleep(delay)
+
+    def _cached_prefix_tokens(self, prompt: str) -> int:
+        """隐式前缀缓存：与最近的提示词的最长公共前缀，按 PREFIX_BLOCK_TOKENS 向下取整。"""
+        with self.server.lock:
+            previous = list(self.server.prompts)
+            self.server.prompts.append(prompt)
+        common = max((len(os.path.commonprefix([prompt, other])) for other in previous), default=0)
+        if not common:
+            return 0
+        return estimate_tokens(prompt[:common]) // PREFIX_BLOCK_TOKENS * PREFIX_BLOCK_TOKENS
+
+    def _create_context(self, request: dict):
+        """豆包上下文缓存：POST /context/create，保存 messages 作为之后调用的公共前缀。"""
+        messages = request.get("messages") or []
+        prefix = "".join(str(m.get("content", "")) for m in messages)
+        ttl = int(request.get("ttl") or 86400)
+        context_id = f"ctx-{uuid.uuid4().hex[:16]}"
+        prompt_tokens = estimate_tokens(prefix)
+        with self.server.lock:
+            self.server.context_count += 1
+            self.server.contexts[context_id] = {"messages": messages, "model": request.get("model"),
+                                                "tokens": prompt_tokens, "expires_at": time.time() + ttl}
+        self._prefill(prompt_tokens, 0)
+        self._send_json(200, {"id": context_id, "model": request.get("model"), "mode": request.get("mode", "common_prefix"),
+                              "ttl": ttl, "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 0,
+                                                    "total_tokens": prompt_tokens}})
+
+    def _chat_completion(self, request: dict):
+        """OpenAI 兼容的 chat/completions：首字延迟后按 token_rate 输出 server.llm_reply(prompt)。
+
+        请求带 context_id 时（/context/chat/completions）在 messages 前拼上该上下文的消息，上下文部分全部计为缓存命中。
+        """
+        messages = request.get("messages", [])
+        cached_tokens = 0
+        context_id = request.get("context_id")
+        if context_id is not None:
+            with self.server.lock:
+                context = self.server.contexts.get(context_id)
+            if context is None or context["expires_at"] < time.time():
+                self._send_json(404, {"error": {"code": "InvalidParameter.ContextNotFound", "type": "BadRequest",
+                                                "message": f"context {context_id} not found or expired"}})
+                return
+            cached_tokens = context["tokens"]
+            messages = context["messages"] + messages
+        prompt = "".join(str(m.get("content", "")) for m in messages)
+        if context_id is None and self.server.prefix_cache:
+            cached_tokens = self._cached_prefix_tokens(prompt)
+        content = self.server.llm_reply(prompt)
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        usage["prompt_tokens_details"] = {"cached_tokens": min(cached_tokens, usage["prompt_tokens"])}
+        model = request.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        self._prefill(usage["prompt_tokens"], usage["prompt_tokens_details"]["cached_tokens"])
+
+        if not request.get("stream"):
+            if self.server.token_rate:
+                time.sleep(usage["completion_tokens"] / self.server.token_rate)
+            self._send_json(200, {"id": completion_id, "object": "chat.completion", "created": int(time.time()),
+                                  "model": model, "usage": usage,
+                                  "choices": [{"index": 0, "finish_reason": "stop",
+                                               "message": {"role": "assistant", "content": content}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(payload: dict) -> None:
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        chunk_chars = 16
+        started = time.perf_counter()
+        emitted = 0
+        try:
+            for offset in range(0, len(content), chunk_chars):
+                piece = content[offset:offset + chunk_chars]
+                if self.server.token_rate:
+                    emitted += estimate_tokens(piece)
+                    delay = started + emitted / self.server.token_rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                event({"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                       "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event({"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                       "choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消了流式调用
+            return
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        raw_body = self.rfile.read(length).decode("utf-8", errors="replace")
+        if self.path.rstrip("/").endswith("/context/create"):
+            with self.server.lock:
+                self.server.request_count += 1
+            self._create_context(json.loads(raw_body or "{}"))
+            return
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            with self.server.lock:
+                self.server.request_count += 1
+                self.server.llm_count += 1
+            self._chat_completion(json.loads(raw_body or "{}"))
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with self.server.lock:
+            self.server.request_count += 1
+
+        if self.server.secret is not None and not verify_sign(raw_body, self.server.secret):
+            self._send_json(200, {"code": 401, "msg": "签名错误", "path": self.path})
+            return
+
+        args = {k: v[0] for k, v in parse_qs(raw_body, keep_blank_values=True).items() if not k.startswith("_")}
+        self._send_json(200, {"code": 0, "msg": "success", "path": self.path, "args": args})
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, secret: str = None,
+                      latency_ms: float = 0, verbose: bool = False, handler_class=StubHandler,
+                      docs: dict = None, models: dict = None, llm_latency_ms: float = 0, token_rate: float = 0,
+                      llm_reply=None, prefix_cache: bool = False, prefill_rate: float = 0):
+    """在后台线程启动桩服务，返回 (server, base_url)。port=0 时自动选择空闲端口。
+
+    docs 为 {接口路径: 文档}，models 为 {模型名: 模型文档}（运行中也可直接修改 server.docs / server.models）；
+    llm_latency_ms 为模型首字延迟，token_rate 为每秒输出 tokens（0 表示不限速），
+    llm_reply(prompt) 返回模型输出文本，默认按提示词中的 API 文档构造用例；
+    prefix_cache 开启隐式前缀缓存，prefill_rate 为每秒预填充的提示 tokens（0 表示不计预填充时间）。
+    """
+    server = StubServer((host, port), handler_class)
+    server.secret = secret
+    server.latency = latency_ms / 1000.0
+    server.verbose = verbose
+    server.docs = dict(docs or {})
+    server.models = dict(models or {})
+    server.llm_latency = llm_latency_ms / 1000.0
+    server.token_rate = token_rate
+    server.llm_reply = llm_reply or default_llm_reply
+    server.prefix_cache = prefix_cache
+    server.prefill_rate = prefill_rate
+    server.prompts = deque(maxlen=PREFIX_CACHE_SIZE)
+    server.contexts = {}
+    server.context_count = 0
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.llm_count = 0
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="开放平台本地桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--secret", default=None, help="配置后校验请求签名")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--docs", default=None, help="文档 JSON 文件 {接口路径: 文档}，由 GET /api/doc/<接口路径> 返回")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="模型接口的首字延迟（毫秒）")
+    parser.add_argument("--token-rate", type=float, default=0, help="模型接口每秒输出 tokens，0 表示不限速")
+    parser.add_argument("--prefix-cache", action="store_true", help="模拟服务端的隐式前缀缓存")
+    parser.add_argument("--prefill-rate", type=float, default=0, help="每秒预填充的提示 tokens，未命中缓存的部分增加首字延迟")
+    args = parser.parse_args()
+
+    docs = {}
+    if args.docs:
+        with open(args.docs, "r", encoding="utf-8") as f:
+            docs = json.load(f)
+    server, base_url = start_stub_server(args.host, args.port, args.secret, args.latency_ms, verbose=True,
+                                         docs=docs, llm_latency_ms=args.llm_latency_ms, token_rate=args.token_rate,
+                                         prefix_cache=args.prefix_cache, prefill_rate=args.prefill_rate)
+    print(f"桩服务已启动: {base_url}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""case_dedup 的 classes / minimize 模式不应丢弃负向用例。"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import case_dedup
+
+API_DOC = {"path": "/erp/opentrade/v2/list/trades",
+           "request": {"args": [{"name": "page", "type": "int"}, {"name": "shop_nick", "type": "string"}]}}
+
+CASES = [
+    {"case_name": "正常查询", "parameters": {"page": 1, "shop_nick": "${shop_nick}"}},
+    {"case_name": "page为负数", "parameters": {"page": -1, "shop_nick": "${shop_nick}"}},
+    {"case_name": "超长店铺", "parameters": {"page": 1, "shop_nick": "a" * 300}},
+    {"case_name": "不存在的店铺", "parameters": {"page": 1, "shop_nick": "abc"}},
+    {"case_name": "shop_nick为空", "parameters": {"page": 1}},
+]
+
+
+@pytest.mark.parametrize("mode", ["classes", "minimize"])
+def test_negative_cases_are_kept(mode):
+    kept, report = case_dedup.dedup_cases(CASES, mode, API_DOC)
+    assert [case["case_name"] for case in kept] == [case["case_name"] for case in CASES]
+    assert report["duplicates"] == [] and report["minimized"] == []
+
+
+def test_negative_value_classes():
+    assert case_dedup.value_class(-1) == "number:negative"
+    assert case_dedup.value_class("0") == "number:zero"
+    assert case_dedup.value_class("a" * 300) == "text:long"
+    assert case_dedup.value_class("") == "empty"
+    assert case_dedup.param_classes({"page": 1}, ["page", "shop_nick"])["shop_nick"] == case_dedup.ABSENT
+
+
+def test_same_class_literals_still_merge():
+    cases = CASES[:1] + [{"case_name": "另一页", "parameters": {"page": 2, "shop_nick": "${shop_nick}"}}]
+    kept, report = case_dedup.dedup_cases(cases, "classes", API_DOC)
+    assert len(kept) == 1 and report["duplicates"] == [(1, 0)]
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成流程的分段追踪：get_api_doc / collect_related_models / 构建提示词 / 模型调用 / JSON 提取 / 脚本渲染等阶段
+各记录一个 span（可嵌套），包含墙钟耗时、收发字节数和重试次数。
+
+- 追踪器经 JobContext.tracer 传入；未传入时使用进程级追踪器（AUTOAPI_TRACE 环境变量指定 JSONL 文件时自动启用），
+  两者都没有时 span() 返回空操作对象，几乎没有开销；
+- 结束的 span 可实时追加到 JSONL 文件，也可导出为 Chrome trace-event 格式（chrome://tracing、Perfetto 中查看时间线）；
+- summary() / format_summary() 按阶段汇总，GUI 状态栏显示每个任务的耗时分布。
+"""
+
+import argparse
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TRACE_ENV = "AUTOAPI_TRACE"
+DEFAULT_MAX_SPANS = 50000
+
+# 阶段在汇总中的显示名称与顺序
+STAGE_LABELS = {
+    "doc": "文档",
+    "case_store": "用例库",
+    "diff": "增量",
+    "models": "模型",
+    "prompt": "提示词",
+    "llm": "LLM",
+    "parse": "解析",
+    "render": "渲染",
+    "export": "导出",
+}
+
+_current_span = contextvars.ContextVar("autoapi_current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """一个阶段。attrs 中的 bytes_in / bytes_out / retries 会在汇总时累加。"""
+
+    __slots__ = ("tracer", "span_id", "parent_id", "name", "job_id", "start", "end", "thread", "attrs", "status",
+                 "_token")
+
+    def __init__(self, tracer, name: str, parent, job_id: str = None, attrs: dict = None):
+        self.tracer = tracer
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.job_id = job_id or (parent.job_id if parent is not None else None)
+        self.start = time.time()
+        self.end = None
+        self.thread = threading.get_ident()
+        self.attrs = dict(attrs or {})
+        self.status = "ok"
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end or time.time()) - self.start)
+
+    def add(self, key: str, amount=1) -> None:
+        """累加计数类属性（bytes_in、bytes_out、retries 等）。"""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def set(self, key: str, value) -> None:
+        self.attrs[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.time()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "cancelled" if exc_type.__name__ == "JobCancelled" else "error"
+            if self.status == "error":
+                self.attrs.setdefault("error", str(exc)[:200])
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "job": self.job_id,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "pid": os.getpid(),
+            "thread": self.thread,
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """未启用追踪时使用：不记录任何内容。"""
+
+    def add(self, key: str, amount=1) -> None:
+        pass
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    线程安全的 span 收集器。jsonl_path 设置时每个结束的 span 立即追加写入该文件；
+    内存中最多保留 max_spans 个（批量运行时不会无限增长）。
+    """
+
+    def __init__(self, jsonl_path: str = None, max_spans: int = DEFAULT_MAX_SPANS):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=max_spans)
+        self._file = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+
+    def span(self, name: str, job_id: str = None, **attrs) -> Span:
+        """开始一个 span（用作 with 语句），当前线程中正在进行的 span 为其父级。"""
+        parent = _current_span.get()
+        if parent is not None and parent.tracer is not self:
+            parent = None
+        return Span(self, name, parent, job_id, attrs)
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+            if self._file is not None:
+                self._file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    def spans(self, job_id: str = None) -> list:
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if job_id is None or s.job_id == job_id]
+
+    def summary(self, job_id: str = None) -> dict:
+        return summarize([s.to_dict() for s in self.spans(job_id)])
+
+    def write_jsonl(self, path: str, job_id: str = None) -> int:
+        spans = self.spans(job_id)
+        with open(path, "w", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n")
+        return len(spans)
+
+    def write_chrome_trace(self, path: str, job_id: str = None) -> int:
+        records = [s.to_dict() for s in self.spans(job_id)]
+        write_chrome_trace(records, path)
+        return len(records)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def set_tracer(tracer) -> None:
+    """设置进程级追踪器（None 表示关闭）。"""
+    global _tracer
+    _tracer = tracer if tracer is not None else False
+
+
+def get_tracer(ctx=None):
+    """返回当前生效的追踪器：任务上下文中的优先，其次为进程级追踪器；都没有时返回 None。"""
+    global _tracer
+    tracer = getattr(ctx, "tracer", None) if ctx is not None else None
+    if tracer is not None:
+        return tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                path = os.environ.get(TRACE_ENV)
+                _tracer = Tracer(path) if path else False
+    return _tracer or None
+
+
+def span(ctx, name: str, **attrs):
+    """在任务上下文（或进程级）追踪器中开始一个 span；未启用追踪时返回空操作对象。"""
+    tracer = get_tracer(ctx)
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, job_id=getattr(ctx, "job_id", None), **attrs)
+
+
+def current_span():
+    """当前线程中正在进行的 span，没有时返回空操作对象（便于直接调用 add / set）。"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def summarize(records: list) -> dict:
+    """按 span 名称汇总：{name: {"count", "total", "max", "bytes_in", "bytes_out", "retries", "errors"}}。"""
+    summary = {}
+    for record in records:
+        item = summary.setdefault(record["name"], {"count": 0, "total": 0.0, "max": 0.0, "bytes_in": 0,
+                                                   "bytes_out": 0, "retries": 0, "errors": 0})
+        item["count"] += 1
+        item["total"] += record["duration"]
+        item["max"] = max(item["max"], record["duration"])
+        attrs = record.get("attrs") or {}
+        for key in ("bytes_in", "bytes_out", "retries"):
+            item[key] += attrs.get(key, 0) or 0
+        if record.get("status") == "error":
+            item["errors"] += 1
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    """状态栏用的单行摘要，例如 "文档 0.21s · 模型 0.48s · LLM 85.3s（12.1 KB）· 渲染 0.30s"。"""
+    parts = []
+    for stage, label in STAGE_LABELS.items():
+        item = summary.get(stage)
+        if not item:
+            continue
+        text = f"{label} {item['total']:.2f}s"
+        if item["bytes_in"]:
+            text += f"（{item['bytes_in'] / 1024:.1f} KB）"
+        if item["retries"]:
+            text += f"（重试 {item['retries']}）"
+        parts.append(text)
+    return " · ".join(parts)
+
+
+def write_chrome_trace(records: list, path: str) -> None:
+    """把 span 记录写为 Chrome trace-event JSON（完整事件 ph="X"，时间单位为微秒）。"""
+    if not records:
+        origin = 0.0
+    else:
+        origin = min(r["start"] for r in records)
+    threads = {}
+    events = []
+    for record in records:
+        pid = record.get("pid", 1)
+        tid = threads.setdefault((pid, record["thread"]), len(threads) + 1)
+        args = dict(record.get("attrs") or {})
+        if record.get("job"):
+            args["job"] = record["job"]
+        if record.get("status") != "ok":
+            args["status"] = record.get("status")
+        events.append({
+            "name": record["name"],
+            "cat": record["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": round((record["start"] - origin) * 1e6, 1),
+            "dur": round(record["duration"] * 1e6, 1),
+            "pid": pid,
+            "tid": tid,
+            "args": args,
+        })
+    events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": f"worker-{tid}"}}
+                  for (pid, _), tid in threads.items())
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+
+
+def load_jsonl(path: str) -> list:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看生成流程的追踪记录（JSONL），或转换为 Chrome trace 格式")
+    parser.add_argument("trace", help="追踪记录文件（AUTOAPI_TRACE 指定的 JSONL）")
+    parser.add_argument("--chrome", default=None, help="导出为 Chrome trace-event JSON（chrome://tracing / Perfetto）")
+    parser.add_argument("--job", default=None, help="只看某个任务")
+    args = parser.parse_args()
+
+    records = [r for r in load_jsonl(args.trace) if args.job is None or r.get("job") == args.job]
+    if args.chrome:
+        write_chrome_trace(records, args.chrome)
+        print(f"已导出 {len(records)} 个 span 到 {args.chrome}")
+        return
+
+    summary = summarize(records)
+    print(f"{'阶段':<24}{'次数':>8}{'总耗时(s)':>12}{'最长(s)':>10}{'收(KB)':>10}{'发(KB)':>10}{'重试':>6}{'失败':>6}")
+    for name, item in sorted(summary.items(), key=lambda kv: -kv[1]["total"]):
+        print(f"{name:<24}{item['count']:>8}{item['total']:>12.3f}{item['max']:>10.3f}"
+              f"{item['bytes_in'] / 1024:>10.1f}{item['bytes_out'] / 1024:>10.1f}{item['retries']:>6}{item['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+测试环境变量库加载器：doubao.load_test_data 与 gemini.load_test_data 共用。
+
+- 解析结果按 (绝对路径, mtime, 大小) 缓存，文件未变化时批量生成的每个接口都直接复用；
+- 超过 STREAMING_THRESHOLD 的大文件逐个元素增量解析，只保留 name / value / description 三个字段，
+  不会先把整个文件读成一棵完整的 JSON 树；
+- 内存中以元组列表 + 名称索引的紧凑形式保存，提示词所需的 JSON 文本每个版本只序列化一次。
+"""
+
+import json
+import os
+import threading
+
+STREAMING_THRESHOLD = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+
+class VariableLibrary:
+    """一个版本的变量库。entries 为 (name, value, description) 元组列表，index 为 名称 → 下标。"""
+
+    __slots__ = ("path", "mtime_ns", "size", "entries", "index", "_prompt_json", "_variables", "_lock")
+
+    def __init__(self, path: str, mtime_ns: int, size: int, entries: list):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.entries = entries
+        self.index = {}
+        for position, (name, _, _) in enumerate(entries):
+            if name is not None and name not in self.index:
+                self.index[name] = position
+        self._prompt_json = None
+        self._variables = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def get(self, name: str):
+        """返回 (name, value, description)，不存在时返回 None。"""
+        position = self.index.get(name)
+        return None if position is None else self.entries[position]
+
+    @property
+    def prompt_json(self) -> str:
+        """提示词使用的 JSON 文本（与原 load_test_data 的输出完全一致），每个版本只序列化一次。"""
+        if self._prompt_json is None:
+            with self._lock:
+                if self._prompt_json is None:
+                    self._prompt_json = json.dumps(
+                        [{"name": name, "value": value, "description": description}
+                         for name, value, description in self.entries],
+                        ensure_ascii=False, indent=2)
+        return self._prompt_json
+
+    @property
+    def variables(self) -> dict:
+        """{变量名: 字符串值}，与 signing.variables_from_test_data 的结果一致。"""
+        if self._variables is None:
+            self._variables = {name: str(value) for name, value, _ in self.entries
+                               if name and value is not None}
+        return self._variables
+
+
+def _compact(item) -> tuple:
+    return item.get("name"), item.get("value"), item.get("description", "")
+
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE):
+    """逐个产出顶层 JSON 数组中的元素，每次只读入 chunk_size 大小的文本。顶层不是数组时抛出 ValueError。"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def next_char() -> str:
+            """跳过空白，返回下一个字符（不消耗）；文件结束时返回空串。"""
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if eof or not fill():
+                    return ""
+
+        if next_char() != "[":
+            raise ValueError("测试数据文件应为JSON数组")
+        pos += 1
+        if next_char() == "]":
+            return
+        while True:
+            if not next_char():
+                raise ValueError("JSON数组不完整")
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # 元素后面在缓冲区内没有紧跟 ',' 或 ']' 时可能被截断（如 "2." 之后还有 "5"），读入更多内容后重新解析
+                after = end
+                while after < len(buf) and buf[after] in _WHITESPACE:
+                    after += 1
+                if (after == len(buf) or buf[after] not in ",]") and not eof and fill():
+                    continue
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            pos = end
+            yield item
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"JSON数组格式错误，位置 {pos} 处应为 ',' 或 ']'")
+            pos += 1
+
+
+def parse_library(path: str) -> list:
+    """解析变量库文件为 (name, value, description) 元组列表；大文件使用增量解析。"""
+    if os.path.getsize(path) >= STREAMING_THRESHOLD:
+        return [_compact(item) for item in iter_json_array(path) if isinstance(item, dict)]
+    with open(path, "r", encoding="utf-8-sig") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("测试数据文件应为JSON数组")
+    return [_compact(item) for item in data if isinstance(item, dict)]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_library(path: str) -> VariableLibrary:
+    """加载变量库；路径、修改时间和大小都未变化时返回缓存的同一个对象。文件不存在或格式错误时抛出异常。"""
+    full_path = os.path.abspath(path)
+    stat = os.stat(full_path)
+    with _cache_lock:
+        cached = _cache.get(full_path)
+    if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+        return cached
+    library = VariableLibrary(full_path, stat.st_mtime_ns, stat.st_size, parse_library(full_path))
+    with _cache_lock:
+        _cache[full_path] = library
+    return library
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def load_test_data(file_path: str) -> str:
+    """加载变量库并返回提示词使用的 JSON 文本；失败时打印原因并返回 "[]"。"""
+    full_path = os.path.abspath(file_path)
+    if not os.path.exists(full_path):
+        print(f"测试数据文件不存在: {full_path}")
+        return "[]"
+    try:
+        library = load_library(full_path)
+    except json.JSONDecodeError as e:
+        print(f"JSON格式错误 '{file_path}': {e}")
+        return "[]"
+    except Exception as e:
+        print(f"读取或处理测试数据文件 '{file_path}' 失败: {e}")
+        return "[]"
+    print(f"成功加载测试数据文件: {full_path} ({len(library)} 条数据)")
+    return library.prompt_json
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用例中 ${var} 变量引用的索引与校验。
+
+- 每个参数值只解析一次（结果按文本缓存），支持嵌套的 ${__urlencode(${var})} 等 JMeter 函数；
+- 一组用例的全部引用在一轮中对变量库的名称索引完成解析，按接口报告未定义的变量和未被引用的变量；
+- 建立 变量 → 用例 的映射：变量值修改时可直接找出受影响的接口和用例。
+"""
+
+import argparse
+import json
+import re
+from contextlib import closing
+from functools import lru_cache
+
+# 与原先 generate_scripts_for_case 中逐个参数执行的 re.search(r'\${(.*)}', ...) 等价，预编译一次
+_GREEDY_REF = re.compile(r'\${(.*)}')
+_FUNCTION_CALL = re.compile(r'(__\w+)\((.*)\)$', re.DOTALL)
+
+
+def find_closing_brace(text: str, start: int) -> int:
+    """从 "${" 之后的位置开始，找到与之匹配的 "}"；找不到时返回 -1（签名 signing.resolve_template 共用此规则）。"""
+    depth = 1
+    i = start
+    while i < len(text):
+        if text.startswith("${", i):
+            depth += 1
+            i += 2
+            continue
+        if text[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+@lru_cache(maxsize=65536)
+def references(text: str) -> tuple:
+    """返回文本中引用的变量名（按出现顺序，含 ${__urlencode(${var})} 等函数参数中的引用）。"""
+    found = []
+    i = 0
+    while True:
+        begin = text.find("${", i)
+        if begin < 0:
+            break
+        end = find_closing_brace(text, begin + 2)
+        if end < 0:
+            break
+        inner = text[begin + 2:end]
+        call = _FUNCTION_CALL.match(inner)
+        if call:
+            found.extend(references(call.group(2)))
+        elif inner:
+            found.append(inner)
+        i = end + 1
+    return tuple(found)
+
+
+@lru_cache(maxsize=65536)
+def sign_var_name(value_str: str) -> str:
+    """从 "${var}" 或 "${__urlencode(${var})}" 中取出签名时读取的变量名（doubao.extract_sign_var_name）。"""
+    env_var_name = _GREEDY_REF.search(value_str).group(1)
+    # 对于被__urlencode包裹的，提取内部的变量名
+    if "__urlencode" in env_var_name:
+        env_var_name = _GREEDY_REF.search(env_var_name).group(1)
+    return env_var_name
+
+
+def _walk_strings(value, path: str):
+    """遍历参数值中的字符串（dict / list 逐层展开），产出 (参数路径, 字符串)。"""
+    if isinstance(value, str):
+        if "${" in value:
+            yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _walk_strings(item, f"{path}.{key}")
+    elif isinstance(value, list):
+        for position, item in enumerate(value):
+            yield from _walk_strings(item, f"{path}[{position}]")
+
+
+def case_references(test_case: dict) -> list:
+    """返回用例参数中的全部引用 [(参数路径, 变量名)]。"""
+    found = []
+    for name, value in (test_case.get("parameters") or {}).items():
+        for path, text in _walk_strings(value, name):
+            found.extend((path, var) for var in references(text))
+    return found
+
+
+@lru_cache(maxsize=8)
+def library_names(test_data_json: str) -> frozenset:
+    """load_test_data 返回的变量库 JSON 中的变量名集合（同一文本只解析一次）。"""
+    try:
+        items = json.loads(test_data_json)
+    except (TypeError, json.JSONDecodeError):
+        return frozenset()
+    return frozenset(item.get("name") for item in items if isinstance(item, dict) and item.get("name"))
+
+
+def unknown_variables(test_cases: list, names) -> list:
+    """用例引用了、但变量库中不存在的变量名（排序）。"""
+    return sorted({var for case in test_cases for _, var in case_references(case) if var not in names})
+
+
+class ReferenceIndex:
+    """
+    一组接口用例的变量引用索引。cases_by_api 为 {接口路径: [用例]}，names 为变量库中的变量名集合
+    （set / dict / var_library.VariableLibrary 均可）。
+    """
+
+    def __init__(self, cases_by_api: dict, names):
+        self.names = names.index if hasattr(names, "entries") else names
+        # 变量 → [(接口路径, 用例下标, 参数路径)]
+        self.usages = {}
+        self.unknown = {}
+        for api_path, test_cases in cases_by_api.items():
+            unknown = set()
+            for index, case in enumerate(test_cases or []):
+                for param, var in case_references(case):
+                    self.usages.setdefault(var, []).append((api_path, index, param))
+                    if var not in self.names:
+                        unknown.add(var)
+            self.unknown[api_path] = sorted(unknown)
+        self._referenced_by_api = {}
+        for var, usages in self.usages.items():
+            for api_path, _, _ in usages:
+                self._referenced_by_api.setdefault(api_path, set()).add(var)
+
+    def unused(self, api_path: str = None) -> list:
+        """变量库中未被引用的变量；指定 api_path 时只看该接口的用例。"""
+        if api_path is None:
+            referenced = self.usages
+        else:
+            referenced = self._referenced_by_api.get(api_path, ())
+        return sorted(name for name in self.names if name not in referenced)
+
+    def cases_using(self, var: str) -> list:
+        """引用了变量 var 的 [(接口路径, 用例下标, 参数路径)]。"""
+        return list(self.usages.get(var, ()))
+
+    def impact(self, variables) -> dict:
+        """这些变量的值变化时受影响的用例：{接口路径: [用例下标]}。"""
+        affected = {}
+        for var in variables:
+            for api_path, index, _ in self.usages.get(var, ()):
+                affected.setdefault(api_path, set()).add(index)
+        return {api_path: sorted(indexes) for api_path, indexes in sorted(affected.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验用例中的 ${var} 引用，查询变量影响的用例")
+    parser.add_argument("--db", default="case_store.db", help="生成用例库，读取各接口最近一次的用例")
+    parser.add_argument("--cases", default=None, help="改为读取用例 JSON 文件（单个接口）")
+    parser.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    parser.add_argument("--impact", nargs="+", default=None, metavar="VAR", help="列出引用了这些变量的用例")
+    parser.add_argument("--show-unused", action="store_true", help="同时统计各接口未引用的变量数")
+    args = parser.parse_args()
+
+    import var_library
+
+    library = var_library.load_library(args.test_data)
+    if args.cases:
+        with open(args.cases, "r", encoding="utf-8") as f:
+            cases_by_api = {args.cases: json.load(f)}
+    else:
+        import case_store
+        with closing(case_store.connect(args.db)) as conn:
+            cases_by_api = {row["api_path"]: row["test_cases"] for row in case_store.latest_cases(conn)}
+
+    index = ReferenceIndex(cases_by_api, library)
+    if args.impact:
+        affected = index.impact(args.impact)
+        if not affected:
+            print("没有用例引用这些变量")
+        for api_path, indexes in affected.items():
+            names = [cases_by_api[api_path][i].get("case_name", "未命名用例") for i in indexes]
+            print(f"{api_path}: {len(indexes)} 个用例")
+            for name in names:
+                print(f"   - {name}")
+        return
+
+    for api_path in cases_by_api:
+        unknown = index.unknown[api_path]
+        mark = "❌" if unknown else "✅"
+        print(f"{mark} {api_path}: {len(cases_by_api[api_path] or [])} 个用例"
+              + (f"，未定义的变量: {', '.join(unknown)}" if unknown else ""))
+        if args.show_unused:
+            print(f"   未引用的变量 {len(index.unused(api_path))} 个")
+    print(f"变量库共 {len(library)} 个变量，其中 {len(index.unused())} 个未被任何用例引用")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式工作队列：多台机器（各用自己的 API 密钥）分担一次大规模生成。
+
+队列是共享卷上的一个 SQLite 文件，每个接口一条任务：
+- 工作进程以租约认领任务（BEGIN IMMEDIATE 事务内原子更新），运行期间定期续约（心跳）；
+  进程崩溃或断网后租约过期，任务自动回到可认领状态，由其他工作进程接手；
+- 生成结果（API 文档、用例、用量）写回队列库，export 子命令统一导出（与 batch_export 相同的目录结构）；
+- 失败的任务重新排队，超过 max_attempts 次后标记为失败。
+网络文件系统上 WAL 的共享内存不可靠，因此使用默认的回滚日志模式；本地测试直接使用临时目录中的库文件，
+`work --processes N` 可在本机启动多个工作进程模拟多个节点。
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import time
+from multiprocessing import Process
+
+import doubao
+from job_runner import JobRunner, STATUS_CANCELLED, STATUS_DONE
+
+DEFAULT_DB = "work_queue.db"
+DEFAULT_QUEUE = "default"
+DEFAULT_LEASE = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_ITEM_DONE = "done"
+STATUS_ITEM_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    api_path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT NOT NULL DEFAULT '',
+    lease_expires REAL NOT NULL DEFAULT 0,
+    heartbeat_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    case_count INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT NOT NULL DEFAULT '',
+    UNIQUE (queue, api_path)
+);
+CREATE INDEX IF NOT EXISTS idx_work_items_claim ON work_items(queue, status, lease_expires);
+"""
+
+
+def connect(db_path: str = DEFAULT_DB) -> sqlite3.Connection:
+    # isolation_level=None：由各函数显式 BEGIN IMMEDIATE，认领时先取得写锁，避免两个进程认领同一任务
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT（异常时 ROLLBACK）。"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def enqueue(conn: sqlite3.Connection, api_paths, queue: str = DEFAULT_QUEUE,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+    """加入任务（队列中已有的接口忽略），返回新加入的数量。"""
+    now = time.time()
+    with _Immediate(conn):
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO work_items (queue, api_path, max_attempts, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)", [(queue, path, max_attempts, now, now) for path in api_paths])
+        return conn.total_changes - before
+
+
+def claim(conn: sqlite3.Connection, worker_id: str, queue: str = DEFAULT_QUEUE, lease_seconds: float = DEFAULT_LEASE):
+    """认领一个待处理或租约已过期的任务，返回任务行；没有可认领的任务时返回 None。"""
+    now = time.time()
+    with _Immediate(conn):
+        # 租约过期且已用完尝试次数的任务（工作进程反复崩溃）直接标记为失败
+        conn.execute(
+            "UPDATE work_items SET status = ?, error = '租约过期且已达到最大尝试次数', updated_at = ?"
+            " WHERE queue = ? AND status = ? AND lease_expires < ? AND attempts >= max_attempts",
+            (STATUS_ITEM_FAILED, now, queue, STATUS_LEASED, now))
+        row = conn.execute(
+            "SELECT id FROM work_items WHERE queue = ? AND (status = ? OR (status = ? AND lease_expires < ?))"
+            " ORDER BY id LIMIT 1", (queue, STATUS_PENDING, STATUS_LEASED, now)).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE work_items SET status = ?, lease_owner = ?, lease_expires = ?, heartbeat_at = ?,"
+            " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (STATUS_LEASED, worker_id, now + lease_seconds, now, now, row["id"]))
+        return conn.execute("SELECT * FROM work_items WHERE id = ?", (row["id"],)).fetchone()
+
+
+def heartbeat(conn: sqlite3.Connection, item_id: int, worker_id: str, lease_seconds: float = DEFAULT_LEASE) -> bool:
+    """续约；租约已被其他工作进程接手或任务已结束时返回 False。"""
+    now = time.time()
+    with _Immediate(conn):
+        cursor = conn.execute(
+            "UPDATE work_items SET lease_expires = ?, heartbeat_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (now + lease_seconds, now, item_id, STATUS_LEASED, worker_id))
+        return cursor.rowcount == 1
+
+
+def complete(conn: sqlite3.Connection, item_id: int, worker_id: str, result: dict) -> bool:
+    """写回生成结果。即使租约已过期，只要任务还没有其他工作进程的结果就接受（模型输出已付费）。"""
+    now = time.time()
+    with _Immediate(conn):
+        cursor = conn.execute(
+            "UPDATE work_items SET status = ?, lease_owner = ?, lease_expires = 0, case_count = ?, result = ?,"
+            " error = '', updated_at = ? WHERE id = ? AND status != ?",
+            (STATUS_ITEM_DONE, worker_id, len(result.get("test_cases") or []),
+             json.dumps(result, ensure_ascii=False, default=str), now, item_id, STATUS_ITEM_DONE))
+        return cursor.rowcount == 1
+
+
+def fail(conn: sqlite3.Connection, item_id: int, worker_id: str, error: str) -> str:
+    """记录一次失败：未达到最大尝试次数时重新排队，否则标记为失败。返回任务的新状态。"""
+    now = time.time()
+    with _Immediate(conn):
+        row = conn.execute("SELECT attempts, max_attempts FROM work_items WHERE id = ? AND status = ? AND lease_owner = ?",
+                           (item_id, STATUS_LEASED, worker_id)).fetchone()
+        if row is None:
+            return ""
+        status = STATUS_PENDING if row["attempts"] < row["max_attempts"] else STATUS_ITEM_FAILED
+        conn.execute("UPDATE work_items SET status = ?, lease_owner = '', lease_expires = 0, error = ?, updated_at = ?"
+                     " WHERE id = ?", (status, error, now, item_id))
+        return status
+
+
+def release(conn: sqlite3.Connection, item_id: int, worker_id: str) -> None:
+    """放弃租约（工作进程退出时），任务立即回到可认领状态，不计为一次失败。"""
+    with _Immediate(conn):
+        conn.execute("UPDATE work_items SET status = ?, lease_owner = '', lease_expires = 0,"
+                     " attempts = MAX(attempts - 1, 0) WHERE id = ? AND status = ? AND lease_owner = ?",
+                     (STATUS_PENDING, item_id, STATUS_LEASED, worker_id))
+
+
+def counts(conn: sqlite3.Connection, queue: str = DEFAULT_QUEUE) -> dict:
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM work_items WHERE queue = ? GROUP BY status", (queue,))
+    return {row["status"]: row["n"] for row in rows}
+
+
+def results(conn: sqlite3.Connection, queue: str = DEFAULT_QUEUE):
+    """逐个产出已完成任务的 (接口路径, 结果 dict)。"""
+    for row in conn.execute("SELECT api_path, result FROM work_items WHERE queue = ? AND status = ? ORDER BY id",
+                            (queue, STATUS_ITEM_DONE)):
+        yield row["api_path"], json.loads(row["result"])
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class QueueWorker:
+    """
+    一个工作进程：最多同时运行 concurrency 个任务（共用一个 JobRunner 及其缓存），
+    每 lease_seconds / 3 秒为运行中的任务续约；续约失败（租约被接手）时取消对应任务。
+    """
+
+    def __init__(self, db_path: str, test_data_file: str, queue: str = DEFAULT_QUEUE, worker_id: str = None,
+                 concurrency: int = 2, lease_seconds: float = DEFAULT_LEASE, api_key: str = None, model: str = None,
+                 doc_base_url: str = None, llm_base_url: str = None, case_db: str = None, usage_db: str = None):
+        self.db_path = db_path
+        self.test_data_file = test_data_file
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.api_key = api_key
+        self.model = model
+        self.doc_base_url = doc_base_url
+        self.llm_base_url = llm_base_url
+        self.case_db = case_db
+        self.usage_db = usage_db
+
+    def run(self, poll_interval: float = 1.0, max_items: int = None) -> dict:
+        """处理任务直到队列中没有待处理或租约中的任务（或已处理 max_items 个），返回 {"done", "failed", "lost"}。"""
+        conn = connect(self.db_path)
+        runner = JobRunner(self.concurrency, usage_db=self.usage_db)
+        # 用量按队列归入同一批次，各节点的用量库可按批次汇总
+        runner.default_batch_id = f"queue-{self.queue}"
+        stats = {"done": 0, "failed": 0, "lost": 0}
+        active = {}
+        claimed = 0
+        next_heartbeat = time.time() + self.lease_seconds / 3
+        try:
+            while True:
+                while len(active) < self.concurrency and (max_items is None or claimed < max_items):
+                    item = claim(conn, self.worker_id, self.queue, self.lease_seconds)
+                    if item is None:
+                        break
+                    claimed += 1
+                    job = runner.submit(item["api_path"], self.test_data_file, api_key=self.api_key, model=self.model,
+                                        llm_base_url=self.llm_base_url, doc_base_url=self.doc_base_url,
+                                        render_scripts=False, case_db=self.case_db)
+                    active[item["id"]] = job
+                    print(f"[{self.worker_id}] 认领 {item['api_path']}（第 {item['attempts']} 次）")
+
+                for item_id, job in list(active.items()):
+                    if not job.finished:
+                        continue
+                    del active[item_id]
+                    if job.status == STATUS_DONE:
+                        result = {key: job.result.get(key) for key in ("api_doc", "test_cases", "usage", "unknown_vars")}
+                        result["worker"] = self.worker_id
+                        complete(conn, item_id, self.worker_id, result)
+                        stats["done"] += 1
+                        print(f"[{self.worker_id}] ✅ {job.api_path}（{job.message}）")
+                    elif job.status == STATUS_CANCELLED:
+                        stats["lost"] += 1
+                    else:
+                        status = fail(conn, item_id, self.worker_id, job.error)
+                        stats["failed"] += 1
+                        print(f"[{self.worker_id}] ❌ {job.api_path}: {job.error}"
+                              + ("（重新排队）" if status == STATUS_PENDING else ""))
+                runner.remove_finished()
+
+                if time.time() >= next_heartbeat:
+                    for item_id, job in list(active.items()):
+                        if not heartbeat(conn, item_id, self.worker_id, self.lease_seconds):
+                            print(f"[{self.worker_id}] ⚠️ {job.api_path} 的租约已被接手，取消本地任务")
+                            runner.cancel(job.id)
+                    next_heartbeat = time.time() + self.lease_seconds / 3
+
+                if not active:
+                    if max_items is not None and claimed >= max_items:
+                        break
+                    remaining = counts(conn, self.queue)
+                    if not remaining.get(STATUS_PENDING) and not remaining.get(STATUS_LEASED):
+                        break
+                time.sleep(poll_interval if not active else min(poll_interval, 0.2))
+        finally:
+            for item_id, job in active.items():
+                if not job.finished:
+                    runner.cancel(job.id)
+                    release(conn, item_id, self.worker_id)
+            runner.shutdown(cancel_pending=True)
+            conn.close()
+        return stats
+
+
+def _run_worker_process(kwargs: dict, poll_interval: float) -> None:
+    stats = QueueWorker(**kwargs).run(poll_interval)
+    print(f"工作进程 {os.getpid()} 结束: 完成 {stats['done']}，失败 {stats['failed']}，被接手 {stats['lost']}")
+
+
+def export_results(conn: sqlite3.Connection, output_dir: str, queue: str = DEFAULT_QUEUE, formats=None) -> int:
+    """把已完成任务的用例导出到目录（与 batch_export 相同的分片结构与清单），返回导出的接口数。"""
+    import batch_export
+
+    formats = batch_export.check_formats(formats or batch_export.DEFAULT_FORMATS)
+    exported = 0
+    for api_path, result in results(conn, queue):
+        record = batch_export.render_api({"api_path": api_path, "api_doc": result["api_doc"],
+                                          "test_cases": result["test_cases"]}, output_dir, formats)
+        batch_export.append_manifest(output_dir, record)
+        exported += 1
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式生成工作队列（共享卷上的 SQLite）")
+    parser.add_argument("--db", default=DEFAULT_DB, help="队列库路径（放在各节点都能访问的共享卷上）")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE, help="队列名称")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = sub.add_parser("enqueue", help="加入接口列表文件中的接口")
+    enqueue_parser.add_argument("endpoints", help="接口列表文件（每行一个接口路径）")
+    enqueue_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    work = sub.add_parser("work", help="作为工作进程认领并处理任务，队列处理完后退出")
+    work.add_argument("--processes", type=int, default=1, help="在本机启动的工作进程数")
+    work.add_argument("--concurrency", type=int, default=2, help="每个工作进程同时进行的任务数")
+    work.add_argument("--lease", type=float, default=DEFAULT_LEASE, help="租约时长（秒），每 1/3 租约时长续约一次")
+    work.add_argument("--poll", type=float, default=1.0, help="没有可认领任务时的轮询间隔（秒）")
+    work.add_argument("--test-data", default="MS_25_Environments_variables.json", help="测试环境变量库文件")
+    work.add_argument("--model", default=doubao.DEFAULT_MODEL, help="生成用例使用的模型")
+    work.add_argument("--api-key", default=None, help="本节点使用的豆包 API 密钥，默认读取 DOUBAO_API_KEY")
+    work.add_argument("--doc-base-url", default=None, help="文档服务器地址，默认 doubao.BASE_DOC_URL")
+    work.add_argument("--llm-base-url", default=None, help="模型服务地址，默认 doubao.DOUBAO_BASE_URL")
+    work.add_argument("--case-db", default="", help="本节点的生成用例库，默认不使用")
+    work.add_argument("--usage-db", default="llm_usage.db", help="本节点的 token 用量库，空字符串表示不记录")
+
+    sub.add_parser("status", help="查看队列状态")
+
+    export = sub.add_parser("export", help="导出已完成任务的用例")
+    export.add_argument("output_dir")
+    export.add_argument("--formats", default="jsonl,md,jmx", help="导出格式，逗号分隔")
+
+    requeue = sub.add_parser("requeue", help="把失败的任务重新排队")
+    requeue.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="重新排队后的最大尝试次数")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        from doc_watch import load_endpoints
+        conn = connect(args.db)
+        added = enqueue(conn, load_endpoints(args.endpoints), args.queue, args.max_attempts)
+        print(f"已加入 {added} 个任务，队列状态: {counts(conn, args.queue)}")
+    elif args.command == "work":
+        kwargs = {"db_path": args.db, "test_data_file": args.test_data, "queue": args.queue,
+                  "concurrency": args.concurrency, "lease_seconds": args.lease, "api_key": args.api_key,
+                  "model": args.model, "doc_base_url": args.doc_base_url, "llm_base_url": args.llm_base_url,
+                  "case_db": args.case_db or None, "usage_db": args.usage_db or None}
+        started = time.time()
+        if args.processes <= 1:
+            _run_worker_process(kwargs, args.poll)
+        else:
+            processes = [Process(target=_run_worker_process, args=(kwargs, args.poll)) for _ in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        print(f"耗时 {time.time() - started:.1f}s，队列状态: {counts(connect(args.db), args.queue)}")
+    elif args.command == "status":
+        conn = connect(args.db)
+        print(f"队列 {args.queue}: {counts(conn, args.queue)}")
+        now = time.time()
+        for row in conn.execute("SELECT api_path, lease_owner, lease_expires, attempts FROM work_items"
+                                " WHERE queue = ? AND status = ? ORDER BY id", (args.queue, STATUS_LEASED)):
+            print(f"   {row['api_path']}  {row['lease_owner']}  第 {row['attempts']} 次，租约剩余 {row['lease_expires'] - now:.0f}s")
+        for row in conn.execute("SELECT api_path, attempts, error FROM work_items WHERE queue = ? AND status = ?"
+                                " ORDER BY id", (args.queue, STATUS_ITEM_FAILED)):
+            print(f"   ❌ {row['api_path']}（{row['attempts']} 次）: {row['error']}")
+    elif args.command == "export":
+        import batch_export
+
+        try:
+            formats = batch_export.parse_formats(args.formats)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"已导出 {export_results(connect(args.db), args.output_dir, args.queue, formats)} 个接口到 {args.output_dir}")
+    elif args.command == "requeue":
+        conn = connect(args.db)
+        with _Immediate(conn):
+            cursor = conn.execute("UPDATE work_items SET status = ?, attempts = 0, max_attempts = ?, updated_at = ?"
+                                  " WHERE queue = ? AND status = ?",
+                                  (STATUS_PENDING, args.max_attempts, time.time(), args.queue, STATUS_ITEM_FAILED))
+        print(f"已重新排队 {cursor.rowcount} 个任务")
+
+
+if __name__ == "__main__":
+    main()